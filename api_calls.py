@@ -3,98 +3,484 @@
 import streamlit as st
 from PIL import Image
 from io import BytesIO
-from typing import Union, Tuple, Dict 
-import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted
-from elevenlabs.client import ElevenLabs
+from typing import Union, Tuple, Type, Dict, List, Callable, Iterable, Iterator, NamedTuple, Sequence
+# Das Gemini-SDK erzeugt Antwortschemata über pydantic, das unter Python < 3.12 diese TypedDict-Variante verlangt
+from typing_extensions import TypedDict
+import json
 import logging
+import os
 
 # Importiere die Prompt-Vorlagen aus der prompts.py Datei
-from prompts import ACCESSIBILITY_PROMPT_TEMPLATE, SEO_PROMPT
+from prompts import ACCESSIBILITY_PROMPT_TEMPLATE, SEO_PROMPT, COMBINED_PROMPT_TEMPLATE, PACKED_SEO_PROMPT_TEMPLATE
+from batch import run_bounded
+from cancellation import cancellable_sleep, check_cancelled, request_timeout
+from metrics import instrumented, add_to_span, set_span_label, mark_span_failed
+from providers import ELEVENLABS_TIMEOUT_SECONDS, get_backend
+from rate_limit import RequestScheduler
+from result_cache import content_hash, get_result_cache, make_cache_key
+from singleflight import SingleFlight
+from utils import normalize_chunk_text
 
 # Richte ein einfaches Logging ein, um Fehler besser nachverfolgen zu können
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ELEVENLABS_MODEL_ID = "eleven_multilingual_v2"
+# Maximale Anzahl gleichzeitiger Anfragen, die das ElevenLabs-Abo erlaubt (z.B. Creator: 5, Pro: 10)
+ELEVENLABS_MAX_CONCURRENCY = int(os.environ.get("ELEVENLABS_MAX_CONCURRENCY", "5"))
 
-# --- Die Funktionen generate_seo_tags_cached und generate_accessibility_description_cached bleiben unverändert ---
+DEFAULT_GEMINI_MODEL = "gemini-1.5-pro-latest"
 
-@st.cache_data
-def generate_seo_tags_cached(image_bytes_for_api, file_name_for_log: str, model_name: str = "gemini-1.5-pro-latest") -> Tuple[Union[str, None], Union[str, None]]:
+# Gemeinsames Budget für alle Gemini-Aufrufe dieses Prozesses (alle Sessions teilen sich das Kontingent)
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "5"))
+
+def gemini_rate_limit_errors() -> Tuple[Type[BaseException], ...]:
+    """Rate-Limit-Fehler des Gemini-SDKs; google.api_core (samt grpc) wird erst beim ersten Fehler geladen."""
+    from google.api_core.exceptions import ResourceExhausted
+    return (ResourceExhausted,)
+
+gemini_scheduler = RequestScheduler(
+    GEMINI_REQUESTS_PER_MINUTE, retry_exceptions=gemini_rate_limit_errors,
+    max_retries=GEMINI_MAX_RETRIES, name="Gemini"
+)
+# Zeitlimits je Anfrage; läuft für den Job eine Frist, werden sie auf deren Restzeit gekürzt
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "120"))
+GEMINI_LONG_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_LONG_TIMEOUT_SECONDS", "180"))
+
+# Gleichzeitige identische Anfragen (gleicher Cache-Schlüssel, z.B. dasselbe Bild in zwei Sessions)
+# teilen sich einen API-Aufruf und dessen Ergebnis
+gemini_flight = SingleFlight("Gemini")
+elevenlabs_flight = SingleFlight("ElevenLabs")
+
+# Gebündelte SEO-Anfragen: höchstens so viele Bilder bzw. so viele Bild-Bytes pro Anfrage
+PACKED_MAX_IMAGES = int(os.environ.get("SEO_HELPER_PACKED_MAX_IMAGES", "8"))
+PACKED_MAX_PAYLOAD_BYTES = int(os.environ.get("SEO_HELPER_PACKED_MAX_PAYLOAD_KB", "1536")) * 1024
+
+
+class CombinedDescription(TypedDict):
+    """Antwortschema für den kombinierten Modus (SEO-Tags und barrierefreie Beschreibung in einem Aufruf)."""
+    kurzbeschreibung: str
+    langbeschreibung: str
+    seo_alt: str
+    seo_title: str
+
+
+class PackedSeoEntry(TypedDict):
+    """Ein Eintrag der gebündelten SEO-Antwort; index ist die 1-basierte Bildnummer im Prompt."""
+    index: int
+    alt: str
+    title: str
+
+
+def json_generation_config(response_schema: object):
+    """GenerationConfig für JSON-Antworten nach Schema; das Gemini-SDK wird erst beim ersten Aufruf geladen."""
+    import google.generativeai as genai
+    return genai.GenerationConfig(response_mime_type="application/json", response_schema=response_schema)
+
+def image_part_for_api(image_bytes_for_api: bytes) -> Union[Dict[str, object], Image.Image]:
+    """
+    Gibt die Bild-Bytes als Blob für Gemini zurück, wenn das Format direkt unterstützt wird.
+    So werden bereits vorverarbeitete Bilder nicht noch einmal neu kodiert.
+    Andere Formate werden als PIL-Bild übergeben und vom SDK konvertiert.
+    """
+    img = Image.open(BytesIO(image_bytes_for_api))
+    if img.format in ("JPEG", "PNG", "WEBP"):
+        return {"mime_type": Image.MIME[img.format], "data": image_bytes_for_api}
+    return img
+
+def _generate_content(model_name: str, contents: List[object], timeout: float, **kwargs) -> object:
+    """Ein Gemini-Aufruf über das aktive Backend; das Zeitlimit wird bei jedem Versuch neu auf die Frist des Jobs gekürzt."""
+    return get_backend().generate_content(model_name, contents, request_options={"timeout": request_timeout(timeout)}, **kwargs)
+
+def seo_cache_key(image_bytes_for_api: bytes, model_name: str) -> str:
+    """Cache-Schlüssel für SEO-Tags: Bildinhalt, SEO-Prompt und Modell."""
+    return make_cache_key("seo", content_hash(image_bytes_for_api), content_hash(SEO_PROMPT), model_name)
+
+def build_accessibility_prompt(template: str, ebook_context: str) -> str:
+    """Setzt den Buchkontext (oder einen Hinweis auf fehlenden Kontext) in eine Prompt-Vorlage ein."""
+    context_for_prompt = ebook_context if ebook_context and ebook_context.strip() else "Es wurde kein spezifischer Buchkontext für dieses Bild bereitgestellt."
+    return template.replace("$BUCHKONTEXT", context_for_prompt)
+
+def accessibility_cache_key(image_bytes_for_api: bytes, final_prompt: str, model_name: str) -> str:
+    """Cache-Schlüssel für Bildbeschreibungen: Bildinhalt, fertiger Prompt (Vorlage + Kontext) und Modell."""
+    return make_cache_key("accessibility", content_hash(image_bytes_for_api), content_hash(final_prompt), model_name)
+
+def task_signature(task: str, ebook_context: str = "", model_name: str = DEFAULT_GEMINI_MODEL) -> str:
+    """
+    Beschreibt Aufgabe, fertigen Prompt und Modell unabhängig vom Bildinhalt.
+    Dient als Namensraum für die Wiederverwendung von Ergebnissen ähnlicher Bilder.
+    task ist 'seo', 'accessibility' oder 'combined'.
+    """
+    if task == "seo":
+        prompt = SEO_PROMPT
+    elif task == "accessibility":
+        prompt = build_accessibility_prompt(ACCESSIBILITY_PROMPT_TEMPLATE, ebook_context)
+    elif task == "combined":
+        prompt = build_accessibility_prompt(COMBINED_PROMPT_TEMPLATE, ebook_context)
+    else:
+        raise ValueError(f"Unbekannte Aufgabe: {task}")
+    return make_cache_key(task, content_hash(prompt), model_name)
+
+def combined_cache_key(image_bytes_for_api: bytes, final_prompt: str, model_name: str) -> str:
+    """Cache-Schlüssel für die kombinierte SEO- und Barrierefreiheits-Antwort."""
+    return make_cache_key("combined", content_hash(image_bytes_for_api), content_hash(final_prompt), model_name)
+
+def is_result_cached(task: str, image_bytes_for_api: bytes, ebook_context: str = "", model_name: str = DEFAULT_GEMINI_MODEL) -> bool:
+    """Prüft, ob für Aufgabe, Bild, Kontext und Modell bereits ein Ergebnis im Cache liegt."""
+    if task == "seo":
+        cache_key = seo_cache_key(image_bytes_for_api, model_name)
+    elif task == "accessibility":
+        cache_key = accessibility_cache_key(image_bytes_for_api, build_accessibility_prompt(ACCESSIBILITY_PROMPT_TEMPLATE, ebook_context), model_name)
+    elif task == "combined":
+        cache_key = combined_cache_key(image_bytes_for_api, build_accessibility_prompt(COMBINED_PROMPT_TEMPLATE, ebook_context), model_name)
+    else:
+        raise ValueError(f"Unbekannte Aufgabe: {task}")
+    return get_result_cache().contains(cache_key)
+
+def audio_cache_key(text: str, voice_id: str, model_id: str = ELEVENLABS_MODEL_ID) -> str:
+    """Cache-Schlüssel für Audio-Chunks: Text, Stimme und Modell."""
+    return make_cache_key("tts", content_hash(text), voice_id, model_id)
+
+
+# Art eines Fehlschlags ("error_kind" neben "error"); nur bei unbrauchbaren Antworten lohnt sich ein anderes Modell
+ERROR_KIND_RATE_LIMITED = "rate_limited"
+ERROR_KIND_UNPARSEABLE = "unparseable"
+ERROR_KIND_EXCEPTION = "exception"
+
+def _rate_limit_error(subject: str) -> Dict[str, str]:
+    return {
+        "error": f"🚨 Rate Limit für {subject} trotz {GEMINI_MAX_RETRIES} Wiederholungen erreicht. Bitte versuche es später erneut oder mit weniger Bildern.",
+        "error_kind": ERROR_KIND_RATE_LIMITED,
+    }
+
+def _unexpected_error(subject: str, error: Exception) -> Dict[str, str]:
+    return {
+        "error": f"🚨 Ein unerwarteter Fehler ist bei der Generierung {subject} aufgetreten: {type(error).__name__}: {error}",
+        "error_kind": ERROR_KIND_EXCEPTION,
+    }
+
+def _unparseable_error(message: str) -> Dict[str, str]:
+    return {"error": message, "error_kind": ERROR_KIND_UNPARSEABLE}
+
+def parse_seo_response(generated_text: str) -> Tuple[Union[str, None], Union[str, None]]:
+    """Liest (title, alt) aus einer Antwort im Format 'ALT: ...' / 'TITLE: ...'."""
+    alt_tag, title_tag = None, None
+    for line in generated_text.split('\n'):
+        if line.strip().upper().startswith("ALT:"):
+            alt_tag = line.strip()[len("ALT:"):].strip()
+        elif line.strip().upper().startswith("TITLE:"):
+            title_tag = line.strip()[len("TITLE:"):].strip()
+    return title_tag, alt_tag
+
+def parse_accessibility_response(generated_text: str) -> Tuple[Union[str, None], Union[str, None]]:
+    """Liest (kurzbeschreibung, langbeschreibung) aus einer Antwort, deren Teile durch '---' getrennt sind."""
+    short_desc, long_desc = None, None
+    parts = generated_text.split('---', 1)
+    if parts[0]:
+        short_desc_raw = parts[0].split(":", 1)
+        if len(short_desc_raw) > 1:
+            short_desc = short_desc_raw[1].strip()
+    if len(parts) > 1 and parts[1]:
+        long_desc_raw = parts[1].split(":", 1)
+        if len(long_desc_raw) > 1:
+            long_desc = long_desc_raw[1].strip()
+    return short_desc, long_desc
+
+def parse_combined_response(generated_text: str) -> Union[Dict[str, str], None]:
+    """
+    Liest die vier Felder der kombinierten JSON-Antwort.
+    Gibt None zurück, wenn die Antwort kein gültiges JSON ist oder ein Feld fehlt bzw. leer ist.
+    """
+    try:
+        data = json.loads(generated_text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    result = {}
+    for field in CombinedDescription.__annotations__:
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        result[field] = value.strip()
+    return result
+
+
+@instrumented("gemini.generate", task="seo")
+def generate_seo_tags_cached(image_bytes_for_api, file_name_for_log: str, model_name: str = DEFAULT_GEMINI_MODEL) -> Dict[str, str]:
     """
     Nimmt Bild-Bytes, ruft die Gemini API mit dem SEO-Prompt auf
-    und gibt (title, alt) als Tupel zurück.
+    und gibt {"title", "alt"} zurück, bei Fehlern {"error": grund, "error_kind": art}.
+    Die Funktion läuft in Worker-Threads und meldet Fehler daher nicht selbst in der Oberfläche.
+    Erfolgreiche Ergebnisse landen im persistenten Cache und überstehen Neustarts.
     """
+    cache = get_result_cache()
+    cache_key = seo_cache_key(image_bytes_for_api, model_name)
+    cached = cache.get_json(cache_key)
+    if cached is not None:
+        set_span_label("cache", "hit")
+        logger.info(f"SEO-Tags für {file_name_for_log} aus dem Cache geladen.")
+        return {"title": cached[0], "alt": cached[1]}
+
     try:
-        img = Image.open(BytesIO(image_bytes_for_api))
-        model = genai.GenerativeModel(model_name)
+        set_span_label("cache", "miss")
+        add_to_span(bytes_out=len(image_bytes_for_api) + len(SEO_PROMPT.encode("utf-8")))
+        img = image_part_for_api(image_bytes_for_api)
         try:
-            response = model.generate_content([SEO_PROMPT, img], request_options={"timeout": 120})
-        except ResourceExhausted as e:
+            response = gemini_flight.do(
+                cache_key, gemini_scheduler.call, _generate_content, model_name, [SEO_PROMPT, img], GEMINI_TIMEOUT_SECONDS
+            )
+        except gemini_rate_limit_errors() as e:
             logger.warning(f"Rate limit exceeded for SEO tags {file_name_for_log}: {e}")
-            st.warning(f"Rate Limit für SEO-Tags bei '{file_name_for_log}' erreicht. Bitte versuche es später erneut oder mit weniger Bildern.")
-            return None, None
+            mark_span_failed("rate_limited")
+            return _rate_limit_error(f"SEO-Tags bei '{file_name_for_log}'")
         
         generated_text = response.text.strip()
-        alt_tag, title_tag = None, None
-        for line in generated_text.split('\n'):
-            if line.strip().upper().startswith("ALT:"):
-                alt_tag = line.strip()[len("ALT:"):].strip()
-            elif line.strip().upper().startswith("TITLE:"):
-                title_tag = line.strip()[len("TITLE:"):].strip()
-        
+        add_to_span(bytes_in=len(generated_text.encode("utf-8")))
+        title_tag, alt_tag = parse_seo_response(generated_text)
+
         if alt_tag and title_tag:
-            return title_tag, alt_tag
+            cache.set_json(cache_key, [title_tag, alt_tag])
+            return {"title": title_tag, "alt": alt_tag}
         else:
             logger.warning(f"Warning: Could not extract SEO tags for {file_name_for_log}. Raw response: {generated_text}")
-            return None, None
+            mark_span_failed("unparseable_response")
+            return _unparseable_error(f"❌ Die Antwort für '{file_name_for_log}' enthielt keine vollständigen SEO-Tags (ALT/TITLE).")
             
     except Exception as e:
         logger.error(f"Error during SEO tag generation for {file_name_for_log}: {e}", exc_info=True)
-        st.error(f"Ein unerwarteter Fehler ist bei der Generierung der SEO-Tags für '{file_name_for_log}' aufgetreten.")
-        return None, None
+        mark_span_failed(f"{type(e).__name__}: {e}")
+        return _unexpected_error(f"der SEO-Tags für '{file_name_for_log}'", e)
+
+def plan_packs(
+    sizes: Sequence[int],
+    max_images: int = PACKED_MAX_IMAGES,
+    max_payload_bytes: int = PACKED_MAX_PAYLOAD_BYTES,
+) -> List[List[int]]:
+    """
+    Teilt Bilder (gegeben durch ihre Größe in Bytes) in Pakete für gebündelte Anfragen auf.
+    Ein Paket wird geschlossen, sobald es max_images Bilder enthält oder das nächste Bild die Nutzlast
+    über max_payload_bytes heben würde. Die Paketgröße passt sich so den Bildern an: viele Icons
+    pro Anfrage, große Fotos einzeln. Gibt Listen von Positionen in der ursprünglichen Reihenfolge zurück.
+    """
+    packs: List[List[int]] = []
+    current: List[int] = []
+    current_bytes = 0
+    for index, size in enumerate(sizes):
+        if size > max_payload_bytes:
+            packs.append([index])
+            continue
+        if current and (len(current) >= max_images or current_bytes + size > max_payload_bytes):
+            packs.append(current)
+            current, current_bytes = [], 0
+        current.append(index)
+        current_bytes += size
+    if current:
+        packs.append(current)
+    return packs
+
+def build_packed_seo_prompt(image_count: int) -> str:
+    return PACKED_SEO_PROMPT_TEMPLATE.replace("$ANZAHL", str(image_count))
+
+def parse_packed_seo_response(generated_text: str, image_count: int) -> Dict[int, Tuple[str, str]]:
+    """
+    Ordnet die Einträge einer gebündelten SEO-Antwort ihren Bildern zu: {position (0-basiert): (title, alt)}.
+    Einträge mit ungültiger oder doppelter Bildnummer bzw. leeren Feldern werden verworfen;
+    die betroffenen Bilder fehlen im Ergebnis und werden einzeln nachgefragt.
+    """
+    try:
+        data = json.loads(generated_text)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, list):
+        return {}
+    parsed: Dict[int, Tuple[str, str]] = {}
+    seen = set()
+    for entry in data:
+        if not isinstance(entry, dict):
+            continue
+        index, alt, title = entry.get("index"), entry.get("alt"), entry.get("title")
+        if not isinstance(index, int) or not 1 <= index <= image_count:
+            continue
+        if index in seen:
+            # Zwei Antworten für dasselbe Bild: keine davon ist verlässlich zuzuordnen
+            parsed.pop(index - 1, None)
+            continue
+        seen.add(index)
+        if isinstance(alt, str) and alt.strip() and isinstance(title, str) and title.strip():
+            parsed[index - 1] = (title.strip(), alt.strip())
+    return parsed
 
-@st.cache_data
-def generate_accessibility_description_cached(image_bytes_for_api, file_name_for_log: str, ebook_context: str = "", model_name: str = "gemini-1.5-pro-latest") -> Tuple[Union[str, None], Union[str, None]]:
+@instrumented("gemini.generate", task="seo_packed")
+def _request_seo_pack(images: Sequence[Tuple[bytes, str]], model_name: str) -> Union[Dict[int, Tuple[str, str]], None]:
+    """
+    Fragt SEO-Tags für mehrere Bilder mit einem einzigen Gemini-Aufruf an.
+    Gibt die zuordenbaren Ergebnisse zurück ({} bei unbrauchbarer Antwort oder Fehler), None bei Rate-Limit.
+    """
+    file_names = ", ".join(file_name for _, file_name in images)
+    prompt = build_packed_seo_prompt(len(images))
+    contents: List[object] = [prompt]
+    for number, (image_bytes, _) in enumerate(images, start=1):
+        contents += [f"BILD {number}:", image_part_for_api(image_bytes)]
+    set_span_label("cache", "miss")
+    add_to_span(bytes_out=sum(len(image_bytes) for image_bytes, _ in images) + len(prompt.encode("utf-8")))
+    generation_config = json_generation_config(list[PackedSeoEntry])
+    try:
+        pack_key = make_cache_key("seo_packed", *(seo_cache_key(image_bytes, model_name) for image_bytes, _ in images))
+        response = gemini_flight.do(
+            pack_key, gemini_scheduler.call, _generate_content, model_name, contents,
+            GEMINI_LONG_TIMEOUT_SECONDS, generation_config=generation_config
+        )
+        generated_text = response.text.strip()
+    except gemini_rate_limit_errors() as e:
+        logger.warning(f"Rate limit exceeded for packed SEO tags ({file_names}): {e}")
+        mark_span_failed("rate_limited")
+        return None
+    except Exception as e:
+        logger.error(f"Error during packed SEO tag generation ({file_names}): {e}", exc_info=True)
+        mark_span_failed(f"{type(e).__name__}: {e}")
+        return {}
+
+    add_to_span(bytes_in=len(generated_text.encode("utf-8")))
+    parsed = parse_packed_seo_response(generated_text, len(images))
+    if len(parsed) < len(images):
+        logger.warning(f"Packed SEO response covered {len(parsed)}/{len(images)} images ({file_names}). Raw response: {generated_text}")
+        mark_span_failed("unparseable_response")
+    return parsed
+
+def generate_seo_tags_packed(images: Sequence[Tuple[bytes, str]], model_name: str = DEFAULT_GEMINI_MODEL) -> List[Dict[str, str]]:
+    """
+    Erzeugt SEO-Tags für mehrere (bild_bytes, dateiname) mit einer gemeinsamen Gemini-Anfrage
+    und gibt je Bild in Eingabereihenfolge ein Ergebnis wie generate_seo_tags_cached() zurück.
+    Bilder im Cache werden nicht erneut angefragt; Bilder, deren Antwort sich nicht zuordnen lässt,
+    werden einzeln mit generate_seo_tags_cached() nachgefragt.
+    """
+    cache = get_result_cache()
+    results: List[Dict[str, str]] = [{} for _ in images]
+    missing: List[int] = []
+    for position, (image_bytes, _) in enumerate(images):
+        cached = cache.get_json(seo_cache_key(image_bytes, model_name))
+        if cached is not None:
+            results[position] = {"title": cached[0], "alt": cached[1]}
+        else:
+            missing.append(position)
+
+    parsed: Union[Dict[int, Tuple[str, str]], None] = {}
+    if len(missing) > 1:
+        parsed = _request_seo_pack([images[position] for position in missing], model_name)
+        if parsed is None:
+            for position in missing:
+                results[position] = _rate_limit_error("gebündelte SEO-Tags")
+            return results
+
+    for offset, position in enumerate(missing):
+        image_bytes, file_name = images[position]
+        if offset in parsed:
+            # Unter demselben Schlüssel wie Einzelanfragen, damit beide Wege den Cache teilen
+            cache.set_json(seo_cache_key(image_bytes, model_name), list(parsed[offset]))
+            results[position] = {"title": parsed[offset][0], "alt": parsed[offset][1]}
+        else:
+            results[position] = generate_seo_tags_cached(image_bytes, file_name, model_name)
+    return results
+
+@instrumented("gemini.generate", task="accessibility")
+def generate_accessibility_description_cached(image_bytes_for_api, file_name_for_log: str, ebook_context: str = "", model_name: str = DEFAULT_GEMINI_MODEL) -> Dict[str, str]:
     """
     Nimmt Bild-Bytes und Kontext, ruft die Gemini API mit dem Barrierefreiheits-Prompt auf
-    und gibt (kurzbeschreibung, langbeschreibung) als Tupel zurück.
+    und gibt {"short_desc", "long_desc"} zurück, bei Fehlern {"error": grund, "error_kind": art}.
+    Erfolgreiche Ergebnisse landen im persistenten Cache und überstehen Neustarts.
     """
+    final_prompt = build_accessibility_prompt(ACCESSIBILITY_PROMPT_TEMPLATE, ebook_context)
+
+    cache = get_result_cache()
+    cache_key = accessibility_cache_key(image_bytes_for_api, final_prompt, model_name)
+    cached = cache.get_json(cache_key)
+    if cached is not None:
+        set_span_label("cache", "hit")
+        logger.info(f"Bildbeschreibung für {file_name_for_log} aus dem Cache geladen.")
+        return {"short_desc": cached[0], "long_desc": cached[1]}
+
     try:
-        img = Image.open(BytesIO(image_bytes_for_api))
-        model = genai.GenerativeModel(model_name)
-        context_for_prompt = ebook_context if ebook_context and ebook_context.strip() else "Es wurde kein spezifischer Buchkontext für dieses Bild bereitgestellt."
-        final_prompt = ACCESSIBILITY_PROMPT_TEMPLATE.replace("$BUCHKONTEXT", context_for_prompt)
-        
+        set_span_label("cache", "miss")
+        add_to_span(bytes_out=len(image_bytes_for_api) + len(final_prompt.encode("utf-8")))
+        img = image_part_for_api(image_bytes_for_api)
         try:
-            response = model.generate_content([final_prompt, img], request_options={"timeout": 180})
-        except ResourceExhausted as e:
+            response = gemini_flight.do(
+                cache_key, gemini_scheduler.call, _generate_content, model_name, [final_prompt, img], GEMINI_LONG_TIMEOUT_SECONDS
+            )
+        except gemini_rate_limit_errors() as e:
             logger.warning(f"Rate limit exceeded for accessibility description {file_name_for_log}: {e}")
-            st.warning(f"Rate Limit für Barrierefreiheits-Beschreibung bei '{file_name_for_log}' erreicht. Bitte versuche es später erneut oder mit weniger Bildern.")
-            return None, None
+            mark_span_failed("rate_limited")
+            return _rate_limit_error(f"Barrierefreiheits-Beschreibung bei '{file_name_for_log}'")
         
         generated_text = response.text.strip()
-        short_desc, long_desc = None, None
+        add_to_span(bytes_in=len(generated_text.encode("utf-8")))
         try:
-            parts = generated_text.split('---', 1)
-            if parts[0]:
-                short_desc_raw = parts[0].split(":", 1)
-                if len(short_desc_raw) > 1:
-                    short_desc = short_desc_raw[1].strip()
-            if len(parts) > 1 and parts[1]:
-                long_desc_raw = parts[1].split(":", 1)
-                if len(long_desc_raw) > 1:
-                    long_desc = long_desc_raw[1].strip()
+            short_desc, long_desc = parse_accessibility_response(generated_text)
         except Exception as e:
             logger.error(f"Error parsing short/long description for {file_name_for_log}: {e}. Raw Text: {generated_text}", exc_info=True)
-            return None, None
-            
-        return short_desc, long_desc
+            mark_span_failed("unparseable_response")
+            short_desc, long_desc = None, None
+
+        if not (short_desc and long_desc):
+            return _unparseable_error(f"❌ Die Antwort für '{file_name_for_log}' enthielt keine vollständige Kurz- und Langbeschreibung.")
+        cache.set_json(cache_key, [short_desc, long_desc])
+        return {"short_desc": short_desc, "long_desc": long_desc}
             
     except Exception as e:
         logger.error(f"Error during accessibility description generation for {file_name_for_log}: {e}", exc_info=True)
-        st.error(f"Ein unerwarteter Fehler ist bei der Generierung der Barrierefreiheits-Beschreibung für '{file_name_for_log}' aufgetreten.")
-        return None, None
+        mark_span_failed(f"{type(e).__name__}: {e}")
+        return _unexpected_error(f"der Barrierefreiheits-Beschreibung für '{file_name_for_log}'", e)
+
+@instrumented("gemini.generate", task="combined")
+def generate_combined_descriptions_cached(image_bytes_for_api, file_name_for_log: str, ebook_context: str = "", model_name: str = DEFAULT_GEMINI_MODEL) -> Dict[str, str]:
+    """
+    Erzeugt SEO-Tags und barrierefreie Kurz-/Langbeschreibung mit einem einzigen Gemini-Aufruf.
+    Die Antwort wird über ein JSON-Schema erzwungen und gibt ein Dictionary mit den Feldern
+    'kurzbeschreibung', 'langbeschreibung', 'seo_alt' und 'seo_title' zurück, bei Fehlern {"error": grund, "error_kind": art}.
+    """
+    final_prompt = build_accessibility_prompt(COMBINED_PROMPT_TEMPLATE, ebook_context)
+
+    cache = get_result_cache()
+    cache_key = combined_cache_key(image_bytes_for_api, final_prompt, model_name)
+    cached = cache.get_json(cache_key)
+    if cached is not None:
+        set_span_label("cache", "hit")
+        logger.info(f"Kombinierte Beschreibung für {file_name_for_log} aus dem Cache geladen.")
+        return cached
+
+    try:
+        set_span_label("cache", "miss")
+        add_to_span(bytes_out=len(image_bytes_for_api) + len(final_prompt.encode("utf-8")))
+        img = image_part_for_api(image_bytes_for_api)
+        generation_config = json_generation_config(CombinedDescription)
+
+        try:
+            response = gemini_flight.do(
+                cache_key, gemini_scheduler.call, _generate_content, model_name, [final_prompt, img],
+                GEMINI_LONG_TIMEOUT_SECONDS, generation_config=generation_config
+            )
+        except gemini_rate_limit_errors() as e:
+            logger.warning(f"Rate limit exceeded for combined description {file_name_for_log}: {e}")
+            mark_span_failed("rate_limited")
+            return _rate_limit_error(f"die kombinierte Beschreibung bei '{file_name_for_log}'")
+
+        generated_text = response.text.strip()
+        add_to_span(bytes_in=len(generated_text.encode("utf-8")))
+        result = parse_combined_response(generated_text)
+        if result is None:
+            logger.warning(f"Warning: Could not parse combined JSON response for {file_name_for_log}. Raw response: {generated_text}")
+            mark_span_failed("unparseable_response")
+            return _unparseable_error(f"❌ Die Antwort für '{file_name_for_log}' entsprach nicht dem erwarteten JSON-Format.")
+
+        cache.set_json(cache_key, result)
+        return result
+
+    except Exception as e:
+        logger.error(f"Error during combined description generation for {file_name_for_log}: {e}", exc_info=True)
+        mark_span_failed(f"{type(e).__name__}: {e}")
+        return _unexpected_error(f"der kombinierten Beschreibung für '{file_name_for_log}'", e)
 
 @st.cache_data(ttl=3600)
 def get_available_voices(api_key: str) -> Dict[str, Dict[str, str]]:
@@ -104,22 +490,72 @@ def get_available_voices(api_key: str) -> Dict[str, Dict[str, str]]:
     {'Stimmenname': {'voice_id': 'xyz', 'preview_url': 'http://...'}}
     """
     try:
-        client = ElevenLabs(api_key=api_key, timeout=60.0)
-        voices = client.voices.get_all()
+        voices = get_backend().list_voices(api_key)
         # Erstelle ein verschachteltes Dictionary mit allen relevanten Infos
         return {
             voice.name: {
                 "voice_id": voice.voice_id,
                 "preview_url": voice.preview_url
             }
-            for voice in voices.voices if voice.preview_url
+            for voice in voices if voice.preview_url
         }
     except Exception as e:
         logger.error(f"Fehler beim Abrufen der ElevenLabs-Stimmen: {e}", exc_info=True)
         return {"Fehler": {"voice_id": "", "preview_url": ""}}
 
 
-@st.cache_data
+def is_audio_chunk_cached(text: str, voice_id: str) -> bool:
+    """Prüft, ob für den (normalisierten) Chunk mit dieser Stimme bereits Audio im Cache liegt."""
+    return get_result_cache().contains(audio_cache_key(normalize_chunk_text(text), voice_id))
+
+def _stream_speech(text: str, api_key: str, voice_id: str) -> bytes:
+    """
+    Sammelt die gestreamte Antwort von ElevenLabs. Zwischen den Stücken wird auf einen Abbruch geprüft;
+    die Verbindung wird dann sofort geschlossen, statt den Rest des Segments noch abzuwarten.
+    """
+    # Der Client des Backends ist langlebig und nutzt bestehende Verbindungen weiter
+    audio_generator = get_backend().text_to_speech(
+        api_key, voice_id, text, ELEVENLABS_MODEL_ID, timeout=request_timeout(ELEVENLABS_TIMEOUT_SECONDS)
+    )
+    logger.info(f"Sammle Audio-Chunks von der ElevenLabs API für Stimme {voice_id}...")
+    pieces = []
+    try:
+        for piece in audio_generator:
+            check_cancelled()
+            pieces.append(piece)
+    finally:
+        close = getattr(audio_generator, "close", None)
+        if close is not None:
+            close()
+    return b"".join(pieces)
+
+@instrumented("elevenlabs.tts")
+def synthesize_audio_chunk(text: str, api_key: str, voice_id: str) -> bytes:
+    """
+    Synthetisiert einen einzelnen Text-Chunk mit ElevenLabs und gibt die Audio-Bytes zurück.
+    Der Text wird vorher normalisiert; bereits synthetisierte Chunks werden aus dem persistenten Cache geladen.
+    Wirft bei Fehlern eine Exception, damit fehlgeschlagene Aufrufe nicht im Cache landen
+    und gezielt wiederholt werden können.
+    """
+    text = normalize_chunk_text(text)
+    cache = get_result_cache()
+    cache_key = audio_cache_key(text, voice_id)
+    cached_audio = cache.get(cache_key)
+    if cached_audio is not None:
+        set_span_label("cache", "hit")
+        logger.info(f"Audio-Chunk für Stimme {voice_id} aus dem Cache geladen.")
+        return cached_audio
+
+    set_span_label("cache", "miss")
+    add_to_span(chars=len(text), bytes_out=len(text.encode("utf-8")))
+    full_audio_bytes = elevenlabs_flight.do(cache_key, _stream_speech, text, api_key, voice_id)
+
+    add_to_span(bytes_in=len(full_audio_bytes))
+    if not full_audio_bytes:
+        raise RuntimeError("ElevenLabs API hat keine Audio-Daten zurückgegeben.")
+    cache.set(cache_key, full_audio_bytes)
+    return full_audio_bytes
+
 def generate_audio_from_text(text: str, api_key: str, voice_id: str) -> Union[bytes, None]:
     """
     Generiert Audio aus Text mit der ElevenLabs API und gibt die Audio-Bytes zurück.
@@ -130,31 +566,111 @@ def generate_audio_from_text(text: str, api_key: str, voice_id: str) -> Union[by
         return None
     
     try:
-        # HIER DEN TIMEOUT HINZUFÜGEN
-        client = ElevenLabs(api_key=api_key, timeout=300.0) # Timeout auf 300s (5 Minuten) setzen
-        
-        audio_generator = client.text_to_speech.convert(
-            voice_id=voice_id,
-            text=text,
-            model_id="eleven_multilingual_v2", 
-        )
+        audio_bytes = synthesize_audio_chunk(text, api_key, voice_id)
+        logger.info("Audio-Bytes erfolgreich zusammengefügt.")
+        return audio_bytes
+    except Exception as e:
+        logger.error(f"Fehler bei der Audio-Generierung durch ElevenLabs: {e}", exc_info=True)
+        return None
 
-        logger.info(f"Sammle Audio-Chunks von der ElevenLabs API für Stimme {voice_id}...")
-        audio_chunks = [chunk for chunk in audio_generator]
 
-        if not audio_chunks:
-            logger.error("ElevenLabs API hat keine Audio-Daten zurückgegeben.")
-            return None
+class SynthesisResult(NamedTuple):
+    """
+    Ergebnis einer Audiobuch-Synthese inklusive Statistik über wiederverwendete Chunks.
+    segments ist leer, wenn die Segmente an on_segment übergeben statt gesammelt wurden.
+    """
+    segments: List[Union[bytes, None]]
+    failed_chunks: List[int]
+    reused_chunks: int
+    reused_chars: int
+    synthesized_chunks: int
+    synthesized_chars: int
+    chunk_count: int
+
+
+def synthesize_chunks_parallel(
+    text_chunks: Iterable[str],
+    api_key: str,
+    voice_id: str,
+    max_workers: int = 2,
+    max_retries: int = 2,
+    on_progress: Union[Callable[[int, Union[int, None]], None], None] = None,
+    initializer: Union[Callable[[], None], None] = None,
+    on_segment: Union[Callable[[int, bytes], None], None] = None,
+) -> SynthesisResult:
+    """
+    Synthetisiert mehrere Text-Chunks parallel mit höchstens max_workers gleichzeitigen Anfragen.
+    text_chunks darf ein Generator sein: Chunks werden angefragt, sobald sie geliefert werden.
+    Chunks, die bereits im Audio-Cache liegen, werden wiederverwendet statt neu synthetisiert.
+    Fehlgeschlagene Chunks werden bis zu max_retries Mal erneut angefragt, bereits erfolgreiche nicht.
+    Die Segmente im Ergebnis stehen in der Reihenfolge der Chunks.
+    on_progress(fertig, gesamt) wird nach jedem erfolgreich synthetisierten Chunk aufgerufen;
+    gesamt ist None, solange der Chunk-Strom noch nicht vollständig gelesen ist.
+    Mit on_segment(index, audio_bytes) wird jedes Segment sofort weitergereicht (z.B. an audio.Mp3Assembler)
+    statt bis zum Ende im Speicher gehalten zu werden; die Reihenfolge der Aufrufe ist dann beliebig.
+    Wird der Job abgebrochen (siehe cancellation.py), wirft die Funktion Cancelled; bereits weitergereichte Segmente bleiben im Cache.
+    """
+    chunks: List[str] = []
+    segments: Dict[int, bytes] = {}
+    stream_finished = False
+    completed = 0
+    reused_chunks = reused_chars = synthesized_chunks = synthesized_chars = 0
+    max_workers = max(1, min(max_workers, ELEVENLABS_MAX_CONCURRENCY))
 
-        full_audio_bytes = b"".join(audio_chunks)
+    def _first_round_indices() -> Iterator[int]:
+        nonlocal stream_finished
+        for chunk in text_chunks:
+            chunks.append(chunk)
+            yield len(chunks) - 1
+        stream_finished = True
 
-        if full_audio_bytes:
-            logger.info("Audio-Bytes erfolgreich zusammengefügt.")
-            return full_audio_bytes
+    def _worker(chunk_index: int) -> Tuple[bytes, bool]:
+        was_cached = is_audio_chunk_cached(chunks[chunk_index], voice_id)
+        return synthesize_audio_chunk(chunks[chunk_index], api_key, voice_id), was_cached
+
+    pending: List[int] = []
+    for attempt in range(max_retries + 1):
+        if attempt == 0:
+            indices: Iterable[int] = _first_round_indices()
         else:
-            logger.error("Zusammenfügen der Audio-Chunks ergab keine Daten.")
-            return None
+            backoff = min(2 ** attempt, 30)
+            logger.info(f"Wiederhole {len(pending)} fehlgeschlagene Audio-Chunks in {backoff}s (Versuch {attempt + 1})...")
+            cancellable_sleep(backoff)
+            indices = pending
 
-    except Exception as e:
-        logger.error(f"Fehler bei der Audio-Generierung durch ElevenLabs: {e}", exc_info=True)
-        return None
+        failed = []
+        for position, worker_result, error in run_bounded(indices, _worker, max_workers, initializer):
+            # Im ersten Durchlauf entspricht die Position dem Chunk-Index
+            chunk_index = position if attempt == 0 else pending[position]
+            if error is None and worker_result[0]:
+                audio_bytes, was_cached = worker_result
+                if on_segment is not None:
+                    on_segment(chunk_index, audio_bytes)
+                else:
+                    segments[chunk_index] = audio_bytes
+                chunk_chars = len(normalize_chunk_text(chunks[chunk_index]))
+                if was_cached:
+                    reused_chunks += 1
+                    reused_chars += chunk_chars
+                else:
+                    synthesized_chunks += 1
+                    synthesized_chars += chunk_chars
+                completed += 1
+                if on_progress:
+                    on_progress(completed, len(chunks) if stream_finished else None)
+            else:
+                logger.warning(f"Audio-Chunk {chunk_index + 1} fehlgeschlagen: {error}")
+                failed.append(chunk_index)
+
+        pending = sorted(failed)
+        if not pending:
+            break
+
+    logger.info(
+        f"Audio-Synthese: {reused_chunks} Chunks ({reused_chars} Zeichen) wiederverwendet, "
+        f"{synthesized_chunks} Chunks ({synthesized_chars} Zeichen) neu synthetisiert."
+    )
+    return SynthesisResult(
+        [segments.get(index) for index in range(len(chunks))] if on_segment is None else [], pending,
+        reused_chunks, reused_chars, synthesized_chunks, synthesized_chars, len(chunks),
+    )
@@ -0,0 +1,233 @@
+# audio.py
+
+import logging
+import re
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Streamlit liefert Dateien im Ordner static/ neben dem App-Skript selbst aus (server.enableStaticServing in
+# .streamlit/config.toml): direkt von der Platte und mit Range-Anfragen, ohne sie in den Session-Speicher zu laden
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_URL = "/app/static"
+# Größere Dateien lehnt Streamlits Static-Serving ab
+STATIC_MAX_BYTES = 200 * 1024 * 1024
+# Fertige Hörbücher laufender und fertiger Jobs; die Dateinamen enthalten ein zufälliges Token, da die
+# statischen URLs ohne Session erreichbar sind
+DEFAULT_AUDIO_DIR = STATIC_DIR / "audio"
+# Absätze, die ein neues Kapitel einleiten (für die optionale Aufteilung in Kapiteldateien)
+CHAPTER_HEADING_PATTERN = re.compile(r"^\s*(kapitel|chapter|teil|part|prolog|epilog|nachwort|vorwort)\b", re.IGNORECASE)
+CHAPTER_HEADING_MAX_CHARS = 80
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+# Bitraten (kbit/s) je (MPEG-1?, Layer) und Abtastraten je Version (Bits 4-3 des zweiten Header-Bytes)
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {0b11: (44100, 48000, 32000), 0b10: (22050, 24000, 16000), 0b00: (11025, 12000, 8000)}
+
+
+def _frame_info(data: Union[bytes, memoryview], offset: int) -> Union[Tuple[int, int], None]:
+    """
+    Liest den MPEG-Audio-Frame-Header an offset. Gibt (Frame-Länge, Offset des Xing/Info-Tags) zurück
+    oder None, wenn dort kein gültiger Frame beginnt.
+    """
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (data[offset + 1] >> 3) & 0b11
+    layer = 4 - ((data[offset + 1] >> 1) & 0b11)
+    bitrate_index = data[offset + 2] >> 4
+    sample_rate_index = (data[offset + 2] >> 2) & 0b11
+    if version_bits == 0b01 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    mpeg1 = version_bits == 0b11
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (data[offset + 2] >> 1) & 1
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and not mpeg1:
+        length = 72 * bitrate // sample_rate + padding
+    else:
+        length = 144 * bitrate // sample_rate + padding
+    mono = data[offset + 3] >> 6 == 0b11
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    return length, offset + 4 + side_info
+
+
+def _id3v2_length(data: Union[bytes, memoryview]) -> int:
+    if len(data) < 10 or bytes(data[:3]) != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def mp3_frame_span(data: bytes) -> Tuple[int, int]:
+    """
+    Bereich (start, stop) der reinen Audio-Frames eines MP3-Segments: ohne ID3v2-Tag am Anfang, ohne
+    Xing/Info/VBRI-Frame (dessen Dauer- und Größenangaben nach dem Aneinanderhängen falsch wären)
+    und ohne alles nach dem letzten vollständigen Frame (ID3v1/APE-Tags, abgeschnittene Frames).
+    """
+    view = memoryview(data)
+    start = _id3v2_length(view)
+    # Bis zum ersten gültigen Frame vorspulen, dem ein zweiter gültiger Frame folgt
+    while start < len(view):
+        info = _frame_info(view, start)
+        if info is not None and (start + info[0] == len(view) or _frame_info(view, start + info[0]) is not None):
+            break
+        start += 1
+    else:
+        return len(view), len(view)
+
+    frame_length, tag_offset = _frame_info(view, start)
+    if bytes(view[tag_offset:tag_offset + 4]) in (b"Xing", b"Info") or bytes(view[start + 36:start + 40]) == b"VBRI":
+        start += frame_length
+
+    stop = start
+    while True:
+        info = _frame_info(view, stop)
+        if info is None or stop + info[0] > len(view):
+            break
+        stop += info[0]
+    return start, stop
+
+
+def static_url(path: Union[str, Path]) -> str:
+    """URL, unter der Streamlit eine Datei unterhalb von STATIC_DIR ausliefert."""
+    return f"{STATIC_URL}/{Path(path).resolve().relative_to(STATIC_DIR.resolve()).as_posix()}"
+
+
+def limit_part_size(spans: List[Tuple[int, int]], starts: Iterable[int], max_bytes: int) -> List[int]:
+    """
+    Ergänzt die Segment-Indizes, mit denen ein Teil beginnt, sodass kein Teil größer als max_bytes wird
+    (spans wie Mp3Assembler.spans). Ein einzelnes Segment über max_bytes bleibt ein eigener Teil.
+    """
+    starts = sorted({0, *(index for index in starts if 0 < index < len(spans))})
+    limited = []
+    for first, last in zip(starts, starts[1:] + [len(spans)]):
+        limited.append(first)
+        part_begin = spans[first][0]
+        for index in range(first + 1, last):
+            if spans[index][1] - part_begin > max_bytes:
+                limited.append(index)
+                part_begin = spans[index][0]
+    return limited
+
+
+def contains_chapter_heading(text: str) -> bool:
+    """Prüft, ob ein Absatz des Textes wie eine Kapitelüberschrift aussieht (z.B. 'Kapitel 3', 'Prolog')."""
+    return any(
+        len(paragraph.strip()) <= CHAPTER_HEADING_MAX_CHARS and CHAPTER_HEADING_PATTERN.match(paragraph)
+        for paragraph in text.split("\n")
+    )
+
+
+def mark_chapters(chunks: Iterable[str], chapter_starts: List[int]) -> Iterator[str]:
+    """
+    Reicht die Text-Chunks unverändert durch und trägt in chapter_starts die Indizes der Chunks ein,
+    mit denen ein neues Kapitel beginnt (der Chunk, der die Überschrift enthält; Chunk 0 nie).
+    """
+    for index, chunk in enumerate(chunks):
+        if index and contains_chapter_heading(chunk):
+            chapter_starts.append(index)
+        yield chunk
+
+
+class Mp3Assembler:
+    """
+    Fügt die MP3-Segmente eines Hörbuchs direkt in einer Datei zusammen, statt sie im Speicher zu sammeln.
+    Segmente dürfen in beliebiger Reihenfolge ankommen (parallele Synthese, Wiederholungen): das jeweils
+    nächste wird sofort angehängt, vorauseilende werden bis dahin als Teildateien neben der Zieldatei abgelegt.
+    Von jedem Segment werden nur die Audio-Frames übernommen (siehe mp3_frame_span), sodass die Datei
+    an den Grenzen keine doppelten ID3-/Xing-Header enthält.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: Union[BinaryIO, None] = open(self.path, "wb")
+        self._next_index = 0
+        self._size = 0
+        self._spilled: Dict[int, Path] = {}
+        self.chapter_paths: List[Path] = []
+        # Byte-Bereich jedes Segments in der fertigen Datei (für die Aufteilung in Kapitel)
+        self.spans: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        """Anzahl der bereits angehängten Segmente."""
+        return self._next_index
+
+    def _part_path(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{index}.part")
+
+    def _append(self, data: Union[bytes, memoryview]):
+        start, stop = mp3_frame_span(data)
+        if stop == start and len(data):
+            logger.warning(f"Segment {self._next_index + 1} enthält keine gültigen MP3-Frames und wird übersprungen.")
+        self._file.write(memoryview(data)[start:stop])
+        self.spans.append((self._size, self._size + stop - start))
+        self._size += stop - start
+        self._next_index += 1
+
+    def add(self, index: int, data: bytes):
+        """Übernimmt das Segment index; wird in Chunk-Reihenfolge angehängt."""
+        if index < self._next_index or index in self._spilled:
+            raise ValueError(f"Segment {index} wurde bereits übernommen.")
+        if index != self._next_index:
+            part_path = self._part_path(index)
+            part_path.write_bytes(data)
+            self._spilled[index] = part_path
+            return
+        self._append(data)
+        while self._next_index in self._spilled:
+            part_path = self._spilled.pop(self._next_index)
+            self._append(part_path.read_bytes())
+            part_path.unlink()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def split(self, chapter_starts: Iterable[int], output_dir: Union[str, Path, None] = None, stem: Union[str, None] = None) -> List[Path]:
+        """
+        Schreibt je Kapitel eine eigene Datei <stem>_<nr>.mp3; chapter_starts sind die Segment-Indizes, mit denen
+        ein neues Kapitel beginnt (Segment 0 beginnt immer eines). Gibt die Pfade in Kapitelreihenfolge zurück.
+        """
+        self.close()
+        output_dir = Path(output_dir) if output_dir is not None else self.path.parent
+        stem = stem or self.path.stem
+        output_dir.mkdir(parents=True, exist_ok=True)
+        starts = sorted({0, *(index for index in chapter_starts if 0 < index < len(self.spans))})
+        paths = []
+        with open(self.path, "rb") as source:
+            for number, (first, last) in enumerate(zip(starts, starts[1:] + [len(self.spans)]), 1):
+                chapter_path = output_dir / f"{stem}_{number:02d}.mp3"
+                begin, end = self.spans[first][0], self.spans[last - 1][1]
+                source.seek(begin)
+                with open(chapter_path, "wb") as target:
+                    remaining = end - begin
+                    while remaining:
+                        block = source.read(min(_COPY_CHUNK_BYTES, remaining))
+                        target.write(block)
+                        remaining -= len(block)
+                paths.append(chapter_path)
+        self.chapter_paths = paths
+        return paths
+
+    def discard(self):
+        """Schließt und löscht die Datei samt Teil- und Kapiteldateien."""
+        self.close()
+        for part_path in [*self._spilled.values(), *self.chapter_paths]:
+            part_path.unlink(missing_ok=True)
+        self._spilled.clear()
+        self.chapter_paths = []
+        self.path.unlink(missing_ok=True)
+
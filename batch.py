@@ -0,0 +1,96 @@
+# batch.py
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Iterable, Iterator, Tuple, Union
+import contextvars
+import logging
+
+from cancellation import CANCEL_POLL_SECONDS, Cancelled, current_scope
+
+logger = logging.getLogger(__name__)
+
+# Standardwert und Obergrenze für parallele Anfragen an die APIs
+DEFAULT_MAX_WORKERS = 4
+MAX_PARALLEL_REQUESTS = 8
+
+
+def streamlit_thread_initializer() -> Union[Callable[[], None], None]:
+    """
+    Gibt eine Initialisierungsfunktion zurück, die den aktuellen Streamlit-Skriptkontext
+    an Worker-Threads weitergibt. So funktionieren st.cache_data, st.warning usw.
+    auch innerhalb der Threads. Außerhalb von Streamlit wird None zurückgegeben.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return None
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+
+    def _attach_ctx():
+        add_script_run_ctx(ctx=ctx)
+
+    return _attach_ctx
+
+
+def run_bounded(
+    items: Iterable[Any],
+    worker: Callable[[Any], Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    initializer: Union[Callable[[], None], None] = None,
+) -> Iterator[Tuple[int, Any, Union[Exception, None]]]:
+    """
+    Führt worker(item) für alle Elemente mit höchstens max_workers gleichzeitigen Aufrufen aus.
+    Die Elemente werden erst bei Bedarf aus dem Iterable gelesen, es darf also auch ein Generator sein.
+    Liefert (index, ergebnis, fehler) in der Reihenfolge, in der die Aufrufe fertig werden.
+    Der index entspricht der Position im Eingabe-Iterable, damit die ursprüngliche Reihenfolge
+    wiederhergestellt werden kann.
+    Jeder Aufruf läuft in einer Kopie des aufrufenden contextvars-Kontexts (z.B. für die Job-Traces in metrics).
+    Wird der aktuelle Abbruch-Scope abgebrochen oder läuft seine Frist ab, startet kein weiteres Element und
+    run_bounded wirft Cancelled; bereits gelieferte Ergebnisse bleiben beim Aufrufer.
+    """
+    max_workers = max(1, int(max_workers))
+    item_iter = enumerate(items)
+    in_flight = {}
+    # Abbruch-Scope des Aufrufers (siehe cancellation.py): danach wird nichts mehr gestartet
+    scope = current_scope()
+    executor = ThreadPoolExecutor(max_workers=max_workers, initializer=initializer)
+
+    def _submit_next() -> bool:
+        if scope is not None and scope.cancelled:
+            return False
+        try:
+            index, item = next(item_iter)
+        except StopIteration:
+            return False
+        in_flight[executor.submit(contextvars.copy_context().run, worker, item)] = index
+        return True
+
+    try:
+        # Fülle die Warteschlange nur bis zur Parallelitätsgrenze
+        while len(in_flight) < max_workers and _submit_next():
+            pass
+
+        while in_flight:
+            done, _ = wait(in_flight, timeout=CANCEL_POLL_SECONDS if scope is not None else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                error = future.exception()
+                if isinstance(error, Cancelled):
+                    raise error
+                if error is not None:
+                    logger.error(f"Fehler bei der Verarbeitung von Element {index}: {error}", exc_info=error)
+                    yield index, None, error
+                else:
+                    yield index, future.result(), None
+                _submit_next()
+            if scope is not None:
+                scope.check()
+        if scope is not None:
+            scope.check()
+    finally:
+        # Nach einem Abbruch werden laufende Aufrufe nicht abgewartet; sie enden selbst an ihrer
+        # nächsten Prüfstelle bzw. spätestens mit dem auf die Frist gekürzten Zeitlimit ihrer Anfrage
+        executor.shutdown(wait=scope is None or not scope.cancelled, cancel_futures=True)
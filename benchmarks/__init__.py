@@ -0,0 +1,9 @@
+"""
+Offline-Benchmarks für die Bild- und Audio-Pipelines.
+
+Gemini und ElevenLabs werden durch Fakes mit einstellbarer Latenz, Fehler- und Rate-Limit-Quote ersetzt;
+es werden weder API-Schlüssel noch Netzwerk benötigt. Aufruf aus dem Projektverzeichnis:
+
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --profile realistic --compare benchmarks/results/<vorheriger Lauf>.json
+"""
@@ -0,0 +1,177 @@
+# benchmarks/fakes.py
+
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Union
+
+from elevenlabs.core.api_error import ApiError
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+
+import api_calls
+import dedup
+import result_cache
+from providers import StubBackend, TextResponse, use_backend
+from rate_limit import RequestScheduler
+
+
+class FakeProfile(NamedTuple):
+    """
+    Verhalten eines Fake-Backends. Latenzen in Sekunden; error_rate und rate_limit_rate sind
+    Wahrscheinlichkeiten pro Aufruf. per_char_seconds verlängert Aufrufe proportional zur Textlänge (TTS).
+    fast_model_factor skaliert die Latenz schneller Modelle (Modellname mit 'flash').
+    """
+    latency: float = 0.02
+    jitter: float = 0.0
+    per_char_seconds: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_delay: float = 0.1
+    fast_model_factor: float = 0.4
+    seed: int = 42
+
+
+# Vordefinierte Profile: 'fast' misst den Eigenaufwand der Pipeline, 'realistic' typische
+# Antwortzeiten der APIs und 'flaky' zusätzlich Ausfälle und Rate-Limits
+PROFILES: Dict[str, Dict[str, FakeProfile]] = {
+    "fast": {
+        "gemini": FakeProfile(latency=0.02),
+        "tts": FakeProfile(latency=0.02),
+    },
+    "realistic": {
+        "gemini": FakeProfile(latency=1.5, jitter=0.5),
+        "tts": FakeProfile(latency=0.8, jitter=0.2, per_char_seconds=0.0002),
+    },
+    "flaky": {
+        "gemini": FakeProfile(latency=1.5, jitter=0.5, error_rate=0.03, rate_limit_rate=0.05, retry_delay=0.5),
+        "tts": FakeProfile(latency=0.8, jitter=0.2, per_char_seconds=0.0002, error_rate=0.05, rate_limit_rate=0.05),
+    },
+}
+
+
+class FakeStats:
+    """Zählt die Aufrufe eines Fake-Backends (thread-sicher)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def count(self, outcome: str = "ok"):
+        with self._lock:
+            self.calls += 1
+            if outcome == "error":
+                self.errors += 1
+            elif outcome == "rate_limited":
+                self.rate_limited += 1
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors, "rate_limited": self.rate_limited}
+
+
+class _Roller:
+    """Simuliert Antwortzeit und Fehler eines Dienstes gemäß Profil."""
+
+    def __init__(self, profile: FakeProfile, stats: FakeStats):
+        self.profile = profile
+        self.stats = stats
+        self._random = random.Random(profile.seed)
+        self._lock = threading.Lock()
+
+    def roll(self, text_length: int = 0, latency_factor: float = 1.0) -> str:
+        """Wartet die simulierte Antwortzeit ab und gibt 'ok', 'error' oder 'rate_limited' zurück."""
+        with self._lock:
+            jitter = self._random.uniform(-self.profile.jitter, self.profile.jitter)
+            draw = self._random.random()
+        time.sleep(max(0.0, (self.profile.latency + jitter) * latency_factor + self.profile.per_char_seconds * text_length))
+        if draw < self.profile.rate_limit_rate:
+            outcome = "rate_limited"
+        elif draw < self.profile.rate_limit_rate + self.profile.error_rate:
+            outcome = "error"
+        else:
+            outcome = "ok"
+        self.stats.count(outcome)
+        return outcome
+
+
+class FakeBackendStats(NamedTuple):
+    gemini: FakeStats
+    tts: FakeStats
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"gemini": self.gemini.to_dict(), "tts": self.tts.to_dict()}
+
+
+class FakeBackend(StubBackend):
+    """
+    Stub-Backend mit Latenz-, Fehler- und Rate-Limit-Profil je Dienst.
+    Fehler entsprechen denen der echten SDKs (ResourceExhausted/ServiceUnavailable bzw. ApiError 429/503).
+    """
+
+    def __init__(self, gemini_profile: FakeProfile, tts_profile: FakeProfile):
+        super().__init__()
+        self.stats = FakeBackendStats(FakeStats(), FakeStats())
+        self._gemini = _Roller(gemini_profile, self.stats.gemini)
+        self._tts = _Roller(tts_profile, self.stats.tts)
+
+    def generate_content(self, model_name: str, contents: List[Any], **kwargs: Any) -> TextResponse:
+        outcome = self._gemini.roll(latency_factor=self._gemini.profile.fast_model_factor if "flash" in model_name else 1.0)
+        if outcome == "rate_limited":
+            raise ResourceExhausted(f"Quota exceeded (fake). Please retry in {self._gemini.profile.retry_delay}s.")
+        if outcome == "error":
+            raise ServiceUnavailable("Fake-Backend vorübergehend nicht erreichbar.")
+        return super().generate_content(model_name, contents, **kwargs)
+
+    def text_to_speech(self, api_key: str, voice_id: str, text: str, model_id: str, timeout: Union[float, None] = None) -> Iterable[bytes]:
+        outcome = self._tts.roll(len(text))
+        if outcome == "rate_limited":
+            raise ApiError(status_code=429, body={"detail": "too_many_concurrent_requests (fake)"})
+        if outcome == "error":
+            raise ApiError(status_code=503, body={"detail": "service_unavailable (fake)"})
+        return super().text_to_speech(api_key, voice_id, text, model_id, timeout)
+
+
+@contextmanager
+def fake_backends(
+    gemini_profile: FakeProfile,
+    tts_profile: FakeProfile,
+    requests_per_minute: float = 60000,
+    retry_base_delay: float = 0.1,
+) -> Iterator[FakeBackendStats]:
+    """
+    Setzt für die Dauer des Blocks ein FakeBackend ein und ersetzt den Gemini-Scheduler.
+    Der Scheduler bekommt ein hohes Budget und kurze Backoffs, damit die Messung den Eigenaufwand
+    der Pipeline und die simulierten Antwortzeiten zeigt, nicht das Minutenbudget des Abos.
+    """
+    backend = FakeBackend(gemini_profile, tts_profile)
+    scheduler = RequestScheduler(
+        requests_per_minute, retry_exceptions=(ResourceExhausted,),
+        max_retries=api_calls.GEMINI_MAX_RETRIES, base_delay=retry_base_delay, max_delay=retry_base_delay * 8,
+        name="Gemini (Fake)",
+    )
+    original_scheduler, api_calls.gemini_scheduler = api_calls.gemini_scheduler, scheduler
+    try:
+        with use_backend(backend):
+            yield backend.stats
+    finally:
+        api_calls.gemini_scheduler = original_scheduler
+
+
+@contextmanager
+def isolated_cache() -> Iterator[str]:
+    """
+    Leitet Ergebnis-Cache und Duplikat-Index in ein temporäres Verzeichnis um,
+    damit jede Messung mit kaltem Cache startet und den Cache des Nutzers nicht berührt.
+    """
+    with tempfile.TemporaryDirectory(prefix="seo-helper-bench-") as tmp_dir:
+        originals = (result_cache._default_cache, dedup._default_index)
+        result_cache._default_cache = result_cache.ResultCache(tmp_dir)
+        dedup._default_index = dedup.ImageHashIndex(f"{tmp_dir}/phash.sqlite3")
+        try:
+            yield tmp_dir
+        finally:
+            result_cache._default_cache, dedup._default_index = originals
@@ -0,0 +1,125 @@
+# benchmarks/import_time.py
+"""
+Misst die Importzeit der Einstiegsmodule (Kaltstart der App bzw. des CLI) mit `python -X importtime`.
+
+Beispiele:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --targets seo_app --repeat 10 --compare benchmarks/results/import-time-<...>.json
+
+Jede Messung läuft in einem frischen Interpreter. Der Bericht enthält die Gesamtzeit je Modul, die teuersten
+direkten Importe und welche der bewusst verzögert geladenen Abhängigkeiten (siehe preload.py) trotzdem
+beim Start geladen wurden. Mit --check-lazy endet der Lauf dann mit Exit-Code 1.
+"""
+
+import argparse
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.run import DEFAULT_RESULTS_DIR, ROOT_DIR, _git_commit, compare_results
+from preload import GEMINI_MODULES, EXPORT_MODULES, TTS_MODULES
+
+DEFAULT_TARGETS = ("seo_app", "cli", "api_calls", "utils")
+# Diese Module dürfen beim Start nicht geladen werden; sie kommen erst mit dem ersten Tab bzw. Job
+LAZY_MODULES = GEMINI_MODULES + EXPORT_MODULES + TTS_MODULES + ("google.api_core", "grpc", "pandas", "pyarrow")
+TOP_IMPORTS = 10
+
+# "import time: self [us] | cumulative | paket" – die Einrückung des Namens gibt die Verschachtelung an
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def profile_import(target: str) -> Dict[str, Any]:
+    """Importiert target in einem frischen Interpreter und wertet die -X importtime-Ausgabe aus."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {target}"],
+        cwd=ROOT_DIR, capture_output=True, text=True,
+    )
+    cumulative: Dict[str, int] = {}
+    direct: Dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        cumulative[name] = cumulative_us
+        if len(indent) == 2:
+            direct[name] = cumulative_us
+    if target not in cumulative:
+        raise RuntimeError(f"Import von {target} fehlgeschlagen:\n{completed.stderr[-2000:]}")
+    return {
+        "seconds": cumulative[target] / 1e6,
+        "direct_imports": direct,
+        "lazy_modules_loaded": [name for name in LAZY_MODULES if name in cumulative],
+    }
+
+
+def profile_target(target: str, repeat: int) -> Dict[str, Any]:
+    runs = [profile_import(target) for _ in range(repeat)]
+    seconds = [run["seconds"] for run in runs]
+    median = statistics.median(seconds)
+    # Aufschlüsselung aus dem Lauf, der dem Median am nächsten liegt
+    representative = min(runs, key=lambda run: abs(run["seconds"] - median))
+    top = sorted(representative["direct_imports"].items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+    return {
+        "seconds": {
+            "min": round(min(seconds), 4), "median": round(median, 4), "mean": round(statistics.mean(seconds), 4),
+            "max": round(max(seconds), 4), "runs": [round(value, 4) for value in seconds],
+        },
+        "direct_imports_ms": {name: round(cumulative_us / 1000, 1) for name, cumulative_us in top},
+        "lazy_modules_loaded": representative["lazy_modules_loaded"],
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Importzeit der Einstiegsmodule messen.")
+    parser.add_argument("--targets", nargs="+", default=list(DEFAULT_TARGETS), help="Zu importierende Module.")
+    parser.add_argument("--repeat", type=int, default=5, help="Messungen je Modul (Standard: 5).")
+    parser.add_argument("--output", help=f"Ergebnisdatei (Standard: {DEFAULT_RESULTS_DIR.relative_to(ROOT_DIR)}/import-time-<Zeitstempel>.json).")
+    parser.add_argument("--compare", help="Früherer Bericht (JSON), mit dem verglichen wird.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Erlaubte Verlangsamung beim Vergleich (Standard: 0.15 = 15 %%).")
+    parser.add_argument("--check-lazy", action="store_true", help="Exit-Code 1, wenn verzögert geladene Module beim Start importiert werden.")
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    created = datetime.now(timezone.utc)
+    report: Dict[str, Any] = {
+        "created": created.isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"targets": args.targets, "repeat": args.repeat},
+        "benchmarks": {},
+    }
+    eager_loads = False
+    for target in args.targets:
+        result = profile_target(target, args.repeat)
+        report["benchmarks"][f"import {target}"] = result
+        print(f"import {target:<12} Median {result['seconds']['median'] * 1000:7.0f} ms")
+        for name, milliseconds in result["direct_imports_ms"].items():
+            print(f"    {milliseconds:8.1f} ms  {name}")
+        if result["lazy_modules_loaded"]:
+            eager_loads = True
+            print(f"    Achtung: beim Start geladen: {', '.join(result['lazy_modules_loaded'])}")
+
+    output = Path(args.output) if args.output else DEFAULT_RESULTS_DIR / f"import-time-{created.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Ergebnisse in {output}")
+
+    failed = args.check_lazy and eager_loads
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        failed = bool(compare_results(report, previous, args.tolerance)) or failed
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,632 @@
+# benchmarks/run.py
+"""
+Führt die Offline-Benchmarks aus und schreibt die Ergebnisse als JSON.
+
+Beispiele:
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --only image_batch tts --profile realistic
+    python -m benchmarks.run --compare benchmarks/results/baseline.json --tolerance 0.15
+
+Mit --compare wird jede Messung mit einem früheren Lauf verglichen; ist ein Benchmark um mehr als
+--tolerance langsamer (Median), endet der Lauf mit Exit-Code 1.
+"""
+
+import argparse
+import io
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Union
+
+import docx  # python-docx (nur für Testdaten und den Vergleich)
+import fitz  # PyMuPDF
+from elevenlabs.client import ElevenLabs
+from PIL import Image, ImageDraw
+
+import routing
+from api_calls import synthesize_chunks_parallel
+from audio import Mp3Assembler
+from benchmarks.fakes import PROFILES, fake_backends, isolated_cache
+from export import available_formats, write_rows
+from image_pipeline import prepare_image_batch, find_duplicate_groups, generate_image_batch, is_successful, export_row
+from metrics import registry
+from providers import LiveBackend
+from utils import (
+    chunk_text, iter_stable_chunks, read_text_from_pdf, prepare_image_for_api, convert_tiff_to_png_bytes, iter_docx_text,
+    PdfTextStats, iter_pdf_text,
+)
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Problemgrößen: (--quick, Standard)
+SIZES = {
+    "images": (16, 64),
+    "image_edge": (1600, 3000),
+    "icons": (32, 200),
+    "routed_images": (24, 96),
+    "shared_images": (16, 64),
+    "tts_chars": (60_000, 400_000),
+    "text_chars": (500_000, 5_000_000),
+    "pdf_pages": (40, 300),
+    "docx_chars": (400_000, 2_500_000),
+    "tiff_edge": (2000, 5000),
+    "export_rows": (2_000, 50_000),
+    "client_lookups": (50, 200),
+}
+
+_WORDS = (
+    "das die der und ein eine Bild Diagramm zeigt Kapitel Abschnitt Wert Tabelle Grafik Leser "
+    "Beschreibung barrierefrei Umsatz Entwicklung steigt fällt Jahr Monat Übersicht Größe Farbe"
+).split()
+
+
+class InMemoryUpload:
+    """Synthetischer Upload mit .name und .getvalue()."""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.data = data
+
+    def getvalue(self) -> bytes:
+        return self.data
+
+
+# --- Testdaten ---
+
+def synthetic_text(chars: int, seed: int = 1) -> str:
+    """Deutscher Pseudo-Fließtext mit Absätzen, reproduzierbar über den Seed."""
+    rng = random.Random(seed)
+    paragraphs: List[str] = []
+    length = 0
+    while length < chars:
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 18))]
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:chars]
+
+
+def synthetic_photo(edge: int, seed: int, fmt: str = "JPEG") -> bytes:
+    """Fotoähnliches Bild (Verlauf plus Rauschen) im gewünschten Format."""
+    width, height = edge, edge * 3 // 4
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient("L").resize((width, height)).rotate(rng.randint(0, 359))
+    noise = Image.effect_noise((width, height), 40)
+    channels = [Image.blend(gradient, noise, rng.uniform(0.2, 0.6)) for _ in range(3)]
+    buffer = io.BytesIO()
+    Image.merge("RGB", channels).save(buffer, format=fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+def synthetic_chart(edge: int, seed: int) -> bytes:
+    """Balkendiagramm mit Gitter und Beschriftungen (komplexes Bild für das Modell-Routing) als PNG."""
+    width, height = edge, edge * 3 // 4
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for x in range(0, width, max(8, edge // 20)):
+        draw.line((x, 0, x, height), fill=(200, 200, 200))
+    for y in range(0, height, max(8, edge // 20)):
+        draw.line((0, y, width, y), fill=(200, 200, 200))
+    bar_width = width // 16
+    for index in range(12):
+        left = bar_width + index * bar_width * 5 // 4
+        draw.rectangle((left, rng.randint(height // 8, height * 3 // 4), left + bar_width, height - 20), fill=rng.choice(("navy", "darkorange", "seagreen")))
+        draw.text((left, height - 16), f"Q{index + 1}", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def synthetic_pdf(pages: int, chars_per_page: int = 3000, running_heads: bool = False) -> bytes:
+    """PDF mit pages Seiten Fließtext; mit running_heads zusätzlich Kolumnentitel und Seitenzahlen wie in einem Buch."""
+    document = fitz.open()
+    text = synthetic_text(pages * chars_per_page)
+    for page_index in range(pages):
+        page = document.new_page()
+        page_text = text[page_index * chars_per_page:(page_index + 1) * chars_per_page]
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), page_text, fontsize=8)
+        if running_heads:
+            heading = "Barrierefreie Bilder im Verlag" if page_index % 2 else f"Kapitel {page_index // 20 + 1} · Grundlagen"
+            page.insert_text((50, 35), heading, fontsize=8)
+            page.insert_text((page.rect.width / 2, page.rect.height - 25), f"Seite {page_index + 1}", fontsize=8)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def synthetic_docx(chars: int) -> bytes:
+    """DOCX mit Fließtext und alle 40 Absätze einer kleinen Tabelle."""
+    document = docx.Document()
+    for index, paragraph in enumerate(synthetic_text(chars, seed=9).split("\n\n")):
+        document.add_paragraph(paragraph)
+        if index % 40 == 39:
+            table = document.add_table(rows=3, cols=3)
+            for cell_index, cell in enumerate(table._cells):
+                cell.text = f"Wert {index}.{cell_index}"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _peak_memory(run: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# --- Messung ---
+
+def measure(run_once: Callable[[], Dict[str, Any]], repeat: int, work: Callable[[Dict[str, Any]], float], unit: str) -> Dict[str, Any]:
+    """
+    Führt run_once() repeat Mal aus und fasst die Laufzeiten zusammen.
+    run_once gibt Zähler des Laufs zurück; work(zähler) liefert die Arbeitsmenge für den Durchsatz.
+    """
+    seconds: List[float] = []
+    counters: Dict[str, Any] = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counters = run_once()
+        seconds.append(time.perf_counter() - start)
+    median = statistics.median(seconds)
+    return {
+        "seconds": {
+            "min": round(min(seconds), 4), "median": round(median, 4), "mean": round(statistics.mean(seconds), 4),
+            "max": round(max(seconds), 4), "runs": [round(value, 4) for value in seconds],
+        },
+        "throughput": {"value": round(work(counters) / median, 2) if median > 0 else None, "unit": f"{unit}/s"},
+        "counters": counters,
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Dict[str, Any]]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    def decorator(fn: Callable[[argparse.Namespace], Dict[str, Any]]) -> Callable:
+        BENCHMARKS[name] = fn
+        return fn
+    return decorator
+
+
+def _size(args: argparse.Namespace, name: str) -> int:
+    return SIZES[name][0 if args.quick else 1]
+
+
+@benchmark("image_batch")
+def bench_image_batch(args: argparse.Namespace) -> Dict[str, Any]:
+    """Bild-Batch Ende-zu-Ende: Vorverarbeitung, dHash und Gemini-Aufrufe (Fake) mit kaltem Cache."""
+    count, edge = _size(args, "images"), _size(args, "image_edge")
+    uploads = [InMemoryUpload(f"bild_{index:04d}.jpg", synthetic_photo(edge, seed=index)) for index in range(count)]
+    image_settings = {"max_edge": 2048, "output_format": "JPEG", "quality": 85}
+
+    def run_once() -> Dict[str, Any]:
+        profiles = PROFILES[args.profile]
+        with isolated_cache(), fake_backends(profiles["gemini"], profiles["tts"]) as backends:
+            items = prepare_image_batch(uploads, image_settings, args.workers, keep_preview=False)
+            representatives = find_duplicate_groups(items, None)
+            results = dict(generate_image_batch(items, representatives, args.task, "", args.workers))
+        succeeded = sum(is_successful(result, args.task) for result in results.values())
+        return {"images": count, "succeeded": succeeded, "backend": backends.to_dict()}
+
+    result = measure(run_once, args.repeat, lambda counters: counters["images"], "images")
+    result["params"] = {"images": count, "edge": edge, "task": args.task, "workers": args.workers, "profile": args.profile}
+    return result
+
+
+@benchmark("image_packing")
+def bench_image_packing(args: argparse.Namespace) -> Dict[str, Any]:
+    """Viele kleine Bilder im SEO-Modus: gebündelte Anfragen im Vergleich zu je einer Anfrage pro Bild."""
+    count = _size(args, "icons")
+    uploads = [InMemoryUpload(f"icon_{index:04d}.png", synthetic_photo(160, seed=index, fmt="PNG")) for index in range(count)]
+    image_settings = {"max_edge": 2048, "output_format": "JPEG", "quality": 85}
+    profiles = PROFILES[args.profile]
+    with isolated_cache():
+        items = prepare_image_batch(uploads, image_settings, args.workers, keep_preview=False)
+    representatives = find_duplicate_groups(items, None)
+
+    def _run(packed: bool) -> Dict[str, Any]:
+        with isolated_cache(), fake_backends(profiles["gemini"], profiles["tts"]) as backends:
+            results = dict(generate_image_batch(items, representatives, "seo", "", args.workers, packed=packed))
+        return {
+            "images": count, "requests": backends.gemini.calls,
+            "succeeded": sum(is_successful(result, "seo") for result in results.values()),
+        }
+
+    # Vergleichswert: ein Lauf mit je einer Anfrage pro Bild
+    start = time.perf_counter()
+    single = _run(False)
+    single["seconds"] = round(time.perf_counter() - start, 4)
+
+    result = measure(lambda: _run(True), args.repeat, lambda counters: counters["images"], "images")
+    result["single_requests"] = single
+    result["params"] = {"images": count, "workers": args.workers, "profile": args.profile}
+    return result
+
+
+@benchmark("model_routing")
+def bench_model_routing(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Gemischter Batch aus Fotos und Diagrammen: Modellwahl nach Komplexität (einfache Bilder an das schnelle
+    Modell) im Vergleich zu allen Bildern über das Pro-Modell. Meldet Latenz und Rückfallquote je Route.
+    """
+    count = _size(args, "routed_images")
+    uploads = [
+        InMemoryUpload(f"bild_{index:04d}.png", synthetic_chart(1200, seed=index)) if index % 2
+        else InMemoryUpload(f"bild_{index:04d}.jpg", synthetic_photo(1600, seed=index))
+        for index in range(count)
+    ]
+    image_settings = {"max_edge": 2048, "output_format": "JPEG", "quality": 85}
+    profiles = PROFILES[args.profile]
+    with isolated_cache():
+        items = prepare_image_batch(uploads, image_settings, args.workers, keep_preview=False)
+    representatives = find_duplicate_groups(items, None)
+
+    def _run(mode: str) -> Dict[str, Any]:
+        previous, routing.MODEL_ROUTING = routing.MODEL_ROUTING, mode
+        try:
+            with isolated_cache(), fake_backends(profiles["gemini"], profiles["tts"]) as backends:
+                results = dict(generate_image_batch(items, representatives, args.task, "", args.workers))
+        finally:
+            routing.MODEL_ROUTING = previous
+        return {
+            "images": count, "requests": backends.gemini.calls,
+            "succeeded": sum(is_successful(result, args.task) for result in results.values()),
+            "fast_model": sum(result.get("model") == routing.FAST_GEMINI_MODEL for result in results.values()),
+        }
+
+    # Vergleichswert: alle Bilder über das Pro-Modell
+    start = time.perf_counter()
+    pro_only = _run("pro")
+    pro_only["seconds"] = round(time.perf_counter() - start, 4)
+
+    registry.reset()
+    result = measure(lambda: _run("auto"), args.repeat, lambda counters: counters["images"], "images")
+    result["pro_only"] = pro_only
+    result["routes"] = routing.routing_summary()
+    result["params"] = {"images": count, "task": args.task, "workers": args.workers, "profile": args.profile}
+    return result
+
+
+@benchmark("shared_batch")
+def bench_shared_batch(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Zwei Sitzungen starten gleichzeitig denselben Bild-Batch: Identische Anfragen laufen nur einmal
+    zur API (Single-Flight), die zweite Sitzung wartet auf deren Ergebnis. Meldet die Zahl der Anfragen.
+    """
+    count = _size(args, "shared_images")
+    uploads = [InMemoryUpload(f"bild_{index:04d}.jpg", synthetic_photo(1200, seed=index)) for index in range(count)]
+    image_settings = {"max_edge": 2048, "output_format": "JPEG", "quality": 85}
+    profiles = PROFILES[args.profile]
+    with isolated_cache():
+        items = prepare_image_batch(uploads, image_settings, args.workers, keep_preview=False)
+    representatives = find_duplicate_groups(items, None)
+
+    def run_once() -> Dict[str, Any]:
+        session_results: List[Dict[int, Dict[str, Any]]] = [{}, {}]
+
+        def _session(results: Dict[int, Dict[str, Any]]):
+            results.update(generate_image_batch(items, representatives, args.task, "", args.workers))
+
+        with isolated_cache(), fake_backends(profiles["gemini"], profiles["tts"]) as backends:
+            sessions = [threading.Thread(target=_session, args=(results,)) for results in session_results]
+            for session in sessions:
+                session.start()
+            for session in sessions:
+                session.join()
+        return {
+            "images": 2 * count, "requests": backends.gemini.calls,
+            "succeeded": sum(is_successful(result, args.task) for results in session_results for result in results.values()),
+        }
+
+    result = measure(run_once, args.repeat, lambda counters: counters["images"], "images")
+    result["params"] = {"images_per_session": count, "sessions": 2, "task": args.task, "workers": args.workers, "profile": args.profile}
+    return result
+
+
+@benchmark("tts")
+def bench_tts(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Audio-Synthese eines Manuskripts: stabile Chunks, parallele ElevenLabs-Aufrufe (Fake) mit kaltem Cache;
+    die Segmente werden wie in der App direkt in eine MP3-Datei geschrieben.
+    """
+    chars = _size(args, "tts_chars")
+    text = synthetic_text(chars, seed=7)
+
+    def run_once() -> Dict[str, Any]:
+        profiles = PROFILES[args.profile]
+        with isolated_cache() as tmp_dir, fake_backends(profiles["gemini"], profiles["tts"]) as backends:
+            assembler = Mp3Assembler(Path(tmp_dir) / "audiobook.mp3")
+            synthesis = synthesize_chunks_parallel(
+                iter_stable_chunks([text]), "fake-key", "fake-voice", max_workers=args.tts_workers, on_segment=assembler.add,
+            )
+            assembler.close()
+            audio_bytes = assembler.path.stat().st_size
+        return {
+            "chunks": synthesis.chunk_count, "failed_chunks": len(synthesis.failed_chunks),
+            "chars": synthesis.synthesized_chars, "audio_bytes": audio_bytes, "backend": backends.to_dict(),
+        }
+
+    result = measure(run_once, args.repeat, lambda counters: counters["chunks"], "chunks")
+    result["params"] = {"chars": chars, "workers": args.tts_workers, "profile": args.profile}
+    return result
+
+
+@benchmark("chunk_text")
+def bench_chunk_text(args: argparse.Namespace) -> Dict[str, Any]:
+    """Zerlegung eines großen Manuskripts mit chunk_text() und iter_stable_chunks()."""
+    chars = _size(args, "text_chars")
+    text = synthetic_text(chars, seed=3)
+
+    def run_once() -> Dict[str, Any]:
+        plain = chunk_text(text)
+        stable = list(iter_stable_chunks([text]))
+        return {"chars": len(text), "chunks": len(plain), "stable_chunks": len(stable)}
+
+    result = measure(run_once, args.repeat, lambda counters: counters["chars"] / 1e6, "Mio. Zeichen")
+    result["params"] = {"chars": chars}
+    return result
+
+
+@benchmark("pdf_extract")
+def bench_pdf_extract(args: argparse.Namespace) -> Dict[str, Any]:
+    """Textextraktion aus einem großen synthetischen PDF mit read_text_from_pdf()."""
+    pages = _size(args, "pdf_pages")
+    pdf_bytes = synthetic_pdf(pages)
+
+    def run_once() -> Dict[str, Any]:
+        text = read_text_from_pdf(io.BytesIO(pdf_bytes))
+        return {"pages": pages, "chars": len(text)}
+
+    result = measure(run_once, args.repeat, lambda counters: counters["pages"], "Seiten")
+    result["params"] = {"pages": pages, "pdf_bytes": len(pdf_bytes)}
+    return result
+
+
+@benchmark("pdf_cleanup")
+def bench_pdf_cleanup(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    PDF mit Kolumnentiteln und Seitenzahlen bis zu den stabilen Chunks: bereinigter Text (iter_pdf_text)
+    im Vergleich zum Rohtext der Seiten. Meldet Zeichen und Chunks vorher/nachher.
+    """
+    pages = _size(args, "pdf_pages")
+    pdf_bytes = synthetic_pdf(pages, running_heads=True)
+    raw_text = read_text_from_pdf(io.BytesIO(pdf_bytes))
+    raw = {"chars": len(raw_text), "chunks": sum(1 for _ in iter_stable_chunks([raw_text]))}
+
+    def run_once() -> Dict[str, Any]:
+        stats = PdfTextStats()
+        chunks = sum(1 for _ in iter_stable_chunks(iter_pdf_text(io.BytesIO(pdf_bytes), stats=stats)))
+        return {"pages": pages, "chunks": chunks, **stats.to_dict()}
+
+    result = measure(run_once, args.repeat, lambda counters: counters["pages"], "Seiten")
+    result["raw"] = raw
+    result["params"] = {"pages": pages, "pdf_bytes": len(pdf_bytes)}
+    return result
+
+
+@benchmark("docx_extract")
+def bench_docx_extract(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Großes DOCX-Manuskript bis zu den stabilen Chunks: gestreamte Extraktion (iter_docx_text) im Vergleich
+    zum Objektmodell von python-docx, das nur die Absätze des Haupttexts liefert.
+    """
+    chars = _size(args, "docx_chars")
+    docx_bytes = synthetic_docx(chars)
+
+    def _streamed() -> List[str]:
+        return list(iter_stable_chunks(iter_docx_text(io.BytesIO(docx_bytes))))
+
+    def _python_docx() -> List[str]:
+        document = docx.Document(io.BytesIO(docx_bytes))
+        return list(iter_stable_chunks(["\n".join(paragraph.text for paragraph in document.paragraphs)]))
+
+    def run_once() -> Dict[str, Any]:
+        start = time.perf_counter()
+        chunks = _streamed()
+        streamed_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        baseline_chunks = _python_docx()
+        baseline_seconds = time.perf_counter() - start
+        return {
+            "chars": sum(len(chunk) for chunk in chunks), "chunks": len(chunks),
+            "streamed_seconds": round(streamed_seconds, 4),
+            "python_docx_seconds": round(baseline_seconds, 4), "python_docx_chunks": len(baseline_chunks),
+        }
+
+    result = measure(run_once, args.repeat, lambda counters: counters["chars"] / 1e6, "Mio. Zeichen")
+    result["params"] = {
+        "chars": chars, "docx_bytes": len(docx_bytes),
+        "streamed_peak_bytes": _peak_memory(_streamed), "python_docx_peak_bytes": _peak_memory(_python_docx),
+    }
+    return result
+
+
+@benchmark("tiff_convert")
+def bench_tiff_convert(args: argparse.Namespace) -> Dict[str, Any]:
+    """Große TIFF-Datei: Vorverarbeitung für die API im Vergleich zur reinen PNG-Konvertierung."""
+    edge = _size(args, "tiff_edge")
+    tiff_bytes = synthetic_photo(edge, seed=11, fmt="TIFF")
+
+    def run_once() -> Dict[str, Any]:
+        start = time.perf_counter()
+        prepared = prepare_image_for_api(tiff_bytes)
+        prepare_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        png_bytes = convert_tiff_to_png_bytes(tiff_bytes)
+        png_seconds = time.perf_counter() - start
+        return {
+            "megapixels": round(edge * (edge * 3 // 4) / 1e6, 2),
+            "prepare_seconds": round(prepare_seconds, 4), "prepared_bytes": prepared.prepared_bytes,
+            "png_seconds": round(png_seconds, 4), "png_bytes": len(png_bytes),
+        }
+
+    result = measure(run_once, args.repeat, lambda counters: counters["megapixels"], "Megapixel")
+    result["params"] = {"edge": edge, "tiff_bytes": len(tiff_bytes)}
+    return result
+
+
+@benchmark("export")
+def bench_export(args: argparse.Namespace) -> Dict[str, Any]:
+    """Export vieler Ergebniszeilen in alle verfügbaren Formate (Excel, CSV, JSONL, Parquet)."""
+    row_count = _size(args, "export_rows")
+    text = synthetic_text(row_count * 200, seed=5)
+    rows = [
+        export_row("combined", {
+            "file_name": f"bild_{index:05d}.jpg",
+            "short_desc": text[index * 200:index * 200 + 60], "long_desc": text[index * 200 + 60:index * 200 + 200],
+            "alt": text[index * 200:index * 200 + 40], "title": text[index * 200 + 40:index * 200 + 60],
+        })
+        for index in range(row_count)
+    ]
+    formats = available_formats()
+
+    def run_once() -> Dict[str, Any]:
+        counters: Dict[str, Any] = {"rows": row_count}
+        for fmt in formats:
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            write_rows(rows, fmt, buffer, "Bildbeschreibungen")
+            counters[f"{fmt}_seconds"] = round(time.perf_counter() - start, 4)
+            counters[f"{fmt}_bytes"] = len(buffer.getvalue())
+        return counters
+
+    result = measure(run_once, args.repeat, lambda counters: counters["rows"] * len(formats), "Zeilen")
+    result["params"] = {"rows": row_count, "formats": formats}
+    return result
+
+
+@benchmark("client_setup")
+def bench_client_setup(args: argparse.Namespace) -> Dict[str, Any]:
+    """Aufwand pro Aufruf für den ElevenLabs-Client: neu anlegen (bisher je Chunk) gegen den langlebigen Client des Backends."""
+    lookups = _size(args, "client_lookups")
+    backend = LiveBackend()
+
+    def run_once() -> Dict[str, Any]:
+        start = time.perf_counter()
+        for _ in range(lookups):
+            ElevenLabs(api_key="bench-key", timeout=300.0)
+        fresh_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(lookups):
+            backend._speech_client("bench-key")
+        pooled_seconds = time.perf_counter() - start
+        return {
+            "lookups": lookups,
+            "fresh_ms_per_call": round(fresh_seconds / lookups * 1000, 4),
+            "pooled_ms_per_call": round(pooled_seconds / lookups * 1000, 4),
+        }
+
+    result = measure(run_once, args.repeat, lambda counters: counters["lookups"], "Clients")
+    backend.close()
+    result["params"] = {"lookups": lookups}
+    return result
+
+
+# --- Ausgabe und Vergleich ---
+
+def _git_commit() -> Union[str, None]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current: Dict[str, Any], previous: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Vergleicht die Mediane zweier Läufe und gibt die Namen der Benchmarks zurück,
+    die um mehr als tolerance (Anteil, z.B. 0.1 = 10 %) langsamer geworden sind.
+    """
+    regressions = []
+    print(f"\nVergleich mit {previous.get('git_commit') or '?'} vom {previous.get('created', '?')}:")
+    for name, result in current["benchmarks"].items():
+        old = previous.get("benchmarks", {}).get(name)
+        if old is None:
+            print(f"  {name:<14} neu")
+            continue
+        old_median, new_median = old["seconds"]["median"], result["seconds"]["median"]
+        change = (new_median - old_median) / old_median if old_median else 0.0
+        marker = ""
+        if change > tolerance:
+            marker = "  <-- langsamer"
+            regressions.append(name)
+        elif change < -tolerance:
+            marker = "  schneller"
+        print(f"  {name:<14} {old_median:>9.3f}s -> {new_median:>9.3f}s  ({change:+.1%}){marker}")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Offline-Benchmarks mit Fake-Backends für Gemini und ElevenLabs.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Nur diese Benchmarks ausführen.")
+    parser.add_argument("--quick", action="store_true", help="Kleine Problemgrößen (z.B. für CI).")
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen je Benchmark (Standard: 3).")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast", help="Latenz-/Fehlerprofil der Fake-Backends.")
+    parser.add_argument("--task", choices=("seo", "accessibility", "combined"), default="seo")
+    parser.add_argument("--workers", type=int, default=4, help="Parallele Gemini-Aufrufe.")
+    parser.add_argument("--tts-workers", type=int, default=2, help="Parallele ElevenLabs-Aufrufe.")
+    parser.add_argument("--output", help=f"Ergebnisdatei (Standard: {DEFAULT_RESULTS_DIR.relative_to(ROOT_DIR)}/<Zeitstempel>.json).")
+    parser.add_argument("--compare", help="Früherer Lauf (JSON), mit dem verglichen wird.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Erlaubte Verlangsamung beim Vergleich (Standard: 0.1 = 10 %%).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log-Ausgabe der Pipeline anzeigen.")
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, force=True)
+    if not args.verbose:
+        # api_calls setzt beim Import INFO für alle Logger; für Messungen nur Warnungen ausgeben
+        logging.getLogger().setLevel(logging.WARNING)
+
+    created = datetime.now(timezone.utc)
+    report: Dict[str, Any] = {
+        "created": created.isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        "benchmarks": {},
+    }
+    for name in args.only or list(BENCHMARKS):
+        registry.reset()
+        print(f"{name} ...", end=" ", flush=True)
+        result = BENCHMARKS[name](args)
+        result["metrics"] = registry.snapshot()
+        report["benchmarks"][name] = result
+        print(f"Median {result['seconds']['median']:.3f}s, {result['throughput']['value']} {result['throughput']['unit']}")
+
+    output = Path(args.output) if args.output else DEFAULT_RESULTS_DIR / f"{created.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Ergebnisse in {output}")
+
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if compare_results(report, previous, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# cancellation.py
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+# Wie oft blockierende Wartestellen (Worker-Pool, geteilte Anfragen) auf einen Abbruch prüfen
+CANCEL_POLL_SECONDS = 0.2
+
+
+class Cancelled(BaseException):
+    """
+    Job abgebrochen oder Frist abgelaufen. Erbt wie asyncio.CancelledError von BaseException,
+    damit die 'except Exception'-Zweige der API-Aufrufe den Abbruch nicht als Fehler verschlucken.
+    """
+
+
+class CancelScope:
+    """
+    Abbruchsignal und optionale Frist für einen Job bzw. CLI-Lauf. Wird per use_cancel_scope() für den
+    aktuellen Kontext gesetzt und gelangt über run_bounded (contextvars) auch in die Worker-Threads.
+    Wartestellen (Rate-Limit, Backoff, Worker-Pool) und Zeitlimits der Anfragen richten sich danach.
+    """
+
+    def __init__(self, timeout_seconds: Union[float, None] = None):
+        self.deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+        self.reason: Union[str, None] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "Abgebrochen"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("Frist abgelaufen")
+        return self._event.is_set()
+
+    def remaining(self) -> Union[float, None]:
+        """Verbleibende Sekunden bis zur Frist (None ohne Frist)."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    def sleep(self, seconds: float):
+        """Wartet seconds Sekunden; bricht sofort mit Cancelled ab, wenn der Scope abgebrochen wird oder die Frist abläuft."""
+        remaining = self.remaining()
+        self._event.wait(seconds if remaining is None else min(seconds, remaining))
+        self.check()
+
+
+_current_scope: contextvars.ContextVar[Union[CancelScope, None]] = contextvars.ContextVar("cancel_scope", default=None)
+
+
+@contextmanager
+def use_cancel_scope(scope: CancelScope) -> Iterator[CancelScope]:
+    """Setzt scope für den Block; Worker, die run_bounded startet, erben ihn."""
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def current_scope() -> Union[CancelScope, None]:
+    return _current_scope.get()
+
+
+def check_cancelled():
+    """Wirft Cancelled, wenn der aktuelle Scope abgebrochen oder seine Frist abgelaufen ist."""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.check()
+
+
+def cancellable_sleep(seconds: float):
+    """time.sleep(), das ein Abbruch bzw. das Ende der Frist des aktuellen Scopes unterbricht."""
+    scope = _current_scope.get()
+    if scope is None:
+        time.sleep(seconds)
+    else:
+        scope.sleep(seconds)
+
+
+def wait_for_event(event: threading.Event):
+    """Wartet auf event; bricht mit Cancelled ab, wenn der aktuelle Scope abgebrochen wird."""
+    scope = _current_scope.get()
+    while not event.wait(CANCEL_POLL_SECONDS if scope is not None else None):
+        scope.check()
+
+
+def request_timeout(default_seconds: float) -> float:
+    """
+    Zeitlimit für eine einzelne Anfrage: default_seconds, höchstens aber die Restzeit bis zur Frist
+    des aktuellen Scopes. Wirft Cancelled, wenn nichts mehr übrig ist.
+    """
+    scope = _current_scope.get()
+    if scope is None:
+        return default_seconds
+    scope.check()
+    remaining = scope.remaining()
+    return default_seconds if remaining is None else max(1.0, min(default_seconds, remaining))
@@ -0,0 +1,300 @@
+# cli.py
+"""
+Kommandozeilen-Einstieg für Batch-Läufe ohne Streamlit-Oberfläche.
+
+Beispiele:
+    python cli.py images ./bilder --task accessibility --context "Kapitel 3" --output alt_texte.xlsx
+    python cli.py tts manuskript.pdf kapitel2.docx --voice-id <VOICE_ID> --output-dir ./audio
+
+Die API-Schlüssel werden aus den Umgebungsvariablen GOOGLE_API_KEY bzw. ELEVENLABS_API_KEY gelesen.
+Jeder Lauf führt ein Journal (JSONL); wird ein abgebrochener Lauf mit demselben Journal neu gestartet,
+werden bereits fertige Elemente übersprungen, sofern sich weder ihr Inhalt noch die Einstellungen (Aufgabe,
+Kontext, Modelle, Bild- bzw. Stimmeinstellungen) geändert haben. Mit --deadline MINUTEN bzw. Strg+C wird ein Lauf sauber
+abgebrochen: Wartende Anfragen starten nicht mehr, fertige Elemente bleiben im Journal.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+from pathlib import Path
+from typing import List
+
+from api_calls import synthesize_chunks_parallel, task_signature, ELEVENLABS_MAX_CONCURRENCY, ELEVENLABS_MODEL_ID
+from audio import Mp3Assembler, mark_chapters
+from batch import DEFAULT_MAX_WORKERS, MAX_PARALLEL_REQUESTS
+from cancellation import CancelScope, Cancelled, use_cancel_scope
+from dedup import DEFAULT_INDEX_MAX_DISTANCE, DEFAULT_MAX_DISTANCE, get_image_hash_index
+from export import EXPORT_FORMATS, available_formats, write_rows_to_path
+from image_pipeline import (
+    prepare_image_batch, find_duplicate_groups, generate_image_batch, is_successful, export_row, EXPORT_SHEET_NAMES,
+)
+from journal import JobJournal
+from metrics import METRICS_FILE, use_trace, write_prometheus_file
+from providers import configure_gemini
+from result_cache import file_content_hash, make_cache_key
+from routing import MODEL_ROUTING, ROUTES, routing_summary
+from uploads import SpooledUpload
+from utils import (
+    PdfTextStats, iter_docx_text, iter_pdf_text, iter_stable_chunks,
+    DEFAULT_MAX_EDGE, DEFAULT_OUTPUT_FORMAT, DEFAULT_QUALITY, SUPPORTED_IMAGE_EXTENSIONS, SUPPORTED_OUTPUT_FORMATS,
+)
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = tuple(f".{extension}" for extension in SUPPORTED_IMAGE_EXTENSIONS)
+MANUSCRIPT_EXTENSIONS = (".pdf", ".docx")
+
+
+def _require_env(name: str) -> str:
+    value = os.environ.get(name)
+    if not value:
+        sys.exit(f"Umgebungsvariable {name} ist nicht gesetzt.")
+    return value
+
+
+def _default_journal_path(output: Path) -> Path:
+    return output.with_name(f"{output.name}.journal.jsonl")
+
+
+def _input_hash(path: Path, *settings: str) -> str:
+    """Hash über den Inhalt der Datei und alle Einstellungen, die das Ergebnis bestimmen."""
+    return make_cache_key(file_content_hash(path), *settings)
+
+
+def _is_current(entry, input_hash: str) -> bool:
+    """
+    Prüft, ob ein Journal-Eintrag zum aktuellen Inhalt und den aktuellen Einstellungen gehört
+    (siehe _input_hash); geänderte Dateien oder ein Lauf mit anderen Einstellungen werden neu verarbeitet.
+    """
+    return entry is not None and entry.get("input_hash") == input_hash
+
+
+def _default_trace_path(args: argparse.Namespace) -> Path:
+    if args.command == "images":
+        output = Path(args.output)
+        return output.with_name(f"{output.name}.trace.jsonl")
+    return Path(args.output_dir) / "tts.trace.jsonl"
+
+
+def run_images(args: argparse.Namespace) -> int:
+    """Verarbeitet alle Bilder eines Ordners und schreibt die Ergebnisse in args.output."""
+    output = Path(args.output)
+    if output.suffix.lower().lstrip(".") not in available_formats():
+        sys.exit(f"Ausgabeformat nicht unterstützt: {output.suffix} (erlaubt: {', '.join('.' + fmt for fmt in available_formats())})")
+    source_dir = Path(args.source_dir)
+    paths = sorted(
+        path for path in (source_dir.rglob("*") if args.recursive else source_dir.iterdir())
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+    if not paths:
+        sys.exit(f"Keine Bilder in {source_dir} gefunden.")
+    cancelled = None
+
+    configure_gemini(_require_env("GOOGLE_API_KEY"))
+    journal = JobJournal(args.journal or _default_journal_path(output))
+    # Elemente werden über ihren Pfad relativ zum Quellordner identifiziert; ein Ergebnis gilt nur für denselben
+    # Inhalt, dieselbe Aufgabe samt Kontext und Prompt, dieselben Modelle und dieselbe Bildaufbereitung
+    item_ids = {path: str(path.relative_to(source_dir)) for path in paths}
+    settings = (
+        "images", task_signature(args.task, args.context, ROUTES["fast"]), task_signature(args.task, args.context, ROUTES["pro"]),
+        MODEL_ROUTING, str(args.max_edge), args.format, str(args.quality),
+    )
+    input_hashes = {path: _input_hash(path, *settings) for path in paths}
+    completed = journal.completed()
+    todo = [path for path in paths if not _is_current(completed.get(item_ids[path]), input_hashes[path])]
+    logger.info(f"{len(paths)} Bilder gefunden, {len(paths) - len(todo)} bereits erledigt, {len(todo)} offen.")
+
+    if todo:
+        image_settings = {"max_edge": args.max_edge, "output_format": args.format, "quality": args.quality}
+        dedup_distance = None if args.dedup_distance < 0 else args.dedup_distance
+        hash_index = get_image_hash_index() if dedup_distance is not None else None
+
+        finished = 0
+        try:
+            items = prepare_image_batch([SpooledUpload.from_path(path) for path in todo], image_settings, args.workers, keep_preview=False)
+            representatives = find_duplicate_groups(items, dedup_distance)
+            for index, result in generate_image_batch(
+                items, representatives, args.task, args.context, args.workers,
+                hash_index=hash_index, max_distance=args.index_distance, packed=args.pack,
+            ):
+                path = todo[index]
+                item_id = item_ids[path]
+                finished += 1
+                if is_successful(result, args.task):
+                    journal.record(item_id, "done", input_hash=input_hashes[path], row=export_row(args.task, result))
+                    logger.info(f"[{finished}/{len(todo)}] {item_id} fertig.")
+                else:
+                    error = result.get("error", "Unvollständige Antwort")
+                    journal.record(item_id, "failed", error=error)
+                    logger.warning(f"[{finished}/{len(todo)}] {item_id} fehlgeschlagen: {error}")
+        except Cancelled as e:
+            # Die fertigen Ergebnisse werden trotzdem geschrieben; ein erneuter Aufruf setzt beim Rest fort
+            cancelled = str(e)
+        completed = journal.completed()
+
+    rows = [
+        completed[item_ids[path]]["row"] for path in paths if _is_current(completed.get(item_ids[path]), input_hashes[path])
+    ]
+    write_rows_to_path(rows, output, EXPORT_SHEET_NAMES[args.task])
+    failed = len(paths) - len(rows)
+    print(f"{len(rows)} von {len(paths)} Bildern erfolgreich, Ergebnisse in {output}.")
+    for route in routing_summary():
+        print(
+            f"Modell {route['model']} ({route['task']}): {route['count']} Anfragen, Ø {route['avg_ms']:.0f} ms, "
+            f"{route['fallback_rate']:.0%} an das Pro-Modell weitergereicht."
+        )
+    if cancelled:
+        print(f"Lauf abgebrochen ({cancelled}); ein erneuter Aufruf verarbeitet nur die {failed} offenen Bilder.")
+    elif failed:
+        print(f"{failed} Bilder fehlgeschlagen; ein erneuter Aufruf versucht nur diese erneut.")
+    return 1 if failed else 0
+
+
+def run_tts(args: argparse.Namespace) -> int:
+    """Vertont alle übergebenen Manuskripte (PDF/DOCX) zu je einer MP3-Datei in args.output_dir."""
+    paths = []
+    for file_arg in args.files:
+        path = Path(file_arg)
+        candidates = sorted(path.iterdir()) if path.is_dir() else [path]
+        paths.extend(p for p in candidates if p.is_file() and p.suffix.lower() in MANUSCRIPT_EXTENSIONS)
+    if not paths:
+        sys.exit("Keine PDF- oder DOCX-Dateien gefunden.")
+
+    api_key = _require_env("ELEVENLABS_API_KEY")
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    journal = JobJournal(args.journal or output_dir / "tts.journal.jsonl")
+    completed = journal.completed()
+
+    failures = 0
+    for path in paths:
+        item_id = str(path.resolve())
+        input_hash = _input_hash(path, "tts", args.voice_id, ELEVENLABS_MODEL_ID)
+        output = output_dir / f"{path.stem}.mp3"
+        if _is_current(completed.get(item_id), input_hash) and output.exists():
+            logger.info(f"{path.name} bereits vertont, überspringe.")
+            continue
+
+        # Bereits synthetisierte Chunks eines abgebrochenen Laufs liegen im Audio-Cache und werden wiederverwendet
+        pdf_stats = None
+        if path.suffix.lower() == ".pdf":
+            # Ohne Kopf-/Fußzeilen, Seitenzahlen und Silbentrennungen
+            pdf_stats = PdfTextStats()
+            text_stream = iter_pdf_text(path, args.workers, stats=pdf_stats)
+        else:
+            text_stream = iter_docx_text(path)
+
+        def _on_progress(done, total, name=path.name):
+            logger.info(f"{name}: {done}/{total if total is not None else '?'} Teile fertig.")
+
+        chapter_starts: List[int] = []
+        # Die Segmente gehen direkt in die Zieldatei; erst wenn alle da sind, ersetzt sie die alte
+        assembler = Mp3Assembler(output.with_name(f"{output.name}.tmp"))
+        try:
+            synthesis = synthesize_chunks_parallel(
+                mark_chapters(iter_stable_chunks(text_stream), chapter_starts), api_key, args.voice_id,
+                max_workers=args.workers, max_retries=args.retries, on_progress=_on_progress, on_segment=assembler.add,
+            )
+        except Cancelled:
+            # Die fertigen Segmente liegen im Audio-Cache, die Zwischendatei wird nicht mehr gebraucht
+            assembler.discard()
+            raise
+        finally:
+            assembler.close()
+        if not synthesis.chunk_count or synthesis.failed_chunks:
+            assembler.discard()
+            failures += 1
+            error = "Kein Text gefunden" if not synthesis.chunk_count else f"Teile fehlgeschlagen: {synthesis.failed_chunks}"
+            journal.record(item_id, "failed", error=error)
+            logger.warning(f"{path.name}: {error}")
+            continue
+
+        chapter_paths = []
+        if args.split_chapters and chapter_starts:
+            chapter_paths = assembler.split(chapter_starts, output_dir / path.stem, path.stem)
+        os.replace(assembler.path, output)
+        journal.record(
+            item_id, "done", input_hash=input_hash, output=str(output), chapters=[str(chapter_path) for chapter_path in chapter_paths],
+            reused_chunks=synthesis.reused_chunks, synthesized_chunks=synthesis.synthesized_chunks,
+            pdf_cleanup=pdf_stats.to_dict() if pdf_stats is not None else None,
+        )
+        chapters_text = f", {len(chapter_paths)} Kapitel in {output_dir / path.stem}" if chapter_paths else ""
+        print(f"{path.name} -> {output} ({synthesis.reused_chunks} Teile wiederverwendet, {synthesis.synthesized_chunks} neu{chapters_text}).")
+        if pdf_stats is not None:
+            print(f"  Textbereinigung: {pdf_stats.summary()}")
+    return 1 if failures else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Batch-Verarbeitung ohne Streamlit-Oberfläche.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Ausführliche Log-Ausgabe.")
+    parser.add_argument("--trace", help="JSONL-Trace aller API-Aufrufe und Konvertierungen (Standard: neben der Ausgabe).")
+    parser.add_argument("--metrics-file", help="Messwerte am Ende im Prometheus-Textformat in diese Datei schreiben.")
+    parser.add_argument("--deadline", type=float, metavar="MINUTEN", help="Frist für den ganzen Lauf; danach wird sauber abgebrochen.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    images = subparsers.add_parser("images", help="SEO-Tags oder Barrierefreiheits-Texte für einen Bilderordner erzeugen.")
+    images.add_argument("source_dir", help=f"Ordner mit Bildern ({', '.join(SUPPORTED_IMAGE_EXTENSIONS)}).")
+    images.add_argument("--task", choices=("seo", "accessibility", "combined"), default="seo")
+    images.add_argument("--context", default="", help="Kontext für die Barrierefreiheits-Beschreibung.")
+    images.add_argument("--output", required=True, help=f"Zieldatei ({', '.join('.' + fmt for fmt in EXPORT_FORMATS)}).")
+    images.add_argument("--journal", help="Journal-Datei (Standard: <output>.journal.jsonl).")
+    images.add_argument("--recursive", action="store_true", help="Unterordner einbeziehen.")
+    images.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, choices=range(1, MAX_PARALLEL_REQUESTS + 1), metavar=f"1-{MAX_PARALLEL_REQUESTS}")
+    images.add_argument("--max-edge", type=int, default=DEFAULT_MAX_EDGE)
+    images.add_argument("--format", choices=SUPPORTED_OUTPUT_FORMATS, default=DEFAULT_OUTPUT_FORMAT)
+    images.add_argument("--quality", type=int, default=DEFAULT_QUALITY)
+    images.add_argument("--dedup-distance", type=int, default=DEFAULT_MAX_DISTANCE, help="Hamming-Abstand für Duplikate (-1 deaktiviert).")
+    images.add_argument(
+        "--index-distance", type=int, default=DEFAULT_INDEX_MAX_DISTANCE,
+        help="Hamming-Abstand für die Übernahme von Ergebnissen früherer Läufe (der Inhalts-Hash muss immer übereinstimmen).",
+    )
+    images.add_argument("--pack", action="store_true", help="Nur --task seo: mehrere kleine Bilder pro Gemini-Anfrage bündeln.")
+    images.set_defaults(func=run_images)
+
+    tts = subparsers.add_parser("tts", help="Manuskripte (PDF/DOCX) zu MP3 vertonen.")
+    tts.add_argument("files", nargs="+", help="PDF-/DOCX-Dateien oder Ordner.")
+    tts.add_argument("--voice-id", required=True, help="ElevenLabs Voice-ID.")
+    tts.add_argument("--output-dir", required=True)
+    tts.add_argument("--journal", help="Journal-Datei (Standard: <output-dir>/tts.journal.jsonl).")
+    tts.add_argument("--workers", type=int, default=2, choices=range(1, ELEVENLABS_MAX_CONCURRENCY + 1), metavar=f"1-{ELEVENLABS_MAX_CONCURRENCY}")
+    tts.add_argument("--retries", type=int, default=2)
+    tts.add_argument("--split-chapters", action="store_true", help="Zusätzlich je Kapitel eine MP3-Datei in <output-dir>/<name>/ schreiben.")
+    tts.set_defaults(func=run_tts)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        # api_calls richtet beim Import bereits ein Logging für die App ein; force ersetzt es
+        force=True,
+    )
+    if not args.verbose:
+        logger.setLevel(logging.INFO)
+    scope = CancelScope(args.deadline * 60 if args.deadline else None)
+
+    def _on_interrupt(signum, frame):
+        # Erstes Strg+C bricht sauber ab, ein zweites sofort
+        if scope.cancelled:
+            raise KeyboardInterrupt
+        print("Breche ab, warte auf laufende Anfragen... (erneut Strg+C zum sofortigen Beenden)", file=sys.stderr)
+        scope.cancel("Strg+C")
+
+    previous_handler = signal.signal(signal.SIGINT, _on_interrupt)
+    try:
+        with use_trace(args.trace or _default_trace_path(args)), use_cancel_scope(scope):
+            return args.func(args)
+    except Cancelled as e:
+        print(f"Lauf abgebrochen ({e}). Fertige Elemente stehen im Journal; ein erneuter Aufruf setzt dort fort.", file=sys.stderr)
+        return 1
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        write_prometheus_file(args.metrics_file or METRICS_FILE)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
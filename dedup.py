@@ -0,0 +1,200 @@
+# dedup.py
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Union
+
+from PIL import Image
+
+from result_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Standard-Hamming-Abstand (von 64 Bit), bis zu dem zwei Bilder eines Batches als Duplikat gelten
+DEFAULT_MAX_DISTANCE = 6
+# Hashes mit weniger gesetzten (bzw. ungesetzten) Bits tragen kaum Information: Fast einfarbige Bilder, etwa
+# weiße Abbildungen, die sich nur in der Beschriftung unterscheiden, erhalten sonst denselben Hash
+MIN_HASH_BITS = 8
+# Kantenlänge des Graustufen-Abdrucks, mit dem ein Hash-Treffer im Batch Pixel für Pixel bestätigt wird
+PIXEL_SIGNATURE_SIZE = 64
+# Größte erlaubte Helligkeitsabweichung je Pixel des Abdrucks. Bewusst streng: Ein verpasstes Duplikat
+# kostet nur eine Anfrage, ein falsches überträgt den Alt-Text eines anderen Bildes
+DEFAULT_MAX_PIXEL_DIFFERENCE = 8
+# Über Batches hinweg (persistenter Index) wird nur bei gleichem Inhalts-Hash und standardmäßig identischem dHash
+# wiederverwendet: Dort sieht niemand die Gruppe, aus der ein fremder Alt-Text übernommen wird
+DEFAULT_INDEX_MAX_DISTANCE = int(os.environ.get("SEO_HELPER_INDEX_MAX_DISTANCE", "0"))
+DEFAULT_INDEX_PATH = Path(DEFAULT_CACHE_DIR) / "phash.sqlite3"
+DEFAULT_MAX_INDEX_ENTRIES = 50000
+
+
+def compute_dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """
+    Berechnet den Differenz-Hash (dHash) eines Bildes als Integer mit hash_size² Bit.
+    Der Hash bleibt bei Formatwechsel, Skalierung und leichter Kompression nahezu gleich.
+    """
+    pil_image = Image.open(BytesIO(image_bytes))
+    if getattr(pil_image, "n_frames", 1) > 1:
+        pil_image.seek(0)
+    # Bei JPEGs nur so weit dekodieren, wie für den winzigen Hash nötig ist
+    pil_image.draft("L", (hash_size * 8, hash_size * 8))
+    small = pil_image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def compute_pixel_signature(image_bytes: bytes, size: int = PIXEL_SIGNATURE_SIZE) -> bytes:
+    """Verkleinert das Bild auf size x size Graustufen-Pixel (Flächenmittel) und gibt die Pixel als Bytes zurück."""
+    pil_image = Image.open(BytesIO(image_bytes))
+    if getattr(pil_image, "n_frames", 1) > 1:
+        pil_image.seek(0)
+    return pil_image.convert("L").resize((size, size), Image.Resampling.BOX).tobytes()
+
+
+def pixels_match(signature_a: bytes, signature_b: bytes, max_difference: int = DEFAULT_MAX_PIXEL_DIFFERENCE) -> bool:
+    """Prüft, ob zwei Abdrücke aus compute_pixel_signature() an keinem Pixel um mehr als max_difference abweichen."""
+    return len(signature_a) == len(signature_b) and all(abs(a - b) <= max_difference for a, b in zip(signature_a, signature_b))
+
+
+def is_low_information(image_hash: int, hash_bits: int = 64) -> bool:
+    """Erkennt Hashes fast einfarbiger Bilder, die sich nicht zur Duplikaterkennung eignen (siehe MIN_HASH_BITS)."""
+    set_bits = image_hash.bit_count()
+    return min(set_bits, hash_bits - set_bits) < MIN_HASH_BITS
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Anzahl unterschiedlicher Bits zweier Hashes."""
+    return (hash_a ^ hash_b).bit_count()
+
+
+def group_near_duplicates(hashes: List[int], signatures: List[bytes], max_distance: int) -> List[int]:
+    """
+    Ordnet jedem Hash den Index seines Repräsentanten zu (das erste Bild der Gruppe).
+    Ein Hash-Treffer zählt nur, wenn auch die Pixel-Abdrücke (compute_pixel_signature) übereinstimmen.
+    Ein Bild, das keinem früheren Repräsentanten ähnelt, ist sein eigener Repräsentant;
+    Bilder mit informationsarmem Hash werden nie zusammengefasst.
+    """
+    representatives: List[int] = []
+    assignment = []
+    for index, image_hash in enumerate(hashes):
+        if is_low_information(image_hash):
+            assignment.append(index)
+            continue
+        for rep_index in representatives:
+            if hamming_distance(image_hash, hashes[rep_index]) <= max_distance and pixels_match(signatures[index], signatures[rep_index]):
+                assignment.append(rep_index)
+                break
+        else:
+            representatives.append(index)
+            assignment.append(index)
+    return assignment
+
+
+class IndexMatch(NamedTuple):
+    """Treffer im Hash-Index: Ergebnis eines früher verarbeiteten Bildes mit demselben Inhalt."""
+    file_name: str
+    distance: int
+    result: Dict[str, str]
+
+
+class ImageHashIndex:
+    """
+    Persistenter Index verarbeiteter Bilder über Batches und Neustarts hinweg.
+    Zu jedem Bild werden Wahrnehmungs-Hash, Inhalts-Hash und das erzeugte Ergebnis gespeichert, getrennt nach einem
+    Namensraum, der Aufgabe, Prompt und Modell beschreibt. So wird nur innerhalb derselben Aufgabe wiederverwendet.
+    Ein Hash-Treffer allein genügt nicht: Verschiedene Bilder können denselben dHash haben, daher muss auch der
+    Inhalts-Hash übereinstimmen.
+    Nur add() hält die Sperre; Suchen laufen parallel (SQLite serialisiert Lesen und Schreiben selbst).
+    """
+
+    def __init__(self, db_path: Union[str, Path] = DEFAULT_INDEX_PATH, max_entries: int = DEFAULT_MAX_INDEX_ENTRIES):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            # Die alte Tabelle war nur nach dHash geschlüsselt; ihre Einträge lassen sich nicht bestätigen
+            conn.execute("DROP TABLE IF EXISTS image_hashes")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_results ("
+                " namespace TEXT NOT NULL, content_hash TEXT NOT NULL, dhash TEXT NOT NULL, file_name TEXT NOT NULL,"
+                " result TEXT NOT NULL, created REAL NOT NULL, PRIMARY KEY (namespace, content_hash))"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Öffnet eine kurzlebige Verbindung, committet am Ende und schließt sie wieder."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def find(self, namespace: str, image_hash: int, content_hash: str, max_distance: int) -> Union[IndexMatch, None]:
+        """
+        Sucht ein gespeichertes Bild mit demselben Inhalts-Hash, dessen dHash höchstens max_distance abweicht.
+        Bilder mit informationsarmem Hash (siehe is_low_information) werden nie übernommen.
+        Schreibzugriffe blockieren die Suche nicht.
+        """
+        if is_low_information(image_hash):
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT dhash, file_name, result FROM image_results WHERE namespace = ? AND content_hash = ?",
+                    (namespace, content_hash),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Hash-Index konnte nicht gelesen werden: {e}")
+            return None
+        if row is None:
+            return None
+        distance = hamming_distance(image_hash, int(row[0], 16))
+        if distance > max_distance:
+            return None
+        return IndexMatch(row[1], distance, json.loads(row[2]))
+
+    def add(self, namespace: str, image_hash: int, content_hash: str, file_name: str, result: Dict[str, str]):
+        """Speichert das Ergebnis eines Bildes und begrenzt den Index auf max_entries Einträge."""
+        if is_low_information(image_hash):
+            return
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO image_results (namespace, content_hash, dhash, file_name, result, created)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, content_hash, f"{image_hash:016x}", file_name, json.dumps(result, ensure_ascii=False), time.time()),
+                )
+                conn.execute(
+                    "DELETE FROM image_results WHERE rowid IN ("
+                    " SELECT rowid FROM image_results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Hash-Index konnte nicht geschrieben werden: {e}")
+
+
+_default_index: Union[ImageHashIndex, None] = None
+_default_index_lock = threading.Lock()
+
+
+def get_image_hash_index() -> ImageHashIndex:
+    """Gibt den prozessweit geteilten Hash-Index zurück (wird beim ersten Aufruf angelegt)."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = ImageHashIndex()
+        return _default_index
@@ -0,0 +1,136 @@
+# export.py
+
+import csv
+import importlib.util
+import io
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Tuple, Union
+
+from result_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Zwischenspeicher der Export-Zeilen laufender und fertiger Jobs
+DEFAULT_EXPORT_DIR = Path(DEFAULT_CACHE_DIR).parent / "exports"
+
+# Format -> (Anzeigename, Dateiendung, MIME-Typ)
+EXPORT_FORMATS = {
+    "xlsx": ("Excel (.xlsx)", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV (.csv)", "csv", "text/csv"),
+    "jsonl": ("JSON Lines (.jsonl)", "jsonl", "application/x-ndjson"),
+    "parquet": ("Parquet (.parquet)", "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def parquet_available() -> bool:
+    """Parquet-Export benötigt das optionale Paket pyarrow."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def available_formats() -> List[str]:
+    """Alle Exportformate, die in dieser Umgebung geschrieben werden können."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or parquet_available()]
+
+
+def _columns(rows: List[Dict[str, Any]]) -> List[str]:
+    """Vereinigung aller Spalten in der Reihenfolge ihres ersten Auftretens."""
+    columns: Dict[str, None] = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    return list(columns)
+
+
+def write_rows(rows: Iterable[Dict[str, Any]], fmt: str, target: BinaryIO, sheet_name: str = "Ergebnisse"):
+    """Schreibt die Zeilen im gewünschten Format in ein binäres Dateiobjekt."""
+    rows = list(rows)
+    columns = _columns(rows)
+    if fmt == "xlsx":
+        # Write-only-Modus: openpyxl hält nicht das ganze Arbeitsblatt als Zellobjekte im Speicher
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(columns)
+        for row in rows:
+            sheet.append([row.get(column, "") for column in columns])
+        workbook.save(target)
+    elif fmt == "csv":
+        # utf-8-sig, damit Excel Umlaute beim Öffnen der CSV korrekt erkennt
+        text_target = io.TextIOWrapper(target, encoding="utf-8-sig", newline="")
+        writer = csv.DictWriter(text_target, fieldnames=columns, restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+        text_target.flush()
+        text_target.detach()
+    elif fmt == "jsonl":
+        for row in rows:
+            target.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist([{column: row.get(column, "") for column in columns} for row in rows])
+        pq.write_table(table, target)
+    else:
+        raise ValueError(f"Nicht unterstütztes Exportformat: {fmt}")
+
+
+def write_rows_to_path(rows: Iterable[Dict[str, Any]], path: Union[str, Path], sheet_name: str = "Ergebnisse"):
+    """Schreibt die Zeilen in eine Datei; das Format ergibt sich aus der Dateiendung."""
+    path = Path(path)
+    fmt = path.suffix.lower().lstrip(".")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Nicht unterstütztes Exportformat: {path.suffix}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as target:
+        write_rows(rows, fmt, target, sheet_name)
+
+
+class ResultExporter:
+    """
+    Sammelt Export-Zeilen, sobald einzelne Ergebnisse fertig sind, in einer JSONL-Datei auf der Platte.
+    Ein Export in einem beliebigen Format lässt sich jederzeit erzeugen – auch mitten in einem Lauf.
+    Die Zeilen werden nach ihrer ursprünglichen Position (z.B. Upload-Reihenfolge) sortiert ausgegeben.
+    """
+
+    def __init__(self, path: Union[str, Path], sheet_name: str = "Ergebnisse"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sheet_name = sheet_name
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, index: int, row: Dict[str, Any]):
+        """Hängt eine Zeile an den Zwischenspeicher an."""
+        line = json.dumps({"index": index, "row": row}, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as spool_file:
+            spool_file.write(line)
+            self._count += 1
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Alle bisher gesammelten Zeilen in ursprünglicher Reihenfolge."""
+        entries: List[Tuple[int, Dict[str, Any]]] = []
+        with self._lock:
+            if not self.path.exists():
+                return []
+            with open(self.path, encoding="utf-8") as spool_file:
+                for line in spool_file:
+                    entry = json.loads(line)
+                    entries.append((entry["index"], entry["row"]))
+        return [row for _, row in sorted(entries, key=lambda entry: entry[0])]
+
+    def to_bytes(self, fmt: str) -> bytes:
+        """Erzeugt den Export der bisherigen Zeilen im gewünschten Format."""
+        buffer = io.BytesIO()
+        write_rows(self.rows(), fmt, buffer, self.sheet_name)
+        return buffer.getvalue()
+
+    def discard(self):
+        """Löscht den Zwischenspeicher."""
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+            self._count = 0
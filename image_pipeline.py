@@ -0,0 +1,261 @@
+# image_pipeline.py
+
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+from api_calls import plan_packs, task_signature
+from batch import run_bounded, DEFAULT_MAX_WORKERS
+from dedup import ImageHashIndex, compute_dhash, compute_pixel_signature, group_near_duplicates
+from result_cache import content_hash
+from routing import PRO_GEMINI_MODEL, ROUTES, estimate_complexity, generate_fields_routed, generate_seo_pack_routed, route_for
+from uploads import MemoryBudget, estimate_decode_bytes, get_global_memory_budget
+from utils import prepare_image_for_api, DEFAULT_MAX_EDGE
+
+logger = logging.getLogger(__name__)
+
+# Felder, die eine Aufgabe liefert; ein Ergebnis gilt nur als erfolgreich, wenn alle gefüllt sind
+TASK_FIELDS = {
+    "seo": ("title", "alt"),
+    "accessibility": ("short_desc", "long_desc"),
+    "combined": ("short_desc", "long_desc", "alt", "title"),
+}
+
+
+def is_successful(result: Dict[str, Any], task: str) -> bool:
+    """Prüft, ob ein Ergebnis alle Felder der Aufgabe enthält."""
+    return "error" not in result and all(result.get(field) for field in TASK_FIELDS[task])
+
+
+# Name des Arbeitsblatts im Excel-Export je Aufgabe
+EXPORT_SHEET_NAMES = {"seo": "SEO Tags", "accessibility": "Bildbeschreibungen", "combined": "Bildbeschreibungen"}
+
+
+def export_row(task: str, result: Dict[str, Any]) -> Dict[str, str]:
+    """Baut die Export-Zeile (Excel/JSONL) für ein erfolgreiches Ergebnis."""
+    file_name = result["file_name"]
+    if task == "seo":
+        return {"Bildname": file_name, "ALT": result["alt"], "TITLE": result["title"]}
+    row = {
+        "Bildname": file_name, "Dateiname Produktion": "", "Alternativtext": result["short_desc"],
+        "Bildlegende": "", "Anmerkung": "", "Langbeschreibung": result["long_desc"],
+        "(Platzierung/Größe/Übersetzungstexte in der Abbildung/...)": ""
+    }
+    if task == "combined":
+        row.update({"SEO Alt": result["alt"], "SEO Title": result["title"]})
+    return row
+
+
+def prepare_image_item(
+    uploaded_file,
+    image_settings: Dict[str, Any],
+    keep_preview: bool = True,
+    memory_budget: Union[MemoryBudget, None] = None,
+) -> Dict[str, Any]:
+    """
+    Phase 1 für ein Bild: bereitet das Bild für Gemini vor und berechnet dHash, Pixel-Abdruck und Inhalts-Hash
+    (für die Duplikaterkennung) sowie die Komplexität (für die Modellwahl).
+    uploaded_file muss .name und .getvalue() bereitstellen (z.B. ein Streamlit-UploadedFile); hat es einen
+    .path (uploads.SpooledUpload), wird direkt aus der Datei dekodiert, ohne die Bytes zu laden.
+    Das Dekodieren belegt vorab den geschätzten Speicherbedarf im memory_budget (Standard: globales Budget),
+    sodass mehrere riesige Scans nicht gleichzeitig ausgepackt werden.
+    Mit keep_preview=True enthält der Eintrag ein kleines Vorschaubild statt des Originals;
+    ohne Oberfläche (keep_preview=False) wird keines erzeugt.
+    """
+    file_name = uploaded_file.name
+    source = getattr(uploaded_file, "path", None) or uploaded_file.getvalue()
+    budget = memory_budget or get_global_memory_budget()
+    try:
+        decode_bytes = estimate_decode_bytes(source, image_settings.get("max_edge", DEFAULT_MAX_EDGE))
+        with budget.reserve(decode_bytes):
+            prepared = prepare_image_for_api(source, **image_settings, with_thumbnail=keep_preview)
+    except Exception as conv_e:
+        return {"file_name": file_name, "error": f"🚨 Fehler beim Konvertieren von '{file_name}': {conv_e}"}
+    try:
+        complexity = estimate_complexity(prepared.data, prepared.original_size)
+    except Exception as e:
+        # Ohne Schätzung geht das Bild an das Pro-Modell
+        logger.warning(f"Komplexität von '{file_name}' konnte nicht geschätzt werden: {e}")
+        complexity = None
+    return {
+        "file_name": file_name, "preview": prepared.thumbnail, "prepared": prepared,
+        "dhash": compute_dhash(prepared.data), "pixels": compute_pixel_signature(prepared.data),
+        "content_hash": content_hash(prepared.data), "complexity": complexity,
+    }
+
+
+def find_reusable_result(
+    hash_index: ImageHashIndex, item: Dict[str, Any], task: str, ebook_context: str, route: str, max_distance: int,
+) -> Union[Dict[str, Any], None]:
+    """
+    Sucht im Hash-Index ein Ergebnis für das Bild, das mit dem Modell seiner Route erzeugt wurde (Namensraum je Modell,
+    wie die Cache-Schlüssel) und denselben Inhalts-Hash hat. Für das schnelle Modell genügt auch ein Pro-Ergebnis,
+    umgekehrt nicht.
+    Gibt das fertige Ergebnis (mit "model" und "reused_from") oder None zurück.
+    """
+    models = [ROUTES[route]] + ([PRO_GEMINI_MODEL] if ROUTES[route] != PRO_GEMINI_MODEL else [])
+    for model_name in models:
+        match = hash_index.find(task_signature(task, ebook_context, model_name), item["dhash"], item["content_hash"], max_distance)
+        if match is not None:
+            logger.info(f"Übernehme Ergebnis von '{match.file_name}' für '{item['file_name']}' (Abstand {match.distance}, {model_name}).")
+            return {**item, **match.result, "model": model_name, "reused_from": match.file_name}
+    return None
+
+
+def generate_image_result(
+    item: Dict[str, Any],
+    task: str,
+    ebook_context: str = "",
+    hash_index: Union[ImageHashIndex, None] = None,
+    max_distance: int = 0,
+) -> Dict[str, Any]:
+    """
+    Phase 2 für ein vorbereitetes Bild: erzeugt das Ergebnis der Aufgabe mit dem zur Komplexität passenden Modell
+    (siehe routing.generate_fields_routed); das verwendete Modell steht unter "model". Ist ein ähnliches Bild aus einem
+    früheren Batch im Hash-Index, wird dessen Ergebnis übernommen (siehe find_reusable_result).
+    """
+    if hash_index is not None:
+        route = route_for(task, item["prepared"].data, ebook_context, item.get("complexity"))
+        reused = find_reusable_result(hash_index, item, task, ebook_context, route, max_distance)
+        if reused is not None:
+            return reused
+
+    fields, model_name = generate_fields_routed(
+        task, item["prepared"].data, item["file_name"], ebook_context, item.get("complexity"),
+    )
+    result = {**item, **fields, "model": model_name}
+    if hash_index is not None and is_successful(result, task):
+        # Unter dem tatsächlich verwendeten Modell, damit eine Pro-Anfrage nie eine Antwort des schnellen Modells übernimmt
+        hash_index.add(task_signature(task, ebook_context, model_name), item["dhash"], item["content_hash"], item["file_name"], fields)
+    return result
+
+
+def generate_seo_pack_results(
+    pack: List[Dict[str, Any]],
+    hash_index: Union[ImageHashIndex, None] = None,
+    max_distance: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Phase 2 für mehrere vorbereitete Bilder im SEO-Modus mit einer gemeinsamen Gemini-Anfrage.
+    Bilder mit Treffer im Hash-Index übernehmen dessen Ergebnis und werden nicht mitgeschickt;
+    die übrigen werden je Route (schnelles bzw. Pro-Modell) gemeinsam angefragt.
+    """
+    results: List[Union[Dict[str, Any], None]] = [None] * len(pack)
+    to_send: Dict[str, List[int]] = {}
+    for position, item in enumerate(pack):
+        route = route_for("seo", item["prepared"].data, complexity=item.get("complexity"))
+        reused = find_reusable_result(hash_index, item, "seo", "", route, max_distance) if hash_index is not None else None
+        if reused is not None:
+            results[position] = reused
+        else:
+            to_send.setdefault(route, []).append(position)
+
+    for route, positions in to_send.items():
+        tags = generate_seo_pack_routed([(pack[position]["prepared"].data, pack[position]["file_name"]) for position in positions], route)
+        for position, (fields, model_name) in zip(positions, tags):
+            item = pack[position]
+            result = {**item, **fields, "model": model_name}
+            if hash_index is not None and is_successful(result, "seo"):
+                hash_index.add(task_signature("seo", "", model_name), item["dhash"], item["content_hash"], item["file_name"], fields)
+            results[position] = result
+    return results
+
+
+def prepare_image_batch(
+    uploaded_files: Sequence,
+    image_settings: Dict[str, Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    initializer: Union[Callable[[], None], None] = None,
+    keep_preview: bool = True,
+    memory_budget: Union[MemoryBudget, None] = None,
+) -> List[Dict[str, Any]]:
+    """Führt Phase 1 parallel für alle Bilder aus und gibt die Einträge in Upload-Reihenfolge zurück."""
+    items: List[Dict[str, Any]] = [{} for _ in uploaded_files]
+
+    def _worker(uploaded_file):
+        return prepare_image_item(uploaded_file, image_settings, keep_preview, memory_budget)
+
+    for index, item, error in run_bounded(uploaded_files, _worker, max_workers, initializer):
+        if error is not None:
+            file_name = uploaded_files[index].name
+            item = {"file_name": file_name, "error": f"🚨 Unerwarteter FEHLER bei '{file_name}': {error}"}
+        items[index] = item
+    return items
+
+
+def find_duplicate_groups(items: List[Dict[str, Any]], max_distance: Union[int, None]) -> List[Union[int, None]]:
+    """
+    Gibt für jeden Eintrag den Index seines Repräsentanten zurück (None bei fehlerhaften Einträgen).
+    Bilder gehören nur zusammen, wenn dHash und Pixel-Abdruck übereinstimmen (siehe dedup.group_near_duplicates).
+    Mit max_distance=None ist jedes Bild sein eigener Repräsentant.
+    """
+    valid = [index for index, item in enumerate(items) if "error" not in item]
+    representatives: List[Union[int, None]] = [None] * len(items)
+    if max_distance is None:
+        for index in valid:
+            representatives[index] = index
+        return representatives
+    assignment = group_near_duplicates(
+        [items[index]["dhash"] for index in valid], [items[index]["pixels"] for index in valid], max_distance,
+    )
+    for position, rep_position in enumerate(assignment):
+        representatives[valid[position]] = valid[rep_position]
+    return representatives
+
+
+def generate_image_batch(
+    items: List[Dict[str, Any]],
+    representatives: List[Union[int, None]],
+    task: str,
+    ebook_context: str = "",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    hash_index: Union[ImageHashIndex, None] = None,
+    max_distance: int = 0,
+    initializer: Union[Callable[[], None], None] = None,
+    packed: bool = False,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Führt Phase 2 aus: Nur Repräsentanten werden an Gemini gesendet, Duplikate übernehmen deren Ergebnis.
+    Liefert (index, ergebnis) für jedes Bild, sobald es fertig ist; fehlerhafte Einträge aus Phase 1 zuerst.
+    Mit packed=True werden im SEO-Modus mehrere kleine Bilder pro Anfrage gebündelt.
+    """
+    duplicates: Dict[int, List[int]] = {}
+    for index, rep_index in enumerate(representatives):
+        if rep_index is None:
+            yield index, items[index]
+        elif rep_index != index:
+            duplicates.setdefault(rep_index, []).append(index)
+
+    rep_indices = [index for index, rep_index in enumerate(representatives) if rep_index == index]
+    if packed and task == "seo":
+        # Kleine Bilder teilen sich eine Anfrage; die Paketgröße richtet sich nach den Bild-Bytes.
+        # Pakete werden je Route gebildet, damit einfache Bilder gemeinsam an das schnelle Modell gehen.
+        by_route: Dict[str, List[int]] = {}
+        for index in rep_indices:
+            by_route.setdefault(route_for("seo", items[index]["prepared"].data, complexity=items[index].get("complexity")), []).append(index)
+        work = []
+        for route_indices in by_route.values():
+            sizes = [len(items[index]["prepared"].data) for index in route_indices]
+            work += [[route_indices[position] for position in pack] for pack in plan_packs(sizes)]
+    else:
+        work = [[index] for index in rep_indices]
+
+    def _worker(pack: List[int]) -> List[Dict[str, Any]]:
+        if len(pack) == 1:
+            return [generate_image_result(items[pack[0]], task, ebook_context, hash_index, max_distance)]
+        return generate_seo_pack_results([items[index] for index in pack], hash_index, max_distance)
+
+    for position, pack_results, error in run_bounded(work, _worker, max_workers, initializer):
+        if error is not None:
+            pack_results = []
+            for rep_index in work[position]:
+                file_name = items[rep_index]["file_name"]
+                pack_results.append({"file_name": file_name, "error": f"🚨 Unerwarteter FEHLER bei '{file_name}': {error}"})
+        for rep_index, result in zip(work[position], pack_results):
+            yield rep_index, result
+            for dup_index in duplicates.get(rep_index, []):
+                dup_item = items[dup_index]
+                if "error" in result:
+                    yield dup_index, {**dup_item, "error": result["error"]}
+                else:
+                    fields = {field: result.get(field) for field in TASK_FIELDS[task]}
+                    yield dup_index, {**dup_item, **fields, "duplicate_of": result["file_name"]}
@@ -0,0 +1,302 @@
+# jobs.py
+
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+from api_calls import synthesize_chunks_parallel
+from audio import DEFAULT_AUDIO_DIR, STATIC_MAX_BYTES, Mp3Assembler, limit_part_size, mark_chapters
+from cancellation import CancelScope, Cancelled, use_cancel_scope
+from dedup import DEFAULT_INDEX_MAX_DISTANCE, get_image_hash_index
+from export import ResultExporter, DEFAULT_EXPORT_DIR
+from image_pipeline import (
+    prepare_image_batch, find_duplicate_groups, generate_image_batch, is_successful, export_row, EXPORT_SHEET_NAMES,
+)
+from metrics import DEFAULT_TRACE_DIR, use_trace, write_prometheus_file
+from uploads import MemoryBudget, SpooledUpload
+from utils import PdfTextStats, iter_pdf_text, iter_docx_text, iter_stable_chunks
+
+logger = logging.getLogger(__name__)
+
+# Wie viele Jobs gleichzeitig laufen (jeder Job parallelisiert intern zusätzlich seine API-Aufrufe)
+MAX_CONCURRENT_JOBS = int(os.environ.get("SEO_HELPER_MAX_JOBS", "2"))
+# Fertige Jobs bleiben so lange abrufbar, ältere werden beim nächsten Start eines Jobs verworfen
+JOB_RETENTION_SECONDS = float(os.environ.get("SEO_HELPER_JOB_RETENTION_HOURS", "12")) * 3600
+MAX_RETAINED_JOBS = int(os.environ.get("SEO_HELPER_MAX_RETAINED_JOBS", "50"))
+
+# Optionale Frist für einen ganzen Job in Minuten (0 = keine); die Oberfläche kann sie je Job überschreiben
+DEFAULT_JOB_TIMEOUT_MINUTES = float(os.environ.get("SEO_HELPER_JOB_TIMEOUT_MINUTES", "0"))
+
+JOB_STATUS_LABELS = {
+    "queued": "⏳ wartet", "running": "🔄 läuft", "done": "✅ fertig",
+    "failed": "🚨 fehlgeschlagen", "cancelled": "⛔ abgebrochen",
+}
+
+
+class Job:
+    """
+    Zustand eines Hintergrund-Jobs. Der Job-Thread schreibt Fortschritt und Ergebnisse,
+    die Oberfläche liest sie bei jedem Rerun über die thread-sicheren Methoden.
+    cancel() bzw. das Ende der Frist (timeout_seconds) bricht den Job ab; bis dahin fertige Ergebnisse bleiben erhalten.
+    """
+
+    def __init__(
+        self, kind: str, title: str, data: Union[Dict[str, Any], None] = None, timeout_seconds: Union[float, None] = None,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.title = title
+        self.status = "queued"
+        self.error: Union[str, None] = None
+        self.created = time.time()
+        self.finished: Union[float, None] = None
+        self.completed = 0
+        self.total: Union[int, None] = None
+        self.data: Dict[str, Any] = dict(data or {})
+        self._results: Dict[int, Dict[str, Any]] = {}
+        self._cleanups: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.cancel_scope = CancelScope(timeout_seconds)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def cancel(self, reason: str = "Vom Benutzer abgebrochen"):
+        """Bricht den Job ab: Wartende Anfragen starten nicht mehr, laufende werden verworfen."""
+        if not self.is_finished:
+            logger.info(f"Job {self.id} wird abgebrochen: {reason}")
+            self.cancel_scope.cancel(reason)
+
+    @property
+    def status_label(self) -> str:
+        return JOB_STATUS_LABELS.get(self.status, self.status)
+
+    def set_progress(self, completed: int, total: Union[int, None] = None):
+        with self._lock:
+            self.completed = completed
+            if total is not None:
+                self.total = total
+
+    def add_result(self, index: int, result: Dict[str, Any]):
+        """Legt das Ergebnis eines Elements ab und zählt den Fortschritt hoch."""
+        with self._lock:
+            self._results[index] = result
+            self.completed = len(self._results)
+
+    def results(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """Bisherige Ergebnisse, sortiert nach ursprünglicher Position."""
+        with self._lock:
+            return sorted(self._results.items())
+
+    def update(self, **data: Any):
+        with self._lock:
+            self.data.update(data)
+
+    def add_cleanup(self, cleanup: Callable[[], None]):
+        """Registriert eine Aufräumfunktion (z.B. für Zwischendateien), die beim Verwerfen des Jobs läuft."""
+        with self._lock:
+            self._cleanups.append(cleanup)
+
+    def discard(self):
+        with self._lock:
+            cleanups, self._cleanups = self._cleanups, []
+        for cleanup in cleanups:
+            try:
+                cleanup()
+            except Exception as e:
+                logger.warning(f"Aufräumen von Job {self.id} fehlgeschlagen: {e}")
+
+
+class JobRegistry:
+    """
+    Prozessweite Job-Verwaltung: Jobs laufen in einem eigenen Thread-Pool und überleben damit
+    Reruns und Seitenwechsel. Die Oberfläche merkt sich nur die Job-ID.
+    """
+
+    def __init__(self, max_concurrent_jobs: int = MAX_CONCURRENT_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrent_jobs), thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        kind: str,
+        title: str,
+        target: Callable[[Job], None],
+        data: Union[Dict[str, Any], None] = None,
+        timeout_seconds: Union[float, None] = None,
+    ) -> Job:
+        """Legt einen Job an und startet target(job) im Hintergrund; timeout_seconds ist die Frist ab jetzt (inkl. Wartezeit)."""
+        job = Job(kind, title, data, timeout_seconds)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, target)
+        logger.info(f"Job {job.id} ({kind}) gestartet: {title}")
+        return job
+
+    def get(self, job_id: str) -> Union[Job, None]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, target: Callable[[Job], None]):
+        job.status = "running"
+        # Alle Messungen des Jobs (auch aus seinen Worker-Threads) landen in einem eigenen Trace
+        trace_path = DEFAULT_TRACE_DIR / f"{job.id}.jsonl"
+        job.update(trace_path=trace_path)
+        job.add_cleanup(lambda: trace_path.unlink(missing_ok=True))
+        try:
+            # Der Abbruch-Scope gilt für den Job-Thread und alle Worker, die er über run_bounded startet
+            with use_trace(trace_path), use_cancel_scope(job.cancel_scope):
+                job.cancel_scope.check()
+                target(job)
+            job.status = "done"
+        except Cancelled as e:
+            logger.info(f"Job {job.id} abgebrochen: {e}")
+            job.error = str(e)
+            job.status = "cancelled"
+        except Exception as e:
+            logger.error(f"Job {job.id} fehlgeschlagen: {e}", exc_info=True)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            write_prometheus_file()
+            logger.info(f"Job {job.id} beendet mit Status '{job.status}'.")
+
+    def _prune(self):
+        """Verwirft abgelaufene und überzählige fertige Jobs (laufende bleiben immer erhalten)."""
+        now = time.time()
+        finished = sorted((job for job in self._jobs.values() if job.is_finished), key=lambda job: job.finished)
+        expired = [job for job in finished if now - job.finished > JOB_RETENTION_SECONDS]
+        overflow = finished[:max(0, len(self._jobs) - MAX_RETAINED_JOBS)]
+        for job in {*expired, *overflow}:
+            del self._jobs[job.id]
+            job.discard()
+
+
+_default_registry: Union[JobRegistry, None] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_job_registry() -> JobRegistry:
+    """Gibt die prozessweit geteilte Job-Verwaltung zurück (wird beim ersten Aufruf angelegt)."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = JobRegistry()
+        return _default_registry
+
+
+# --- Job-Inhalte ---
+
+def run_image_job(
+    job: Job,
+    files: Sequence[SpooledUpload],
+    task: str,
+    ebook_context: str,
+    image_settings: Dict[str, Any],
+    dedup_max_distance: Union[int, None],
+    max_workers: int,
+    packed: bool = False,
+    memory_budget: Union[MemoryBudget, None] = None,
+):
+    """
+    Verarbeitet einen Bild-Batch im Hintergrund und legt die Ergebnisse im Job ab.
+    Erfolgreiche Ergebnisse landen sofort im Exporter, sodass jederzeit ein Teil-Export möglich ist.
+    Mit packed=True werden im SEO-Modus mehrere kleine Bilder pro Gemini-Anfrage gebündelt.
+    dedup_max_distance gilt für Duplikate innerhalb des Batches; Ergebnisse früherer Batches werden nur bis
+    dedup.DEFAULT_INDEX_MAX_DISTANCE und bei gleichem Inhalts-Hash übernommen.
+    Die ausgelagerten Originale werden gelöscht, sobald alle Bilder vorbereitet sind.
+    """
+    exporter = ResultExporter(DEFAULT_EXPORT_DIR / f"{job.id}.jsonl", EXPORT_SHEET_NAMES[task])
+    job.add_cleanup(exporter.discard)
+    job.update(exporter=exporter)
+    job.set_progress(0, len(files))
+    try:
+        items = prepare_image_batch(files, image_settings, max_workers, memory_budget=memory_budget)
+    finally:
+        for uploaded_file in files:
+            uploaded_file.discard()
+    representatives = find_duplicate_groups(items, dedup_max_distance)
+    job.update(items=items, representatives=representatives)
+
+    hash_index = get_image_hash_index() if dedup_max_distance is not None else None
+    for index, result in generate_image_batch(
+        items, representatives, task, ebook_context, max_workers,
+        hash_index=hash_index, max_distance=DEFAULT_INDEX_MAX_DISTANCE, packed=packed,
+    ):
+        if is_successful(result, task):
+            exporter.append(index, export_row(task, result))
+        job.add_result(index, result)
+
+
+def run_tts_job(
+    job: Job,
+    manuscript: SpooledUpload,
+    is_pdf: bool,
+    api_key: str,
+    voice_id: str,
+    max_workers: int,
+    max_retries: int,
+    split_chapters: bool = False,
+):
+    """
+    Vertont ein Manuskript im Hintergrund. Die Segmente werden direkt in eine MP3-Datei geschrieben;
+    deren Pfad (audio_path), ggf. die Kapiteldateien (chapter_paths) und die Statistik landen in job.data,
+    bei PDFs auch die Zahlen der Textbereinigung (pdf_cleanup, siehe utils.PdfTextStats). Die ausgelagerte Manuskriptdatei wird gelöscht, sobald der Text gelesen ist.
+    Ist das Hörbuch größer als audio.STATIC_MAX_BYTES, wird es (bzw. jedes zu große Kapitel) zusätzlich in Teile
+    zerlegt, damit die Oberfläche jede Datei direkt von der Platte ausliefern kann; chapters_only gibt an,
+    ob die Teile genau den Kapiteln entsprechen.
+    """
+    assembler = Mp3Assembler(DEFAULT_AUDIO_DIR / f"{job.id}-{secrets.token_urlsafe(16)}.mp3")
+    job.add_cleanup(assembler.discard)
+    text_stats = {"chars": 0}
+    pdf_stats = PdfTextStats() if is_pdf else None
+    chapter_starts: List[int] = []
+
+    def _count_chars(stream):
+        for piece in stream:
+            text_stats["chars"] += len(piece)
+            yield piece
+
+    try:
+        # PDFs werden seitenweise direkt aus der Datei gelesen und von Kopf-/Fußzeilen, Seitenzahlen und
+        # Silbentrennungen befreit; die ersten Chunks gehen schon an ElevenLabs, während spätere Seiten noch extrahiert werden
+        # Große PDFs nutzen höchstens so viele Extraktionsprozesse wie der Job parallele Anfragen
+        text_stream = iter_pdf_text(manuscript.path, max_workers, stats=pdf_stats) if is_pdf else iter_docx_text(manuscript.path)
+        # Stabile, an Absätzen verankerte Grenzen: nach Änderungen am Manuskript
+        # werden nur die betroffenen Chunks neu synthetisiert
+        synthesis = synthesize_chunks_parallel(
+            mark_chapters(iter_stable_chunks(_count_chars(text_stream)), chapter_starts), api_key, voice_id,
+            max_workers=max_workers, max_retries=max_retries, on_progress=job.set_progress, on_segment=assembler.add,
+        )
+    except Cancelled:
+        # Ein unvollständiges Hörbuch wird nicht ausgeliefert; die fertigen Segmente liegen im Cache
+        # und werden bei einem neuen Lauf wiederverwendet
+        assembler.discard()
+        job.update(chars=text_stats["chars"], pdf_cleanup=pdf_stats, audio_path=None, chapter_paths=[])
+        raise
+    finally:
+        manuscript.discard()
+        assembler.close()
+    job.set_progress(synthesis.chunk_count - len(synthesis.failed_chunks), synthesis.chunk_count)
+    if not synthesis.chunk_count or synthesis.failed_chunks:
+        assembler.discard()
+        job.update(synthesis=synthesis, chars=text_stats["chars"], pdf_cleanup=pdf_stats, audio_path=None, chapter_paths=[])
+        return
+    starts = chapter_starts if split_chapters else []
+    if assembler.path.stat().st_size > STATIC_MAX_BYTES:
+        starts = limit_part_size(assembler.spans, starts, STATIC_MAX_BYTES)
+    chapters_only = split_chapters and set(starts) <= {0, *chapter_starts}
+    chapter_paths = assembler.split(starts) if len(set(starts) - {0}) else []
+    job.update(
+        synthesis=synthesis, chars=text_stats["chars"], pdf_cleanup=pdf_stats,
+        audio_path=assembler.path, chapter_paths=chapter_paths, chapters_only=chapters_only,
+    )
@@ -0,0 +1,53 @@
+# journal.py
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Union
+
+logger = logging.getLogger(__name__)
+
+
+class JobJournal:
+    """
+    Append-only Journal eines Batch-Laufs im JSONL-Format (eine Zeile pro Ereignis).
+    Jede Zeile wird sofort auf die Platte geschrieben; nach einem Absturz liefert completed()
+    die bereits fertigen Elemente, sodass ein neuer Lauf dort weitermachen kann.
+    Eine beim Absturz abgeschnittene letzte Zeile wird beim Lesen ignoriert.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def record(self, item_id: str, status: str, **data: Any):
+        """Hängt ein Ereignis für ein Element an (status z.B. 'done' oder 'failed')."""
+        entry = {"item": item_id, "status": status, "time": time.time(), **data}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as journal_file:
+            journal_file.write(line)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """Gibt den jeweils letzten Eintrag pro Element zurück."""
+        latest: Dict[str, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return latest
+        with open(self.path, encoding="utf-8") as journal_file:
+            for line_number, line in enumerate(journal_file, start=1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Überspringe unvollständige Zeile {line_number} in {self.path}")
+                    continue
+                latest[entry["item"]] = entry
+        return latest
+
+    def completed(self) -> Dict[str, Dict[str, Any]]:
+        """Gibt alle erfolgreich abgeschlossenen Elemente zurück."""
+        return {item_id: entry for item_id, entry in self.entries().items() if entry["status"] == "done"}
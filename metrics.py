@@ -0,0 +1,328 @@
+# metrics.py
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+from result_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Prometheus-Textdatei (z.B. für den node_exporter-Textfile-Collector) und optionaler HTTP-Port für /metrics
+METRICS_FILE = os.environ.get("SEO_HELPER_METRICS_FILE")
+METRICS_PORT = int(os.environ.get("SEO_HELPER_METRICS_PORT", "0"))
+DEFAULT_TRACE_DIR = Path(DEFAULT_CACHE_DIR).parent / "traces"
+# Obergrenzen der Latenz-Buckets in Sekunden
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Zählgrößen, die ein Span sammeln kann
+AMOUNT_FIELDS = ("bytes_out", "bytes_in", "chars", "retries", "rate_limited")
+
+
+class Span:
+    """
+    Messung einer einzelnen Operation (API-Aufruf oder Konvertierung).
+    bytes_out: gesendete bzw. erzeugte Bytes, bytes_in: empfangene bzw. gelesene Bytes,
+    chars: verarbeitete Zeichen, retries/rate_limited: Wiederholungen und Rate-Limit-Ereignisse.
+    """
+
+    def __init__(self, operation: str, labels: Dict[str, str]):
+        self.operation = operation
+        self.labels = dict(labels)
+        self.start = time.time()
+        self.duration = 0.0
+        self.status = "ok"
+        self.error: Union[str, None] = None
+        self.amounts = dict.fromkeys(AMOUNT_FIELDS, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        entry = {
+            "ts": round(self.start, 3), "operation": self.operation, "labels": self.labels,
+            "duration_ms": round(self.duration * 1000, 1), "status": self.status,
+        }
+        entry.update({field: value for field, value in self.amounts.items() if value})
+        if self.error:
+            entry["error"] = self.error
+        return entry
+
+
+class _OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds_sum = 0.0
+        self.seconds_max = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.amounts = dict.fromkeys(AMOUNT_FIELDS, 0)
+
+    def add(self, span: Span):
+        self.count += 1
+        self.errors += span.status != "ok"
+        self.seconds_sum += span.duration
+        self.seconds_max = max(self.seconds_max, span.duration)
+        for position, bound in enumerate(LATENCY_BUCKETS):
+            if span.duration <= bound:
+                self.buckets[position] += 1
+        for field, value in span.amounts.items():
+            self.amounts[field] += value
+
+
+def _escape_label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """Prozessweite Aggregation aller Spans je Operation und Label-Kombination."""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        key = (span.operation, tuple(sorted(span.labels.items())))
+        with self._lock:
+            self._stats.setdefault(key, _OperationStats()).add(span)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Eine Zeile pro Operation und Label-Kombination, z.B. für eine Tabelle in der Oberfläche."""
+        with self._lock:
+            items = sorted(self._stats.items())
+            rows = []
+            for (operation, labels), stats in items:
+                rows.append({
+                    "operation": operation, **dict(labels),
+                    "count": stats.count, "errors": stats.errors,
+                    "avg_ms": round(stats.seconds_sum / stats.count * 1000, 1) if stats.count else 0.0,
+                    "max_ms": round(stats.seconds_max * 1000, 1),
+                    **stats.amounts,
+                })
+        return rows
+
+    def render_prometheus(self) -> str:
+        """Alle Messwerte im Prometheus-Textformat."""
+        with self._lock:
+            items = sorted(self._stats.items())
+            lines = [
+                "# HELP seo_helper_operation_seconds Dauer instrumentierter Operationen.",
+                "# TYPE seo_helper_operation_seconds histogram",
+            ]
+            for (operation, labels), stats in items:
+                base = {"operation": operation, **dict(labels)}
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f"seo_helper_operation_seconds_bucket{_format_labels({**base, 'le': str(bound)})} {count}")
+                lines.append(f"seo_helper_operation_seconds_bucket{_format_labels({**base, 'le': '+Inf'})} {stats.count}")
+                lines.append(f"seo_helper_operation_seconds_sum{_format_labels(base)} {stats.seconds_sum:.6f}")
+                lines.append(f"seo_helper_operation_seconds_count{_format_labels(base)} {stats.count}")
+            lines += ["# HELP seo_helper_operation_errors_total Fehlgeschlagene Operationen.", "# TYPE seo_helper_operation_errors_total counter"]
+            for (operation, labels), stats in items:
+                lines.append(f"seo_helper_operation_errors_total{_format_labels({'operation': operation, **dict(labels)})} {stats.errors}")
+            for field in AMOUNT_FIELDS:
+                lines += [f"# HELP seo_helper_{field}_total Summe von {field} je Operation.", f"# TYPE seo_helper_{field}_total counter"]
+                for (operation, labels), stats in items:
+                    lines.append(f"seo_helper_{field}_total{_format_labels({'operation': operation, **dict(labels)})} {stats.amounts[field]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+registry = MetricsRegistry()
+
+
+class TraceWriter:
+    """Schreibt jeden abgeschlossenen Span als JSON-Zeile in eine Trace-Datei (eine Datei pro Job)."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False) + "\n"
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as trace_file:
+                trace_file.write(line)
+        except OSError as e:
+            logger.warning(f"Trace konnte nicht geschrieben werden: {e}")
+
+
+_current_span: contextvars.ContextVar[Union[Span, None]] = contextvars.ContextVar("current_span", default=None)
+_current_trace: contextvars.ContextVar[Union[TraceWriter, None]] = contextvars.ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def use_trace(path: Union[str, Path]) -> Iterator[TraceWriter]:
+    """Leitet alle Spans im aktuellen Kontext (inkl. Worker-Threads aus batch.run_bounded) in die Trace-Datei."""
+    writer = TraceWriter(path)
+    token = _current_trace.set(writer)
+    try:
+        yield writer
+    finally:
+        _current_trace.reset(token)
+
+
+def record_span(span: Span):
+    """Übernimmt einen abgeschlossenen Span in die Messwerte und den Trace des aktuellen Kontexts."""
+    registry.record(span)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.write(span)
+
+
+@contextmanager
+def instrument(operation: str, current: bool = True, **labels: str) -> Iterator[Span]:
+    """
+    Misst eine Operation und zeichnet sie auf. Mit current=True ist der Span für add_to_span()
+    und set_span_label() erreichbar; in Generatoren sollte current=False verwendet werden,
+    weil der Kontext dort zwischen den yields an den Aufrufer zurückgeht.
+    """
+    span = Span(operation, labels)
+    token = _current_span.set(span) if current else None
+    started = time.perf_counter()
+    try:
+        yield span
+    except GeneratorExit:
+        # Ein vorzeitig beendeter Generator ist kein Fehler der Operation
+        raise
+    except BaseException as e:
+        span.status = "error"
+        span.error = span.error or f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.duration = time.perf_counter() - started
+        if token is not None:
+            _current_span.reset(token)
+        record_span(span)
+
+
+def instrument_iter(
+    operation: str,
+    iterable: Iterable[Any],
+    amounts: Union[Callable[[Any], Dict[str, int]], None] = None,
+    **labels: str,
+) -> Iterator[Any]:
+    """
+    Misst einen Iterator: Die Dauer umfasst nur die Zeit, die der Iterator selbst für die Elemente
+    braucht, nicht die des Verbrauchers zwischen zwei Elementen. amounts(element) liefert die
+    Zählgrößen je Element (z.B. {"chars": len(seite)}).
+    """
+    span = Span(operation, labels)
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                span.duration += time.perf_counter() - started
+            if amounts is not None:
+                for field, value in amounts(item).items():
+                    span.amounts[field] += value
+            yield item
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        span.status = "error"
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record_span(span)
+
+
+def instrumented(operation: str, **labels: str) -> Callable:
+    """Decorator-Variante von instrument() für ganze Funktionen."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with instrument(operation, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_to_span(**amounts: int):
+    """Addiert Zählgrößen (bytes_out, bytes_in, chars, retries, rate_limited) zum aktuellen Span."""
+    span = _current_span.get()
+    if span is not None:
+        for field, value in amounts.items():
+            span.amounts[field] += value
+
+
+def set_span_label(key: str, value: str):
+    """Setzt ein Label am aktuellen Span, z.B. cache=hit/miss."""
+    span = _current_span.get()
+    if span is not None:
+        span.labels[key] = value
+
+
+def mark_span_failed(error: str):
+    """Markiert den aktuellen Span als fehlgeschlagen, wenn die Funktion den Fehler selbst abfängt."""
+    span = _current_span.get()
+    if span is not None:
+        span.status = "error"
+        span.error = error
+
+
+def write_prometheus_file(path: Union[str, Path, None] = METRICS_FILE):
+    """Schreibt die Messwerte atomar als Prometheus-Textdatei (ohne Pfad passiert nichts)."""
+    if not path:
+        return
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(registry.render_prometheus(), encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Metrik-Datei {path} konnte nicht geschrieben werden: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+_metrics_server: Union[ThreadingHTTPServer, None] = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> Union[ThreadingHTTPServer, None]:
+    """Startet einmal pro Prozess einen HTTP-Endpunkt /metrics für Prometheus (port=0 deaktiviert)."""
+    global _metrics_server
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            except OSError as e:
+                logger.warning(f"Metrik-Endpunkt auf Port {port} konnte nicht gestartet werden: {e}")
+                return None
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info(f"Prometheus-Metriken unter http://0.0.0.0:{port}/metrics")
+        return _metrics_server
@@ -0,0 +1,42 @@
+# preload.py
+
+import importlib
+import logging
+import sys
+import threading
+import time
+from typing import Set
+
+logger = logging.getLogger(__name__)
+
+# Schwere Abhängigkeiten je Werkzeug. Die Module importieren sie erst bei Bedarf; die Oberfläche
+# lädt sie vor, sobald ein Tab sie absehbar braucht, damit der erste Job nicht darauf wartet.
+GEMINI_MODULES = ("google.generativeai",)
+EXPORT_MODULES = ("openpyxl",)
+TTS_MODULES = ("elevenlabs.client", "fitz")
+
+_requested: Set[str] = set()
+_requested_lock = threading.Lock()
+
+
+def _import_modules(module_names):
+    for module_name in module_names:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning(f"Vorladen von {module_name} fehlgeschlagen: {e}")
+            continue
+        logger.info(f"{module_name} vorgeladen ({(time.perf_counter() - start) * 1000:.0f} ms).")
+
+
+def preload_modules(*module_names: str):
+    """
+    Importiert die Module in einem Hintergrund-Thread, ohne den aktuellen Rerun zu blockieren.
+    Jedes Modul wird pro Prozess höchstens einmal angestoßen; bereits geladene werden übersprungen.
+    """
+    with _requested_lock:
+        pending = [name for name in module_names if name not in _requested and name not in sys.modules]
+        _requested.update(pending)
+    if pending:
+        threading.Thread(target=_import_modules, args=(pending,), name="preload", daemon=True).start()
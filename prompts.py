@@ -40,4 +40,32 @@ Beachte dabei die aktuellen SEO Best Practices:
 Gib *nur* die beiden Attribute im folgenden Format zurück, ohne zusätzliche Erklärungen oder Formatierungen:
 ALT: [Hier der generierte Alt-Text]
 TITLE: [Hier der generierte Title-Text]
-"""
\ No newline at end of file
+"""
+
+# Kombinierter Prompt: Richtlinien des Barrierefreiheits-Prompts plus SEO-Attribute, Ausgabe als JSON.
+# Wird aus den beiden Vorlagen oben abgeleitet, damit Änderungen an den Richtlinien automatisch übernommen werden.
+COMBINED_PROMPT_TEMPLATE = ACCESSIBILITY_PROMPT_TEMPLATE.split("FINALES AUSGABEFORMAT:", 1)[0] + """ZUSÄTZLICH: SEO-ATTRIBUTE
+Erzeuge für dasselbe Bild außerdem SEO-optimierte HTML-Attribute:
+- 'alt'-Attribut: beschreibt das Bild präzise und prägnant (Objekte, Personen, Aktionen, ggf. Text im Bild). Vermeide Keyword-Stuffing.
+- 'title'-Attribut: liefert zusätzliche kontextbezogene Informationen.
+
+FINALES AUSGABEFORMAT:
+Antworte ausschließlich mit einem JSON-Objekt mit genau diesen vier Feldern, ohne zusätzliche Einleitungen oder Kommentare:
+- "kurzbeschreibung": prägnante, eigenständige Kurzbeschreibung, die die 140-Zeichen-Grenze strikt einhält
+- "langbeschreibung": detaillierte, erweiterte Beschreibung ohne Längenbeschränkung
+- "seo_alt": der generierte Alt-Text
+- "seo_title": der generierte Title-Text
+"""
+
+# Gebündelter SEO-Prompt: mehrere kleine Bilder in einer Anfrage, Antwort als JSON-Liste mit Bildnummern.
+# Übernimmt die Richtlinien des SEO-Prompts; $ANZAHL wird durch die Zahl der Bilder ersetzt.
+PACKED_SEO_PROMPT_TEMPLATE = SEO_PROMPT.split("Gib *nur*", 1)[0].replace(
+    "Analysiere das folgende Bild sorgfältig.\nDeine Aufgabe ist es, SEO-optimierte HTML-Attribute für dieses Bild zu generieren:",
+    "Analysiere die folgenden $ANZAHL Bilder sorgfältig. Jedes Bild wird durch eine Zeile 'BILD <Nummer>:' eingeleitet.\n"
+    "Deine Aufgabe ist es, für jedes Bild einzeln SEO-optimierte HTML-Attribute zu generieren:",
+) + """Behandle jedes Bild unabhängig von den anderen.
+Antworte ausschließlich mit einer JSON-Liste, die für jedes Bild genau ein Objekt mit diesen Feldern enthält:
+- "index": die Nummer des Bildes (1 bis $ANZAHL)
+- "alt": der generierte Alt-Text
+- "title": der generierte Title-Text
+"""
@@ -0,0 +1,232 @@
+# providers.py
+
+import json
+import logging
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple, Union
+
+from prompts import SEO_PROMPT
+
+logger = logging.getLogger(__name__)
+
+# Verbindungs-Pool für ElevenLabs (gilt für alle API-Schlüssel gemeinsam)
+HTTP_POOL_SIZE = int(os.environ.get("SEO_HELPER_HTTP_POOL_SIZE", "10"))
+HTTP_KEEPALIVE_SECONDS = float(os.environ.get("SEO_HELPER_HTTP_KEEPALIVE_SECONDS", "120"))
+# Zeitlimit je ElevenLabs-Anfrage (api_calls kürzt es bei einer Job-Frist auf deren Restzeit)
+ELEVENLABS_TIMEOUT_SECONDS = float(os.environ.get("ELEVENLABS_TIMEOUT_SECONDS", "300"))
+ELEVENLABS_VOICES_TIMEOUT_SECONDS = 60
+# 'live' spricht die echten APIs an, 'stub' antwortet lokal mit Platzhaltern (Entwicklung ohne Schlüssel)
+DEFAULT_BACKEND = os.environ.get("SEO_HELPER_BACKEND", "live")
+
+
+class Voice(NamedTuple):
+    name: str
+    voice_id: str
+    preview_url: Union[str, None]
+
+
+class TextResponse(NamedTuple):
+    """Antwort eines Sprachmodells; entspricht dem Teil der Gemini-Antwort, den die App nutzt."""
+    text: str
+
+
+class Backend(ABC):
+    """
+    Schnittstelle zu Gemini und ElevenLabs. api_calls spricht die Dienste nur hierüber an,
+    sodass sich ein lokaler Ersatz (Stub, Benchmark-Fakes) ohne Änderungen einsetzen lässt.
+    Implementierungen müssen thread-sicher sein.
+    """
+
+    @abstractmethod
+    def generate_content(self, model_name: str, contents: List[Any], **kwargs: Any) -> Any:
+        """Wie genai.GenerativeModel(model_name).generate_content(contents, **kwargs); die Antwort hat .text."""
+
+    @abstractmethod
+    def text_to_speech(self, api_key: str, voice_id: str, text: str, model_id: str, timeout: Union[float, None] = None) -> Iterable[bytes]:
+        """Synthetisiert text und liefert die Audio-Bytes in Stücken; timeout (Sekunden) begrenzt die Anfrage."""
+
+    @abstractmethod
+    def list_voices(self, api_key: str) -> List[Voice]:
+        """Verfügbare Stimmen des ElevenLabs-Kontos."""
+
+    def close(self):
+        """Gibt offene Verbindungen frei."""
+
+
+class LiveBackend(Backend):
+    """
+    Echte APIs mit langlebigen Clients: ein GenerativeModel je Modell und Schlüssel, ein ElevenLabs-Client
+    je Schlüssel. Alle ElevenLabs-Clients teilen sich einen httpx-Verbindungs-Pool mit Keep-Alive,
+    sodass aufeinanderfolgende Chunks keine neuen TLS-Verbindungen aufbauen.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, keepalive_seconds: float = HTTP_KEEPALIVE_SECONDS):
+        self.pool_size = max(1, pool_size)
+        self.keepalive_seconds = keepalive_seconds
+        # SDK-Objekte; die SDKs selbst werden erst beim ersten Aufruf importiert (schnellerer App-Start)
+        self._http: Any = None
+        self._gemini_key: Union[str, None] = None
+        self._models: Dict[Tuple[str, Union[str, None]], Any] = {}
+        self._speech_clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def configure_gemini(self, api_key: str):
+        """Setzt den Gemini-Schlüssel; Modelle des vorherigen Schlüssels werden verworfen."""
+        with self._lock:
+            if api_key != self._gemini_key:
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                self._gemini_key = api_key
+                self._models.clear()
+
+    def _model(self, model_name: str) -> Any:
+        import google.generativeai as genai
+        with self._lock:
+            key = (model_name, self._gemini_key)
+            model = self._models.get(key)
+            if model is None:
+                # Das Modell hält nach dem ersten Aufruf seinen gRPC-Client; der Kanal bündelt
+                # parallele Anfragen über eine HTTP/2-Verbindung
+                model = self._models[key] = genai.GenerativeModel(model_name)
+            return model
+
+    def _speech_client(self, api_key: str) -> Any:
+        import httpx
+        from elevenlabs.client import ElevenLabs
+        with self._lock:
+            if self._http is None:
+                self._http = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=self.pool_size, max_keepalive_connections=self.pool_size,
+                        keepalive_expiry=self.keepalive_seconds,
+                    ),
+                    timeout=ELEVENLABS_TIMEOUT_SECONDS,
+                    follow_redirects=True,
+                )
+            client = self._speech_clients.get(api_key)
+            if client is None:
+                client = self._speech_clients[api_key] = ElevenLabs(
+                    api_key=api_key, timeout=ELEVENLABS_TIMEOUT_SECONDS, httpx_client=self._http,
+                )
+            return client
+
+    def generate_content(self, model_name: str, contents: List[Any], **kwargs: Any) -> Any:
+        return self._model(model_name).generate_content(contents, **kwargs)
+
+    def text_to_speech(self, api_key: str, voice_id: str, text: str, model_id: str, timeout: Union[float, None] = None) -> Iterable[bytes]:
+        request_options = {"timeout_in_seconds": math.ceil(timeout)} if timeout else None
+        return self._speech_client(api_key).text_to_speech.convert(
+            voice_id=voice_id, text=text, model_id=model_id, request_options=request_options,
+        )
+
+    def list_voices(self, api_key: str) -> List[Voice]:
+        response = self._speech_client(api_key).voices.get_all(
+            request_options={"timeout_in_seconds": ELEVENLABS_VOICES_TIMEOUT_SECONDS}
+        )
+        return [Voice(voice.name, voice.voice_id, voice.preview_url) for voice in response.voices]
+
+    def close(self):
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            self._http = None
+            self._speech_clients.clear()
+            self._models.clear()
+
+
+def stub_audio_bytes(text: str) -> bytes:
+    """Deterministische Platzhalter-Audiodaten, deren Größe grob mit der Textlänge wächst (~1 KB je 60 Zeichen)."""
+    frame = b"\xff\xfb\x90\x64" + bytes(413)
+    return frame * max(1, len(text) // 25)
+
+
+class StubBackend(Backend):
+    """
+    Lokaler Ersatz ohne Netzwerk: antwortet sofort mit Platzhaltern im jeweils erwarteten Format
+    (ALT/TITLE, KURZ --- LANG oder JSON) und liefert Platzhalter-Audio.
+    """
+
+    def __init__(self):
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def _next_number(self) -> int:
+        with self._lock:
+            self._calls += 1
+            return self._calls
+
+    def generate_content(self, model_name: str, contents: List[Any], **kwargs: Any) -> TextResponse:
+        prompt = contents[0] if contents else ""
+        number = self._next_number()
+        generation_config = kwargs.get("generation_config")
+        image_markers = [part for part in contents if isinstance(part, str) and part.startswith("BILD ")]
+        if image_markers:
+            # Gebündelte SEO-Anfrage: eine indizierte Antwort je Bild
+            return TextResponse(json.dumps([
+                {"index": index, "alt": f"Balkendiagramm mit steigenden Werten ({number}.{index})", "title": f"Steigende Werte {number}.{index}"}
+                for index in range(1, len(image_markers) + 1)
+            ], ensure_ascii=False))
+        if getattr(generation_config, "response_mime_type", None) == "application/json":
+            return TextResponse(json.dumps({
+                "kurzbeschreibung": f"Kurzbeschreibung {number}: Ein Diagramm mit drei Balken.",
+                "langbeschreibung": f"Langbeschreibung {number}: Das Diagramm zeigt drei Balken unterschiedlicher Höhe, "
+                                    "die von links nach rechts ansteigen.",
+                "seo_alt": f"Balkendiagramm mit steigenden Werten ({number})",
+                "seo_title": f"Steigende Werte {number}",
+            }, ensure_ascii=False))
+        if prompt == SEO_PROMPT:
+            return TextResponse(f"TITLE: Steigende Werte {number}\nALT: Balkendiagramm mit steigenden Werten ({number})")
+        return TextResponse(
+            f"KURZBESCHREIBUNG: Ein Diagramm mit drei Balken ({number}).\n---\n"
+            f"LANGBESCHREIBUNG: Das Diagramm zeigt drei Balken unterschiedlicher Höhe ({number})."
+        )
+
+    def text_to_speech(self, api_key: str, voice_id: str, text: str, model_id: str, timeout: Union[float, None] = None) -> Iterable[bytes]:
+        audio = stub_audio_bytes(text)
+        # Wie die echte API in Stücken streamen
+        return (audio[start:start + 4096] for start in range(0, len(audio), 4096))
+
+    def list_voices(self, api_key: str) -> List[Voice]:
+        return [Voice("Platzhalter-Stimme", "stub-voice", "https://example.invalid/preview.mp3")]
+
+
+BACKENDS = {"live": LiveBackend, "stub": StubBackend}
+
+_default_backend: Union[Backend, None] = None
+_default_backend_lock = threading.Lock()
+
+
+def get_backend() -> Backend:
+    """Gibt das prozessweit geteilte Backend zurück (wird beim ersten Aufruf gemäß SEO_HELPER_BACKEND angelegt)."""
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            if DEFAULT_BACKEND not in BACKENDS:
+                raise ValueError(f"Unbekanntes Backend: {DEFAULT_BACKEND} (erlaubt: {', '.join(BACKENDS)})")
+            _default_backend = BACKENDS[DEFAULT_BACKEND]()
+            logger.info(f"API-Backend: {DEFAULT_BACKEND}")
+        return _default_backend
+
+
+@contextmanager
+def use_backend(backend: Backend) -> Iterator[Backend]:
+    """Ersetzt das prozessweite Backend für die Dauer des Blocks (z.B. durch Fakes in Benchmarks)."""
+    global _default_backend
+    with _default_backend_lock:
+        previous, _default_backend = _default_backend, backend
+    try:
+        yield backend
+    finally:
+        with _default_backend_lock:
+            _default_backend = previous
+
+
+def configure_gemini(api_key: str):
+    """Setzt den Gemini-Schlüssel für das Live-Backend (ohne Aufruf gilt die Umgebungsvariable GOOGLE_API_KEY)."""
+    backend = get_backend()
+    if isinstance(backend, LiveBackend):
+        backend.configure_gemini(api_key)
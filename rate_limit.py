@@ -0,0 +1,174 @@
+# rate_limit.py
+
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Tuple, Type, Union
+
+from cancellation import cancellable_sleep, check_cancelled
+from metrics import add_to_span
+
+logger = logging.getLogger(__name__)
+
+# Muster, mit denen die Gemini API eine Wartezeit empfiehlt
+_RETRY_DELAY_PATTERNS = [
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)"),
+    re.compile(r"retry in\s*([\d.]+)\s*s", re.IGNORECASE),
+]
+
+
+def extract_retry_delay(error: Exception) -> Union[float, None]:
+    """
+    Liest die von der API empfohlene Wartezeit (in Sekunden) aus einer Exception.
+    Berücksichtigt strukturierte RetryInfo-Details und die Textform der Fehlermeldung.
+    Gibt None zurück, wenn keine Empfehlung enthalten ist.
+    """
+    for detail in getattr(error, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            seconds = getattr(retry_delay, "seconds", 0) + getattr(retry_delay, "nanos", 0) / 1e9
+            if seconds > 0:
+                return float(seconds)
+
+    message = str(error)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """
+    Thread-sicherer Token Bucket für ein Budget an Anfragen pro Minute.
+    Die Rate kann zur Laufzeit gesenkt werden, und mit pause() lässt sich der
+    gesamte Bucket bis zu einem Zeitpunkt anhalten.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: Union[int, None] = None):
+        self.max_rate = max(float(requests_per_minute), 1.0)
+        self.rate = self.max_rate
+        self.capacity = float(burst if burst is not None else max(1, int(self.max_rate // 10)))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self._last_refill)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate / 60.0)
+        self._last_refill = now
+
+    def acquire(self):
+        """Blockiert, bis ein Token verfügbar ist, und verbraucht es. Ein Abbruch des Jobs beendet das Warten (Cancelled)."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait_time = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait_time = (1.0 - self._tokens) * 60.0 / self.rate
+            cancellable_sleep(wait_time)
+
+    def pause(self, seconds: float):
+        """Hält alle Anfragen für die angegebene Dauer an."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._last_refill = self._paused_until
+
+    def set_rate(self, requests_per_minute: float):
+        """Setzt die aktuelle Rate, begrenzt auf 1 bis zur konfigurierten Maximalrate."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, max(1.0, requests_per_minute))
+
+
+class RequestScheduler:
+    """
+    Gemeinsamer Scheduler für API-Aufrufe. Hält ein Budget an Anfragen pro Minute ein und
+    wiederholt Aufrufe bei Rate-Limit-Fehlern mit exponentiellem Backoff und Jitter.
+    Bei einem Rate-Limit wird der ganze Batch gebremst: Der Bucket pausiert für die
+    empfohlene Wartezeit und die Rate wird halbiert. Rate-Limits von Anfragen, die vor der letzten
+    Halbierung gestartet wurden, halbieren nicht erneut: Eine Welle paralleler 429-Antworten
+    bremst nur einmal. Erfolgreiche Aufrufe erhöhen die Rate schrittweise wieder bis zum konfigurierten Budget.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        retry_exceptions: Union[Tuple[Type[BaseException], ...], Callable[[], Tuple[Type[BaseException], ...]]],
+        max_retries: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 120.0,
+        name: str = "api",
+    ):
+        self.bucket = TokenBucket(requests_per_minute)
+        self._retry_exceptions = retry_exceptions
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.name = name
+        self._last_reduction = float("-inf")
+        self._reduction_lock = threading.Lock()
+
+    @property
+    def retry_exceptions(self) -> Tuple[Type[BaseException], ...]:
+        """
+        Die Exceptions, bei denen wiederholt wird. Wurde eine Funktion übergeben, wird sie beim ersten Fehler
+        aufgerufen; so muss das SDK, aus dem die Exceptions stammen, nicht schon beim Import geladen werden.
+        """
+        if callable(self._retry_exceptions):
+            self._retry_exceptions = self._retry_exceptions()
+        return self._retry_exceptions
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # "Full Jitter": zufällige Wartezeit bis zur exponentiell wachsenden Obergrenze
+        return random.uniform(self.base_delay, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _on_success(self):
+        if self.bucket.rate < self.bucket.max_rate:
+            self.bucket.set_rate(self.bucket.rate + self.bucket.max_rate / 20.0)
+
+    def _on_rate_limited(self, delay: float, issued_at: float) -> float:
+        """Pausiert den Bucket, halbiert die Rate höchstens einmal pro Welle und gibt die gesetzte Rate zurück."""
+        with self._reduction_lock:
+            if issued_at >= self._last_reduction:
+                self.bucket.set_rate(self.bucket.rate / 2.0)
+                self._last_reduction = time.monotonic()
+            self.bucket.pause(delay)
+            return self.bucket.rate
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Führt fn(*args, **kwargs) innerhalb des Budgets aus.
+        Nach max_retries Rate-Limit-Fehlern wird die letzte Exception weitergereicht.
+        Ist der Job abgebrochen, startet kein weiterer Versuch.
+        """
+        for attempt in range(self.max_retries + 1):
+            check_cancelled()
+            self.bucket.acquire()
+            issued_at = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except self.retry_exceptions as e:
+                add_to_span(rate_limited=1)
+                if attempt >= self.max_retries:
+                    raise
+                add_to_span(retries=1)
+                hinted_delay = extract_retry_delay(e)
+                delay = max(hinted_delay or 0.0, self._backoff_delay(attempt))
+                rate = self._on_rate_limited(delay, issued_at)
+                logger.warning(
+                    f"Rate Limit bei {self.name} (Versuch {attempt + 1}/{self.max_retries + 1}). "
+                    f"Warte {delay:.1f}s, Rate {rate:.1f}/min."
+                )
+                continue
+            self._on_success()
+            return result
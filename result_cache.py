@@ -0,0 +1,194 @@
+# result_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Union
+
+logger = logging.getLogger(__name__)
+
+# Speicherort und Größe des Caches lassen sich über Umgebungsvariablen (bzw. Streamlit Secrets) anpassen
+DEFAULT_CACHE_DIR = os.environ.get("SEO_HELPER_CACHE_DIR", str(Path(__file__).parent / ".cache" / "results"))
+DEFAULT_CACHE_MAX_BYTES = int(float(os.environ.get("SEO_HELPER_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+
+def content_hash(data: Union[bytes, str]) -> str:
+    """SHA-256 eines Bytes- oder Text-Inhalts als Hex-String."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_content_hash(path: Union[str, os.PathLike]) -> str:
+    """Wie content_hash(), liest die Datei aber blockweise statt sie komplett in den Speicher zu laden."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file_object:
+        for block in iter(lambda: file_object.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_cache_key(*parts: Union[bytes, str]) -> str:
+    """
+    Baut einen Cache-Schlüssel aus mehreren Bestandteilen (z.B. Art der Anfrage, Inhalts-Hash,
+    Prompt-Hash, Modellname). Die Teile werden mit Längenpräfix gehasht, damit sich
+    unterschiedliche Kombinationen nicht überschneiden.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Persistenter, inhaltsadressierter Cache auf der Festplatte.
+    Die Werte liegen als Blob-Dateien vor, ein SQLite-Index speichert Größe und letzten Zugriff.
+    Überschreitet der Cache max_bytes, werden die am längsten nicht genutzten Einträge gelöscht (LRU).
+    Fehler beim Lesen oder Schreiben werden nur geloggt, damit ein defekter Cache keine Anfrage verhindert.
+    """
+
+    def __init__(self, directory: Union[str, Path] = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.blob_dir = self.directory / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / "index.sqlite3"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Öffnet eine kurzlebige Verbindung, committet am Ende und schließt sie wieder."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _blob_path(self, key: str) -> Path:
+        return self.blob_dir / key[:2] / key
+
+    def _existing_path(self, key: str, touch: bool) -> Union[Path, None]:
+        path = self._blob_path(key)
+        try:
+            if not touch:
+                # Reine Abfrage: liest nur den Index und lässt die LRU-Reihenfolge unverändert
+                with self._connect() as conn:
+                    row = conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+                return path if row is not None and path.exists() else None
+            with self._lock, self._connect() as conn:
+                row = conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None or not path.exists():
+                    return None
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            return path
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Cache-Zugriff fehlgeschlagen für {key}: {e}")
+            return None
+
+    def path_for(self, key: str) -> Union[Path, None]:
+        """Gibt den Pfad der Blob-Datei zurück, falls der Eintrag existiert, und markiert ihn als genutzt (Lesepfad)."""
+        return self._existing_path(key, touch=True)
+
+    def contains(self, key: str) -> bool:
+        """Prüft, ob ein Eintrag existiert, ohne ihn zu lesen oder seinen letzten Zugriff zu ändern."""
+        return self._existing_path(key, touch=False) is not None
+
+    def get(self, key: str) -> Union[bytes, None]:
+        """Liest einen Eintrag oder gibt None zurück."""
+        path = self.path_for(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError as e:
+            logger.warning(f"Cache-Eintrag {key} konnte nicht gelesen werden: {e}")
+            return None
+
+    def set(self, key: str, value: bytes):
+        """Speichert einen Eintrag und räumt danach bei Bedarf alte Einträge auf."""
+        path = self._blob_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(value)
+            os.replace(tmp_path, path)
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                    (key, len(value), time.time()),
+                )
+            self._evict()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Cache-Eintrag {key} konnte nicht geschrieben werden: {e}")
+
+    def delete(self, key: str):
+        """Entfernt einen Eintrag samt Blob-Datei."""
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._blob_path(key).unlink(missing_ok=True)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Cache-Eintrag {key} konnte nicht gelöscht werden: {e}")
+
+    def get_json(self, key: str) -> Any:
+        """
+        Liest einen als JSON gespeicherten Eintrag oder gibt None zurück.
+        Ein beschädigter Eintrag (abgeschnitten, kein JSON) wird gelöscht und wie ein fehlender behandelt.
+        """
+        raw = self.get(key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            logger.warning(f"Cache-Eintrag {key} ist beschädigt und wird verworfen: {e}")
+            self.delete(key)
+            return None
+
+    def set_json(self, key: str, value: Any):
+        """Speichert einen Wert als JSON."""
+        self.set(key, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def _evict(self):
+        with self._lock, self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._blob_path(key).unlink(missing_ok=True)
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+            logger.info(f"Cache aufgeräumt, aktuelle Größe: {total / 1024 / 1024:.1f} MB")
+
+
+_default_cache: Union[ResultCache, None] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Gibt den prozessweit geteilten Cache zurück (wird beim ersten Aufruf angelegt)."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
@@ -0,0 +1,190 @@
+# routing.py
+
+import logging
+import os
+from io import BytesIO
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple, Union
+
+from PIL import Image, ImageFilter
+
+from api_calls import (
+    DEFAULT_GEMINI_MODEL, ERROR_KIND_UNPARSEABLE, generate_seo_tags_cached, generate_accessibility_description_cached,
+    generate_combined_descriptions_cached, generate_seo_tags_packed, is_result_cached,
+)
+from metrics import instrument, registry, set_span_label
+
+logger = logging.getLogger(__name__)
+
+# Schnelles Modell für einfache Bilder, Pro-Modell für komplexe Bilder und als Rückfallebene
+FAST_GEMINI_MODEL = os.environ.get("SEO_HELPER_FAST_MODEL", "gemini-1.5-flash-latest")
+PRO_GEMINI_MODEL = os.environ.get("SEO_HELPER_PRO_MODEL", DEFAULT_GEMINI_MODEL)
+# 'auto' wählt je Bild, 'pro' bzw. 'fast' erzwingen ein Modell
+MODEL_ROUTING = os.environ.get("SEO_HELPER_MODEL_ROUTING", "auto")
+# Bilder mit einer Komplexität ab diesem Wert (0..1) gehen direkt an das Pro-Modell
+COMPLEXITY_THRESHOLD = float(os.environ.get("SEO_HELPER_COMPLEXITY_THRESHOLD", "0.4"))
+ROUTES = {"fast": FAST_GEMINI_MODEL, "pro": PRO_GEMINI_MODEL}
+
+# Analyse auf einer kleinen Graustufen-Kopie: Kantenlänge, Schwelle für "deutliche" Kanten
+_ANALYSIS_EDGE = 256
+_EDGE_LEVEL = 48
+
+
+class ImageComplexity(NamedTuple):
+    """
+    Lokal geschätzte Bildkomplexität. edge_density: Anteil deutlicher Kanten, text_likeness: wie sehr das Bild
+    nach Schrift oder Strichgrafik aussieht (viele Kanten bei fast nur hellen und dunklen Pixeln), colours: Anzahl grob
+    unterschiedener Farben, megapixels: Größe des Originals. score fasst alles zu 0 (trivial) bis 1 zusammen.
+    """
+    edge_density: float
+    text_likeness: float
+    colours: int
+    megapixels: float
+    score: float
+
+
+def estimate_complexity(image_bytes: bytes, original_size: Union[Tuple[int, int], None] = None) -> ImageComplexity:
+    """
+    Schätzt die Komplexität eines Bildes in wenigen Millisekunden, ohne API-Aufruf.
+    Logos, Icons und einfache Fotos landen niedrig; Diagramme, Karten, Tabellen und Textgrafiken hoch.
+    image_bytes ist meist schon das für die API verkleinerte Bild; original_size (Breite, Höhe des Uploads)
+    liefert dann die Größe für megapixels, sonst wird die Größe von image_bytes verwendet.
+    """
+    with Image.open(BytesIO(image_bytes)) as pil_image:
+        if getattr(pil_image, "n_frames", 1) > 1:
+            pil_image.seek(0)
+        width, height = original_size or pil_image.size
+        pil_image.draft("RGB", (_ANALYSIS_EDGE, _ANALYSIS_EDGE))
+        sample = pil_image.convert("RGB")
+    sample.thumbnail((_ANALYSIS_EDGE, _ANALYSIS_EDGE))
+    gray = sample.convert("L")
+    pixel_count = gray.width * gray.height
+
+    edge_histogram = gray.filter(ImageFilter.FIND_EDGES).histogram()
+    edge_density = sum(edge_histogram[_EDGE_LEVEL:]) / pixel_count
+
+    # Schrift, Tabellen, Diagramme: viele Kanten auf fast nur sehr hellen bzw. sehr dunklen Pixeln
+    gray_histogram = gray.histogram()
+    extremes = (sum(gray_histogram[:64]) + sum(gray_histogram[192:])) / pixel_count
+    text_likeness = extremes ** 2 * min(1.0, edge_density / 0.1)
+
+    # Farben auf 4 Bit je Kanal vergröbert; Fotos haben Tausende, Grafiken wenige
+    colour_list = sample.point(lambda value: value & 0xF0).getcolors(4096)
+    colours = len(colour_list) if colour_list is not None else 4096
+
+    # Flächige Grafik mit vielen Kanten (Diagramm, Karte) wiegt schwerer als ein Foto mit gleich vielen Kanten
+    flat = 1.0 - min(1.0, colours / 1024)
+    megapixels = width * height / 1e6
+    score = 0.45 * min(1.0, edge_density / 0.15) * (0.6 + 0.4 * flat) + 0.45 * text_likeness + 0.1 * min(1.0, megapixels / 12)
+    return ImageComplexity(round(edge_density, 4), round(text_likeness, 4), colours, round(megapixels, 3), round(min(1.0, score), 4))
+
+
+def choose_route(complexity: Union[ImageComplexity, None]) -> str:
+    """'fast' oder 'pro' gemäß MODEL_ROUTING und Komplexität (ohne Schätzung: 'pro')."""
+    if MODEL_ROUTING in ROUTES:
+        return MODEL_ROUTING
+    if complexity is None or complexity.score >= COMPLEXITY_THRESHOLD:
+        return "pro"
+    return "fast"
+
+
+def route_for(task: str, image_bytes: bytes, ebook_context: str = "", complexity: Union[ImageComplexity, None] = None) -> str:
+    """Wie choose_route(), nimmt aber 'pro', wenn für das Bild schon ein Pro-Ergebnis im Cache liegt."""
+    route = choose_route(complexity)
+    if route == "fast" and is_result_cached(task, image_bytes, ebook_context, PRO_GEMINI_MODEL):
+        return "pro"
+    return route
+
+
+def _request_fields(task: str, model_name: str, image_bytes: bytes, file_name: str, ebook_context: str) -> Dict[str, Any]:
+    if task == "seo":
+        return generate_seo_tags_cached(image_bytes, file_name, model_name)
+    if task == "accessibility":
+        return generate_accessibility_description_cached(image_bytes, file_name, ebook_context, model_name)
+    combined = generate_combined_descriptions_cached(image_bytes, file_name, ebook_context, model_name)
+    if "error" in combined:
+        return combined
+    return {
+        "short_desc": combined.get("kurzbeschreibung"), "long_desc": combined.get("langbeschreibung"),
+        "alt": combined.get("seo_alt"), "title": combined.get("seo_title"),
+    }
+
+
+def needs_fallback(fields: Dict[str, Any]) -> bool:
+    """
+    Ob eine Antwort des schnellen Modells beim Pro-Modell nachgefragt wird: nur wenn sie unbrauchbar war.
+    Rate-Limits, Zugangs- und Verbindungsfehler würden beim Pro-Modell nur eine zweite Anfrage kosten.
+    """
+    return fields.get("error_kind") == ERROR_KIND_UNPARSEABLE
+
+
+def generate_fields_routed(
+    task: str,
+    image_bytes: bytes,
+    file_name: str,
+    ebook_context: str = "",
+    complexity: Union[ImageComplexity, None] = None,
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Erzeugt die Felder der Aufgabe mit dem passenden Modell und gibt (felder, modellname) zurück;
+    schlägt die Anfrage fehl, enthalten die Felder nur "error" und "error_kind".
+    Einfache Bilder gehen an FAST_GEMINI_MODEL; liefert es keine brauchbare Antwort (nicht parsebar, unvollständig),
+    wird das Bild beim Pro-Modell nachgefragt. Andere Fehler werden unverändert zurückgegeben. Liegt bereits ein Pro-Ergebnis im Cache, wird es verwendet.
+    Jeder Aufruf wird als Operation 'gemini.route' mit route und fallback gemessen (siehe routing_summary()).
+    """
+    route = route_for(task, image_bytes, ebook_context, complexity)
+    with instrument("gemini.route", task=task, route=route, fallback="no"):
+        model_name = ROUTES[route]
+        fields = _request_fields(task, model_name, image_bytes, file_name, ebook_context)
+        if route == "fast" and needs_fallback(fields):
+            logger.info(f"Schnelles Modell lieferte für '{file_name}' keine vollständige Antwort, frage {PRO_GEMINI_MODEL} an.")
+            set_span_label("fallback", "pro")
+            model_name = PRO_GEMINI_MODEL
+            fields = _request_fields(task, model_name, image_bytes, file_name, ebook_context)
+    return fields, model_name
+
+
+def generate_seo_pack_routed(images: Sequence[Tuple[bytes, str]], route: str) -> List[Tuple[Dict[str, str], str]]:
+    """
+    Gebündelte SEO-Anfrage (siehe generate_seo_tags_packed) über die Route route; gibt (felder, modellname)
+    je Bild zurück. Bilder, für die das schnelle Modell keine brauchbare Antwort liefert, werden einzeln beim Pro-Modell
+    nachgefragt (siehe needs_fallback). Gemessen wird das Paket als eine Anfrage der Aufgabe 'seo_packed'.
+    """
+    with instrument("gemini.route", task="seo_packed", route=route, fallback="no"):
+        model_name = ROUTES[route]
+        results = [(fields, model_name) for fields in generate_seo_tags_packed(images, model_name)]
+        if route == "fast":
+            for position, (fields, _) in enumerate(results):
+                if not needs_fallback(fields):
+                    continue
+                image_bytes, file_name = images[position]
+                logger.info(f"Schnelles Modell lieferte für '{file_name}' keine vollständige Antwort, frage {PRO_GEMINI_MODEL} an.")
+                set_span_label("fallback", "pro")
+                results[position] = (generate_seo_tags_cached(image_bytes, file_name, PRO_GEMINI_MODEL), PRO_GEMINI_MODEL)
+    return results
+
+
+def routing_summary(rows: Union[List[Dict[str, Any]], None] = None) -> List[Dict[str, Any]]:
+    """
+    Latenz und Rückfallquote je Aufgabe und Route aus den Messwerten (Standard: prozessweite Registry).
+    fallback_rate ist der Anteil der Anfragen über das schnelle Modell, die (ganz oder teilweise) beim Pro-Modell landeten.
+    """
+    grouped: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in registry.snapshot() if rows is None else rows:
+        if row["operation"] != "gemini.route":
+            continue
+        entry = grouped.setdefault((row["task"], row["route"]), {
+            "task": row["task"], "route": row["route"], "model": ROUTES.get(row["route"], ""),
+            "count": 0, "errors": 0, "fallbacks": 0, "_ms_sum": 0.0, "max_ms": 0.0,
+        })
+        entry["count"] += row["count"]
+        entry["errors"] += row["errors"]
+        entry["fallbacks"] += row["count"] if row.get("fallback") == "pro" else 0
+        entry["_ms_sum"] += row["avg_ms"] * row["count"]
+        entry["max_ms"] = max(entry["max_ms"], row["max_ms"])
+    summary = []
+    for entry in grouped.values():
+        ms_sum = entry.pop("_ms_sum")
+        entry["avg_ms"] = round(ms_sum / entry["count"], 1) if entry["count"] else 0.0
+        entry["fallback_rate"] = round(entry["fallbacks"] / entry["count"], 3) if entry["count"] else 0.0
+        summary.append(entry)
+    return sorted(summary, key=lambda entry: (entry["task"], entry["route"]))
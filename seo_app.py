@@ -1,18 +1,33 @@
 # seo_app.py
 
 import streamlit as st
+import uuid
 from pathlib import Path
-import pandas as pd
-from io import BytesIO
-import json # <--- HIER IST DIE KORREKTUR
-import streamlit.components.v1 as components
+from functools import partial
 
 # Importiere die Navigation (streamlit-option-menu)
 from streamlit_option_menu import option_menu
 
 # Importiere Funktionen aus deinen Modulen
-from utils import convert_tiff_to_png_bytes, read_text_from_docx, read_text_from_pdf, chunk_text
-from api_calls import generate_seo_tags_cached, generate_accessibility_description_cached, generate_audio_from_text, get_available_voices
+from utils import (
+    format_byte_size, PreparedImage,
+    DEFAULT_MAX_EDGE, DEFAULT_QUALITY, SUPPORTED_IMAGE_EXTENSIONS, SUPPORTED_OUTPUT_FORMATS,
+)
+from api_calls import get_available_voices, ELEVENLABS_MAX_CONCURRENCY, PACKED_MAX_IMAGES, PACKED_MAX_PAYLOAD_BYTES
+from batch import DEFAULT_MAX_WORKERS, MAX_PARALLEL_REQUESTS
+from dedup import DEFAULT_MAX_DISTANCE
+from image_pipeline import is_successful
+from export import available_formats, EXPORT_FORMATS
+from jobs import DEFAULT_JOB_TIMEOUT_MINUTES, Job, get_job_registry, run_image_job, run_tts_job
+from audio import STATIC_MAX_BYTES
+from ui import install_copy_support, copy_button, paginate, static_audio
+from metrics import registry as metrics_registry, start_metrics_server
+from routing import routing_summary
+from preload import preload_modules, GEMINI_MODULES, EXPORT_MODULES, TTS_MODULES
+from uploads import MemoryBudget, SpooledUpload, get_session_memory_budget
+
+# Wie oft (in Sekunden) die Anzeige eines laufenden Jobs aktualisiert wird
+JOB_POLL_SECONDS = 1.0
 
 
 # --- Seitenkonfiguration & API Keys ---
@@ -22,6 +37,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Optionaler Prometheus-Endpunkt (SEO_HELPER_METRICS_PORT); wird nur einmal pro Prozess gestartet
+start_metrics_server()
+
 # Lade die API-Schlüssel aus den Streamlit Secrets
 gemini_api_key = st.secrets.get("GOOGLE_API_KEY")
 elevenlabs_api_key = st.secrets.get("ELEVENLABS_API_KEY")
@@ -70,7 +88,7 @@ with st.sidebar:
     
     st.subheader("ℹ️ Info")
 
-    supported_formats_images = "jpg, jpeg, png, gif, bmp, webp, tif, tiff"
+    supported_formats_images = ", ".join(SUPPORTED_IMAGE_EXTENSIONS)
 
     if selected_tool == "SEO Tags":
         st.markdown(f"""
@@ -86,7 +104,7 @@ with st.sidebar:
         
         **Unterstützte Formate:** `{supported_formats_images}`
         
-        **Download möglich:** Die Ergebnisse können als Excel-Datei heruntergeladen werden.
+        **Download möglich:** Die Ergebnisse können als Excel, CSV, JSONL oder Parquet heruntergeladen werden – auch schon während der Verarbeitung.
         
         Bei Fragen -> Gordon
         """)
@@ -101,66 +119,291 @@ with st.sidebar:
         Bei Fragen -> Gordon
         """)
 
+    if selected_tool in ("SEO Tags", "Barrierefreie Bildbeschreibung"):
+        st.divider()
+        with st.expander("⚙️ Bildvorverarbeitung"):
+            st.caption("Bilder werden vor dem Upload zu Gemini verkleinert und kompakt kodiert.")
+            image_settings = {
+                "max_edge": st.number_input("Maximale Kantenlänge (px)", min_value=256, max_value=8192, value=DEFAULT_MAX_EDGE, step=256, key="image_max_edge"),
+                "output_format": st.selectbox("Format", options=list(SUPPORTED_OUTPUT_FORMATS), key="image_output_format"),
+                "quality": st.slider("Qualität", min_value=40, max_value=100, value=DEFAULT_QUALITY, key="image_quality"),
+            }
+        with st.expander("♻️ Duplikaterkennung"):
+            st.caption("Nahezu identische Bilder (z.B. TIFF-Master und JPEG-Export) werden nur einmal an Gemini gesendet; dafür müssen neben dem Hash auch die Bildpunkte übereinstimmen, fast leere Abbildungen werden nie zusammengefasst. Aus früheren Batches werden Ergebnisse nur für identische Bilder übernommen.")
+            dedup_enabled = st.checkbox("Duplikate zusammenfassen", value=True, key="dedup_enabled")
+            dedup_distance = st.slider(
+                "Maximaler Hamming-Abstand", min_value=0, max_value=16, value=DEFAULT_MAX_DISTANCE, key="dedup_max_distance",
+                help="0 = nur praktisch identische Bilder, höhere Werte fassen auch stärker veränderte Varianten zusammen."
+            )
+            dedup_max_distance = dedup_distance if dedup_enabled else None
+
+    st.divider()
+    with st.expander("⏱️ Zeitlimit"):
+        st.caption("Frist für neu gestartete Jobs: Danach werden wartende und laufende Anfragen abgebrochen, fertige Ergebnisse bleiben erhalten.")
+        st.number_input(
+            "Frist pro Job (Minuten, 0 = keine)", min_value=0, max_value=24 * 60,
+            value=int(DEFAULT_JOB_TIMEOUT_MINUTES), step=5, key="job_timeout_minutes",
+        )
+    with st.expander("📈 Metriken"):
+        st.caption("Dauer, übertragene Bytes, Zeichen, Wiederholungen und Cache-Treffer aller API-Aufrufe und Konvertierungen seit dem Serverstart.")
+        metrics_rows = metrics_registry.snapshot()
+        if metrics_rows:
+            st.dataframe(metrics_rows, hide_index=True)
+            route_rows = routing_summary(metrics_rows)
+            if route_rows:
+                st.caption("Modellwahl: einfache Bilder gehen an das schnelle Modell, komplexe und unbrauchbare Antworten an das Pro-Modell.")
+                st.dataframe(route_rows, hide_index=True)
+            st.download_button(
+                "Prometheus-Format herunterladen", data=metrics_registry.render_prometheus(),
+                file_name="seo_helper_metrics.prom", mime="text/plain", key="metrics_download", on_click="ignore",
+            )
+        else:
+            st.caption("Noch keine Messwerte.")
+
+    session_job_ids = st.session_state.get("job_ids", [])
+    if session_job_ids:
+        st.divider()
+        with st.expander("🗂️ Jobs dieser Sitzung"):
+            for job_id in reversed(session_job_ids):
+                session_job = get_job_registry().get(job_id)
+                if session_job is not None:
+                    total_text = session_job.total if session_job.total is not None else "?"
+                    st.caption(f"{session_job.status_label} · {session_job.title} ({session_job.completed}/{total_text})")
+
 st.divider()
 
+# --- Hilfsfunktionen für die Darstellung ---
+
+def render_upload_savings(prepared: PreparedImage):
+    """Zeigt an, wie viele Bytes die Vorverarbeitung beim Upload gespart hat."""
+    width, height = prepared.prepared_size
+    st.caption(
+        f"Upload: {format_byte_size(prepared.original_bytes)} → {format_byte_size(prepared.prepared_bytes)} "
+        f"({width}×{height} px, {format_byte_size(max(prepared.bytes_saved, 0))} gespart)"
+    )
+
+def render_reuse_note(result: dict):
+    """Weist darauf hin, wenn ein Ergebnis von einem (nahezu) identischen Bild übernommen wurde."""
+    if result.get("duplicate_of"):
+        st.caption(f"♻️ Duplikat von `{result['duplicate_of']}` – Ergebnis übernommen")
+    elif result.get("reused_from"):
+        st.caption(f"♻️ Ähnlich zu `{result['reused_from']}` aus einem früheren Batch – Ergebnis übernommen")
+
+def render_seo_result(base_id: str, result: dict):
+    """Zeigt die SEO-Tags eines Bildes inklusive Kopier-Buttons an."""
+    file_name, title, alt = result["file_name"], result["title"], result["alt"]
+    with st.expander(f"✅ SEO Tags für: {file_name}", expanded=True):
+        col1, col2 = st.columns([1, 3], gap="medium")
+        with col1:
+            st.image(result["preview"], width=150, caption="Vorschau")
+            render_upload_savings(result["prepared"])
+            render_reuse_note(result)
+        with col2:
+            st.text("ALT Tag:")
+            st.text_area("ALT", value=alt, height=75, key=f"alt_text_{base_id}", disabled=True, label_visibility="collapsed")
+            copy_button("ALT kopieren", alt)
+
+            st.write("")
+
+            st.text("TITLE Tag:")
+            st.text_area("TITLE", value=title, height=75, key=f"title_text_{base_id}", disabled=True, label_visibility="collapsed")
+            copy_button("TITLE kopieren", title)
+
+def render_accessibility_result(base_id: str, result: dict):
+    """Zeigt Kurz- und Langbeschreibung eines Bildes inklusive Kopier-Buttons an."""
+    file_name, short_desc, long_desc = result["file_name"], result["short_desc"], result["long_desc"]
+    st.markdown(f"--- \n#### ✅ Ergebnisse für: `{file_name}`")
+    col1, col2 = st.columns([1, 3], gap="medium")
+    with col1:
+        st.image(result["preview"], width=150, caption="Vorschau")
+        render_upload_savings(result["prepared"])
+        render_reuse_note(result)
+    with col2:
+        st.text("Kurzbeschreibung (max. 140 Zeichen):")
+        st.text_area("Kurz", value=short_desc, height=100, key=f"short_text_{base_id}", disabled=True, label_visibility="collapsed")
+        copy_button("Kurzbeschreibung kopieren", short_desc)
+
+        with st.expander("Zeige/verberge Langbeschreibung"):
+            st.text_area("Lang", value=long_desc, height=200, key=f"long_text_{base_id}", disabled=True, label_visibility="collapsed")
+            copy_button("Langbeschreibung kopieren", long_desc)
+
+        if result.get("alt") and result.get("title"):
+            with st.expander("Zeige/verberge SEO Tags"):
+                st.text("ALT Tag:")
+                st.text_area("ALT", value=result["alt"], height=75, key=f"alt_text_{base_id}", disabled=True, label_visibility="collapsed")
+                copy_button("ALT kopieren", result["alt"])
+                st.text("TITLE Tag:")
+                st.text_area("TITLE", value=result["title"], height=75, key=f"title_text_{base_id}", disabled=True, label_visibility="collapsed")
+                copy_button("TITLE kopieren", result["title"])
+
+def render_duplicate_groups(items: list, representatives: list):
+    """Listet die Gruppen (nahezu) identischer Bilder, die zu einem Aufruf zusammengefasst wurden."""
+    groups = {}
+    for index, rep_index in enumerate(representatives):
+        if rep_index is not None and rep_index != index:
+            groups.setdefault(rep_index, []).append(items[index]["file_name"])
+    if not groups:
+        return
+    collapsed = sum(len(names) for names in groups.values())
+    with st.expander(f"♻️ {collapsed} Duplikate erkannt – {len(groups)} Gruppen werden nur einmal verarbeitet"):
+        for rep_index, names in groups.items():
+            st.markdown(f"- `{items[rep_index]['file_name']}` ← " + ", ".join(f"`{name}`" for name in names))
+
+def make_base_id(prefix: str, index: int, file_name: str) -> str:
+    """Erzeugt eine stabile, HTML-taugliche ID für die Widgets eines Bildes."""
+    safe_file_name_part = "".join(c if c.isalnum() else "_" for c in file_name)
+    return f"{prefix}_{index}_{safe_file_name_part}"
+
+def start_job(slot: str, kind: str, title: str, target, data: dict) -> Job:
+    """Startet einen Hintergrund-Job und merkt sich seine ID in der URL und in der Sitzung."""
+    timeout_minutes = st.session_state.get("job_timeout_minutes", DEFAULT_JOB_TIMEOUT_MINUTES)
+    job = get_job_registry().submit(kind, title, target, data, timeout_seconds=timeout_minutes * 60 or None)
+    st.session_state.setdefault("job_ids", []).append(job.id)
+    # Über die URL lässt sich ein Job auch nach einem Neuladen der Seite wieder öffnen
+    st.query_params[f"{slot}_job"] = job.id
+    return job
+
+def show_job(slot: str, render_job):
+    """
+    Zeigt den aktuellen Job eines Werkzeugs an. Solange er läuft, aktualisiert sich nur dieser
+    Bereich regelmäßig; ist er fertig, wird einmal die ganze Seite neu aufgebaut.
+    """
+    param = f"{slot}_job"
+    job_id = st.query_params.get(param)
+    if not job_id:
+        return
+    job = get_job_registry().get(job_id)
+    if job is None:
+        st.info("Dieser Job ist nicht mehr verfügbar (abgelaufen oder der Server wurde neu gestartet).")
+        del st.query_params[param]
+        return
+
+    was_running = not job.is_finished
+
+    @st.fragment(run_every=JOB_POLL_SECONDS if was_running else None)
+    def _job_panel():
+        if was_running and job.is_finished:
+            st.rerun()
+        render_job(job)
+
+    st.subheader("Verarbeitungsergebnisse")
+    install_copy_support()
+    _job_panel()
+    trace_path = job.data.get("trace_path")
+    if job.is_finished and trace_path is not None and trace_path.exists():
+        st.download_button(
+            "🧾 Trace des Jobs (JSONL)", data=trace_path.read_bytes(), file_name=f"trace_{job.id}.jsonl",
+            mime="application/x-ndjson", key=f"trace_{slot}_job", on_click="ignore",
+        )
+    if job.is_finished and st.button("🗑️ Ergebnisse ausblenden", key=f"close_{slot}_job"):
+        del st.query_params[param]
+        st.rerun()
+
+def render_job_progress(job: Job, unit: str):
+    """Fortschrittsbalken mit Abbrechen-Knopf bzw. Fehler- oder Abbruchmeldung eines Jobs."""
+    if job.status == "failed":
+        st.error(f"Ein unerwarteter Fehler ist aufgetreten: {job.error}")
+    elif job.status == "cancelled":
+        st.warning(f"Job abgebrochen ({job.error}). Bereits fertige Ergebnisse bleiben erhalten und werden bei einem neuen Start aus dem Cache übernommen.")
+    elif not job.is_finished:
+        if job.total:
+            st.progress(job.completed / job.total, text=f"{job.completed}/{job.total} {unit} verarbeitet")
+        else:
+            st.progress(0.0, text=f"{job.completed} {unit} fertig, wird noch gelesen...")
+        if job.cancel_scope.cancelled:
+            st.caption("Wird abgebrochen...")
+        else:
+            st.button("⏹️ Abbrechen", key=f"cancel_{job.id}", on_click=job.cancel)
+
+def session_memory_budget() -> MemoryBudget:
+    """Speicherbudget dieser Sitzung: ihre Jobs dekodieren zusammen nie mehr als SESSION_MEMORY_BUDGET_BYTES gleichzeitig."""
+    session_id = st.session_state.setdefault("memory_budget_id", uuid.uuid4().hex)
+    return get_session_memory_budget(session_id)
+
+def start_image_job(slot: str, uploaded_files: list, task: str, ebook_context: str, max_workers: int, packed: bool = False):
+    """Startet die Verarbeitung eines Bild-Batches als Hintergrund-Job."""
+    # Die Uploads werden auf die Platte ausgelagert; der Job dekodiert direkt aus den Dateien
+    files = [SpooledUpload.spool(uploaded_file) for uploaded_file in uploaded_files]
+    memory_budget = session_memory_budget()
+
+    def _target(job: Job):
+        run_image_job(job, files, task, ebook_context, image_settings, dedup_max_distance, max_workers, packed, memory_budget)
+
+    start_job(slot, "images", f"{len(files)} Bilder ({task})", _target, {"task": task})
+
+def render_export_panel(job: Job, file_stem: str):
+    """
+    Download der bisherigen Ergebnisse im gewählten Format – auch während der Job noch läuft.
+    Die Datei wird erst beim Klick auf den Button aus dem Zwischenspeicher erzeugt.
+    """
+    exporter = job.data.get("exporter")
+    if exporter is None or len(exporter) == 0:
+        return
+    col1, col2 = st.columns([1, 2], vertical_alignment="bottom")
+    fmt = col1.selectbox(
+        "Exportformat", available_formats(), format_func=lambda f: EXPORT_FORMATS[f][0], key=f"export_format_{job.id}"
+    )
+    _, extension, mime = EXPORT_FORMATS[fmt]
+    label = f"💾 {len(exporter)} Ergebnisse herunterladen" + ("" if job.is_finished else " (Zwischenstand)")
+    col2.download_button(
+        label=label, data=partial(exporter.to_bytes, fmt), file_name=f"{file_stem}.{extension}", mime=mime,
+        key=f"export_download_{job.id}", on_click="ignore",
+    )
+
+def render_image_job_header(job: Job):
+    """Fortschritt und Duplikatgruppen eines Bild-Jobs."""
+    render_job_progress(job, "Bilder")
+    if "items" in job.data:
+        render_duplicate_groups(job.data["items"], job.data["representatives"])
+
+
 # --- Logik für jedes Werkzeug (basierend auf der Navigations-Auswahl) ---
 
 if selected_tool == "SEO Tags":
+    # Die SDKs werden erst geladen, wenn ein Tab sie braucht – im Hintergrund, während hochgeladen wird
+    preload_modules(*GEMINI_MODULES, *EXPORT_MODULES)
     st.header("SEO Tags (Alt & Title) generieren")
     st.caption("Dieses Werkzeug erstellt prägnante `alt`- und `title`-Tags für Bilder zur Suchmaschinenoptimierung und grundlegenden Barrierefreiheit.")
     
     seo_uploaded_files = st.file_uploader(
         "Bilder für SEO Tags hochladen...", accept_multiple_files=True,
-        type=['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tif', 'tiff'], key="seo_uploader"
+        type=list(SUPPORTED_IMAGE_EXTENSIONS), key="seo_uploader"
+    )
+
+    seo_max_workers = st.slider(
+        "Parallele Anfragen", min_value=1, max_value=MAX_PARALLEL_REQUESTS, value=DEFAULT_MAX_WORKERS,
+        key="seo_max_workers", help="Wie viele Bilder gleichzeitig an Gemini gesendet werden."
+    )
+    seo_packed = st.checkbox(
+        "Kleine Bilder bündeln", value=False, key="seo_packed",
+        help=f"Schickt bis zu {PACKED_MAX_IMAGES} kleine Bilder (Icons, Diagramme) in einer Anfrage "
+             f"(höchstens {format_byte_size(PACKED_MAX_PAYLOAD_BYTES)} pro Anfrage). Spart Anfragen; "
+             "nicht zuordenbare Antworten werden einzeln nachgefragt."
     )
 
     if seo_uploaded_files:
         if st.button("🚀 SEO Tags verarbeiten", type="primary", key="process_seo_button"):
-            st.subheader("Verarbeitungsergebnisse")
-            for i, uploaded_file in enumerate(seo_uploaded_files):
-                file_name = uploaded_file.name
-                safe_file_name_part = "".join(c if c.isalnum() else "_" for c in file_name)
-                base_id = f"seo_{i}_{safe_file_name_part}"
-                try:
-                    original_image_bytes = uploaded_file.getvalue()
-                    image_bytes_for_api = original_image_bytes
-                    
-                    if Path(file_name).suffix.lower() in ['.tif', '.tiff']:
-                        with st.spinner(f"Konvertiere {file_name} (TIFF) zu PNG..."):
-                            try:
-                                image_bytes_for_api = convert_tiff_to_png_bytes(original_image_bytes)
-                            except Exception as conv_e:
-                                st.error(f"🚨 Fehler beim Konvertieren von '{file_name}': {conv_e}")
-                                continue
-                    
-                    with st.spinner(f"Generiere SEO Tags für {file_name}..."):
-                        title, alt = generate_seo_tags_cached(image_bytes_for_api, file_name)
-                    
-                    if title and alt:
-                        with st.expander(f"✅ SEO Tags für: {file_name}", expanded=True):
-                            alt_button_id, title_button_id = f"alt_btn_{base_id}", f"title_btn_{base_id}"
-                            col1, col2 = st.columns([1, 3], gap="medium")
-                            with col1:
-                                st.image(original_image_bytes, width=150, caption="Vorschau")
-                            with col2:
-                                st.text("ALT Tag:")
-                                st.text_area("ALT", value=alt, height=75, key=f"alt_text_{base_id}", disabled=True, label_visibility="collapsed")
-                                alt_json = json.dumps(alt)
-                                components.html(f"""<button id="{alt_button_id}">ALT kopieren</button><script>document.getElementById("{alt_button_id}").addEventListener('click', function(){{navigator.clipboard.writeText({alt_json}).then(function(){{let b=document.getElementById("{alt_button_id}");let o=b.innerText;b.innerText='Kopiert!';setTimeout(function(){{b.innerText=o}},1500)}})}});</script><style>#{alt_button_id}{{background-color:#007bff;color:white;border:none;padding:5px 10px;border-radius:5px;cursor:pointer;margin-top:5px}}#{alt_button_id}:hover{{background-color:#0056b3}}</style>""", height=45)
-                                
-                                st.write("")
-                                
-                                st.text("TITLE Tag:")
-                                st.text_area("TITLE", value=title, height=75, key=f"title_text_{base_id}", disabled=True, label_visibility="collapsed")
-                                title_json = json.dumps(title)
-                                components.html(f"""<button id="{title_button_id}">TITLE kopieren</button><script>document.getElementById("{title_button_id}").addEventListener('click', function(){{navigator.clipboard.writeText({title_json}).then(function(){{let b=document.getElementById("{title_button_id}");let o=b.innerText;b.innerText='Kopiert!';setTimeout(function(){{b.innerText=o}},1500)}})}});</script><style>#{title_button_id}{{background-color:#007bff;color:white;border:none;padding:5px 10px;border-radius:5px;cursor:pointer;margin-top:5px}}#{title_button_id}:hover{{background-color:#0056b3}}</style>""", height=45)
-                    else:
-                        st.error(f"❌ Fehler bei SEO Tag-Generierung für '{file_name}'.")
-                except Exception as e:
-                    st.error(f"🚨 Unerwarteter FEHLER bei '{file_name}': {e}")
+            start_image_job("seo", seo_uploaded_files, "seo", "", seo_max_workers, seo_packed)
+
+    def render_seo_job(job: Job):
+        render_image_job_header(job)
+        render_export_panel(job, "seo_tags")
+        # Nur die aktuelle Seite wird gerendert, damit auch große Batches den Browser nicht ausbremsen
+        for i, result in paginate(job.results(), f"seo_{job.id}"):
+            file_name = result["file_name"]
+            if "error" in result:
+                st.error(result["error"])
+            elif is_successful(result, "seo"):
+                render_seo_result(make_base_id("seo", i, file_name), result)
+            else:
+                st.error(f"❌ Fehler bei SEO Tag-Generierung für '{file_name}'.")
+        if job.status == "done":
             st.success("SEO-Verarbeitung abgeschlossen.")
 
+    show_job("seo", render_seo_job)
+
 elif selected_tool == "Barrierefreie Bildbeschreibung":
+    preload_modules(*GEMINI_MODULES, *EXPORT_MODULES)
     st.header("Barrierefreie Bildbeschreibung (Kurz & Lang)")
     st.caption("Dieses Werkzeug erstellt eine prägnante Kurzbeschreibung (Alt-Text) und eine detaillierte Langbeschreibung für E-Books und barrierefreie Inhalte.")
 
@@ -174,87 +417,58 @@ elif selected_tool == "Barrierefreie Bildbeschreibung":
 
     accessibility_uploaded_files = st.file_uploader(
         "Bilder für barrierefreie Beschreibungen hochladen...", accept_multiple_files=True,
-        type=['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'tif', 'tiff'], key="accessibility_uploader"
+        type=list(SUPPORTED_IMAGE_EXTENSIONS), key="accessibility_uploader"
+    )
+
+    combined_mode = st.checkbox(
+        "SEO Tags (Alt & Title) im selben Aufruf erzeugen", key="accessibility_combined_mode",
+        help="Erzeugt Kurz-, Langbeschreibung und SEO Tags mit nur einem Gemini-Aufruf pro Bild (strukturierte JSON-Antwort)."
+    )
+
+    accessibility_max_workers = st.slider(
+        "Parallele Anfragen", min_value=1, max_value=MAX_PARALLEL_REQUESTS, value=DEFAULT_MAX_WORKERS,
+        key="accessibility_max_workers", help="Wie viele Bilder gleichzeitig an Gemini gesendet werden."
     )
 
     if accessibility_uploaded_files:
         if st.button("🚀 Beschreibungen verarbeiten", type="primary", key="process_accessibility_button"):
-            st.subheader("Verarbeitungsergebnisse")
-            processed_count, failed_count = 0, 0
-            results_for_export = []
-            
-            for i, uploaded_file in enumerate(accessibility_uploaded_files):
-                file_name = uploaded_file.name
-                safe_file_name_part = "".join(c if c.isalnum() else "_" for c in file_name)
-                base_id = f"access_{i}_{safe_file_name_part}"
-                try:
-                    original_image_bytes = uploaded_file.getvalue()
-                    image_bytes_for_api = original_image_bytes
-                    if Path(file_name).suffix.lower() in ['.tif', '.tiff']:
-                        with st.spinner(f"Konvertiere {file_name} (TIFF) zu PNG..."):
-                            try:
-                                image_bytes_for_api = convert_tiff_to_png_bytes(original_image_bytes)
-                            except Exception as conv_e:
-                                st.error(f"🚨 Fehler beim Konvertieren von '{file_name}': {conv_e}")
-                                failed_count += 1
-                                continue
-                    
-                    with st.spinner(f"Generiere barrierefreie Beschreibung für {file_name}..."):
-                        short_desc, long_desc = generate_accessibility_description_cached(image_bytes_for_api, file_name, ebook_context_input)
-                    
-                    if short_desc and long_desc:
-                        st.markdown(f"--- \n#### ✅ Ergebnisse für: `{file_name}`")
-                        col1, col2 = st.columns([1, 3], gap="medium")
-                        with col1:
-                            st.image(original_image_bytes, width=150, caption="Vorschau")
-                        with col2:
-                            st.text("Kurzbeschreibung (max. 140 Zeichen):")
-                            st.text_area("Kurz", value=short_desc, height=100, key=f"short_text_{base_id}", disabled=True, label_visibility="collapsed")
-                            short_desc_button_id = f"short_copy_{base_id}"
-                            short_json = json.dumps(short_desc)
-                            components.html(f"""<button id="{short_desc_button_id}">Kurzbeschreibung kopieren</button><script>document.getElementById("{short_desc_button_id}").addEventListener('click', function(){{navigator.clipboard.writeText({short_json}).then(function(){{let b=document.getElementById("{short_desc_button_id}");let o=b.innerText;b.innerText='Kopiert!';setTimeout(function(){{b.innerText=o}},1500)}})}});</script><style>#{short_desc_button_id}{{background-color:#007bff;color:white;border:none;padding:5px 10px;border-radius:5px;cursor:pointer;margin-top:5px}}#{short_desc_button_id}:hover{{background-color:#0056b3}}</style>""", height=45)
-                            
-                            with st.expander("Zeige/verberge Langbeschreibung"):
-                                st.text_area("Lang", value=long_desc, height=200, key=f"long_text_{base_id}", disabled=True, label_visibility="collapsed")
-                                long_desc_button_id = f"long_copy_{base_id}"
-                                long_json = json.dumps(long_desc)
-                                components.html(f"""<button id="{long_desc_button_id}">Langbeschreibung kopieren</button><script>document.getElementById("{long_desc_button_id}").addEventListener('click', function(){{navigator.clipboard.writeText({long_json}).then(function(){{let b=document.getElementById("{long_desc_button_id}");let o=b.innerText;b.innerText='Kopiert!';setTimeout(function(){{b.innerText=o}},1500)}})}});</script><style>#{long_desc_button_id}{{background-color:#007bff;color:white;border:none;padding:5px 10px;border-radius:5px;cursor:pointer;margin-top:5px}}#{long_desc_button_id}:hover{{background-color:#0056b3}}</style>""", height=45)
-                        
-                        processed_count += 1
-                        results_for_export.append({
-                            "Bildname": file_name, "Dateiname Produktion": "", "Alternativtext": short_desc,
-                            "Bildlegende": "", "Anmerkung": "", "Langbeschreibung": long_desc,
-                            "(Platzierung/Größe/Übersetzungstexte in der Abbildung/...)": ""
-                        })
-                    else:
-                        st.error(f"❌ Fehler bei Erstellung der barrierefreien Beschreibung für '{file_name}'.")
-                        failed_count += 1
-                except Exception as e:
-                    st.error(f"🚨 Unerwarteter FEHLER bei der Hauptverarbeitung von '{file_name}': {e}")
-                    failed_count += 1
-            
-            if results_for_export:
-                st.divider()
-                st.subheader("📊 Ergebnisse exportieren")
-                df = pd.DataFrame(results_for_export)
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, sheet_name='Bildbeschreibungen')
-                excel_data = output.getvalue()
-                st.download_button(
-                    label="💾 Excel-Datei herunterladen", data=excel_data,
-                    file_name="barrierefreie_bildbeschreibungen.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            
-            st.divider()
-            st.subheader("🏁 Zusammenfassung")
-            col1, col2 = st.columns(2)
-            col1.metric("Erfolgreich verarbeitet", processed_count)
-            col2.metric("Fehlgeschlagen", failed_count, delta=None if failed_count == 0 else -failed_count, delta_color="inverse")
+            task = "combined" if combined_mode else "accessibility"
+            start_image_job("accessibility", accessibility_uploaded_files, task, ebook_context_input, accessibility_max_workers)
+
+    def render_accessibility_job(job: Job):
+        render_image_job_header(job)
+        task = job.data["task"]
+        results = job.results()
+
+        # Nur die aktuelle Seite wird gerendert, damit auch große Batches den Browser nicht ausbremsen
+        for i, result in paginate(results, f"access_{job.id}"):
+            file_name = result["file_name"]
+            if "error" in result:
+                st.error(result["error"])
+            elif is_successful(result, task):
+                render_accessibility_result(make_base_id("access", i, file_name), result)
+            else:
+                st.error(f"❌ Fehler bei Erstellung der barrierefreien Beschreibung für '{file_name}'.")
+
+        render_export_panel(job, "barrierefreie_bildbeschreibungen")
+        if not job.is_finished:
+            return
+
+        processed_count = sum(is_successful(result, task) for _, result in results)
+        failed_count = len(results) - processed_count
+
+        st.divider()
+        st.subheader("🏁 Zusammenfassung")
+        col1, col2 = st.columns(2)
+        col1.metric("Erfolgreich verarbeitet", processed_count)
+        col2.metric("Fehlgeschlagen", failed_count, delta=None if failed_count == 0 else -failed_count, delta_color="inverse")
+        if job.status == "done":
             st.success("Verarbeitung abgeschlossen.")
 
+    show_job("accessibility", render_accessibility_job)
+
 elif selected_tool == "Text-to-Speech":
+    preload_modules(*TTS_MODULES)
     st.header("Text-to-Speech mit ElevenLabs")
     st.caption("Lade ein Word-Dokument (.docx) oder eine PDF-Datei (.pdf) hoch, um den Text in eine Audiodatei umzuwandeln.")
     
@@ -286,57 +500,87 @@ elif selected_tool == "Text-to-Speech":
             key="tts_uploader"
         )
 
+        col1, col2 = st.columns(2)
+        tts_max_workers = col1.slider(
+            "Parallele Anfragen an ElevenLabs", min_value=1, max_value=ELEVENLABS_MAX_CONCURRENCY, value=min(2, ELEVENLABS_MAX_CONCURRENCY),
+            key="tts_max_workers", help="Darf das Limit gleichzeitiger Anfragen deines ElevenLabs-Abos nicht überschreiten."
+        )
+        tts_max_retries = col2.number_input(
+            "Wiederholungen für fehlgeschlagene Teile", min_value=0, max_value=5, value=2,
+            key="tts_max_retries", help="Nur fehlgeschlagene Teile werden erneut angefragt."
+        )
+        tts_split_chapters = st.checkbox(
+            "Zusätzlich je Kapitel eine MP3-Datei", key="tts_split_chapters",
+            help="Kapitel werden an Überschriften wie 'Kapitel 3' oder 'Prolog' erkannt und beginnen mit dem Teil, der die Überschrift enthält."
+        )
+
         if docx_file and selected_voice_name:
             selected_voice_id = available_voices[selected_voice_name]["voice_id"]
             
             if st.button("🎙️ Audio generieren", type="primary", key="process_tts_button"):
-                try:
-                    text_content = ""
-                    with st.spinner("Lese Text aus Datei..."):
-                        if docx_file.type == "application/pdf":
-                            text_content = read_text_from_pdf(docx_file)
-                        else:
-                            text_content = read_text_from_docx(docx_file)
-                    
-                    if not text_content or not text_content.strip():
-                        st.warning("Das Dokument scheint keinen lesbaren Text zu enthalten.")
-                    elif text_content == "NO_TEXT_IN_PDF":
-                        st.warning("Die PDF-Datei enthält keinen extrahierbaren Text. Möglicherweise ist es ein reines Bild-Dokument (Scan).")
-                    else:
-                        st.info(f"Text mit {len(text_content)} Zeichen gelesen. Teile ihn in kleinere Stücke auf...")
-                        
-                        text_chunks = chunk_text(text_content)
-                        st.info(f"Text wurde in {len(text_chunks)} Teile aufgeteilt. Generiere jetzt Audio für jeden Teil...")
-
-                        all_audio_bytes = []
-                        progress_bar = st.progress(0, text="Audio-Generierung startet...")
-
-                        for i, chunk in enumerate(text_chunks):
-                            progress_text = f"Generiere Audio für Teil {i+1}/{len(text_chunks)}..."
-                            progress_bar.progress((i) / len(text_chunks), text=progress_text)
-                            
-                            audio_segment = generate_audio_from_text(chunk, elevenlabs_api_key, selected_voice_id)
-                            if audio_segment:
-                                all_audio_bytes.append(audio_segment)
-                            else:
-                                st.error(f"Fehler bei der Audio-Generierung für Teil {i+1}. Breche ab.")
-                                break
-
-                        progress_bar.progress(1.0, text="Verarbeitung abgeschlossen!")
-
-                        if len(all_audio_bytes) == len(text_chunks):
-                            final_audio = b"".join(all_audio_bytes)
-                            
-                            st.success("Audio erfolgreich generiert!")
-                            st.audio(final_audio, format="audio/mpeg")
-                            st.download_button(
-                                label="MP3-Datei herunterladen",
-                                data=final_audio,
-                                file_name=f"{Path(docx_file.name).stem}.mp3",
-                                mime="audio/mpeg"
-                            )
-                        else:
-                            st.error("Nicht alle Audio-Teile konnten erfolgreich generiert werden.")
-
-                except Exception as e:
-                    st.error(f"Ein unerwarteter Fehler ist aufgetreten: {e}")
\ No newline at end of file
+                manuscript = SpooledUpload.spool(docx_file)
+                is_pdf = docx_file.type == "application/pdf"
+                tts_settings = (elevenlabs_api_key, selected_voice_id, tts_max_workers, tts_max_retries, tts_split_chapters)
+
+                def _tts_target(job: Job):
+                    run_tts_job(job, manuscript, is_pdf, *tts_settings)
+
+                start_job("tts", "tts", f"Audio für {manuscript.name}", _tts_target, {"file_name": manuscript.name, "is_pdf": is_pdf})
+
+        def render_tts_job(job: Job):
+            render_job_progress(job, "Teile")
+            if job.status != "done":
+                return
+            synthesis = job.data["synthesis"]
+            failed_chunks = synthesis.failed_chunks
+
+            if not synthesis.chunk_count:
+                if job.data["is_pdf"]:
+                    st.warning("Die PDF-Datei enthält keinen extrahierbaren Text. Möglicherweise ist es ein reines Bild-Dokument (Scan).")
+                else:
+                    st.warning("Das Dokument scheint keinen lesbaren Text zu enthalten.")
+                return
+
+            st.info(f"Text mit {job.data['chars']} Zeichen gelesen und in {synthesis.chunk_count} Teile aufgeteilt.")
+            pdf_cleanup = job.data.get("pdf_cleanup")
+            if pdf_cleanup is not None:
+                st.caption(f"Textbereinigung: {pdf_cleanup.summary()}")
+            col1, col2 = st.columns(2)
+            col1.metric("Wiederverwendete Teile", synthesis.reused_chunks, help=f"{synthesis.reused_chars} Zeichen aus dem Audio-Cache")
+            col2.metric("Neu synthetisierte Teile", synthesis.synthesized_chunks, help=f"{synthesis.synthesized_chars} Zeichen an ElevenLabs gesendet")
+            st.caption(f"Wiederverwendet: {synthesis.reused_chars} Zeichen · Neu synthetisiert: {synthesis.synthesized_chars} Zeichen")
+
+            if failed_chunks:
+                failed_parts = ", ".join(str(i + 1) for i in failed_chunks)
+                st.error(f"Nicht alle Audio-Teile konnten erfolgreich generiert werden. Fehlgeschlagen: Teil {failed_parts}.")
+                return
+            audio_path = job.data["audio_path"]
+            if audio_path is None or not audio_path.exists():
+                st.info("Die Audiodatei ist nicht mehr verfügbar.")
+                return
+
+            # Wiedergabe und Download lädt der Browser direkt aus der Datei (siehe ui.static_audio)
+            file_stem = Path(job.data["file_name"]).stem
+            audio_size = audio_path.stat().st_size
+            st.success(f"Audio erfolgreich generiert! ({format_byte_size(audio_size)})")
+            chapter_paths = job.data["chapter_paths"]
+            if chapter_paths:
+                part_label = "Kapitel" if job.data["chapters_only"] else "Teil"
+                part_number = st.selectbox(
+                    part_label, range(1, len(chapter_paths) + 1), format_func=lambda number: f"{part_label} {number}",
+                    key=f"tts_chapter_{job.id}",
+                )
+                static_audio(
+                    chapter_paths[part_number - 1], f"{file_stem}_{part_number:02d}.mp3", f"{part_label} {part_number} herunterladen",
+                )
+            if audio_size <= STATIC_MAX_BYTES:
+                if chapter_paths:
+                    st.caption("Gesamtes Hörbuch:")
+                static_audio(audio_path, f"{file_stem}.mp3", "MP3-Datei herunterladen")
+            else:
+                st.info(
+                    f"Das gesamte Hörbuch ist größer als {format_byte_size(STATIC_MAX_BYTES)} und steht daher nur in Teilen "
+                    "zur Verfügung. Als eine Datei lässt es sich mit `python cli.py tts` erzeugen."
+                )
+
+        show_job("tts", render_tts_job)
@@ -0,0 +1,68 @@
+# singleflight.py
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Union
+
+from cancellation import Cancelled, wait_for_event
+from metrics import set_span_label
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Union[BaseException, None] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Fasst gleichzeitige, identische Anfragen zusammen: Läuft für einen Schlüssel bereits ein Aufruf,
+    warten weitere Aufrufer (auch aus anderen Sitzungen bzw. Jobs) auf dessen Ergebnis, statt die API
+    ein zweites Mal zu bezahlen. Schlüssel sind die Cache-Schlüssel der Anfragen; nach dem Aufruf liegt
+    das Ergebnis ohnehin im Cache, der SingleFlight deckt nur die Zeit davor ab.
+    Wird der führende Aufruf abgebrochen (Cancelled), übernimmt einer der Wartenden die Anfrage.
+    """
+
+    def __init__(self, name: str = "api"):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Führt fn(*args, **kwargs) aus bzw. teilt das Ergebnis (oder den Fehler) eines laufenden Aufrufs mit demselben key."""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.followers += 1
+            if leader:
+                try:
+                    call.result = fn(*args, **kwargs)
+                    return call.result
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+
+            set_span_label("coalesced", "yes")
+            logger.info(f"Identische Anfrage an {self.name} läuft bereits, warte auf deren Ergebnis.")
+            wait_for_event(call.done)
+            if isinstance(call.error, Cancelled):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
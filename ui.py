@@ -0,0 +1,106 @@
+# ui.py
+
+import html
+import json
+import math
+from pathlib import Path
+from typing import List, Sequence, Union
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from audio import static_url
+
+PAGE_SIZE_OPTIONS = (10, 25, 50, 100)
+DEFAULT_PAGE_SIZE = 25
+
+# Wird einmal in das Hauptdokument eingefügt; ein delegierter Klick-Handler bedient alle Kopier-Buttons.
+# Das Skript läuft im Hauptdokument selbst, damit der Handler das Neuzeichnen des Iframes überlebt.
+_COPY_HANDLER_JS = """
+document.addEventListener('click', function (event) {
+  const button = event.target.closest('button.copy-btn');
+  if (!button) return;
+  navigator.clipboard.writeText(button.dataset.copy).then(function () {
+    const label = button.innerText;
+    button.innerText = 'Kopiert!';
+    setTimeout(function () { button.innerText = label; }, 1500);
+  });
+});
+"""
+
+_COPY_BUTTON_CSS = """
+<style>
+button.copy-btn{background-color:#007bff;color:white;border:none;padding:5px 10px;border-radius:5px;cursor:pointer;margin-top:5px}
+button.copy-btn:hover{background-color:#0056b3}
+</style>
+"""
+
+
+def install_copy_support():
+    """
+    Installiert einmal pro Seite die Kopier-Logik für alle copy_button()-Elemente.
+    Statt eines Iframes pro Button gibt es nur noch dieses eine (unsichtbare) Iframe.
+    """
+    st.markdown(_COPY_BUTTON_CSS, unsafe_allow_html=True)
+    components.html(f"""<script>
+const doc = window.parent.document;
+if (!doc.getElementById('copy-btn-handler')) {{
+  const script = doc.createElement('script');
+  script.id = 'copy-btn-handler';
+  script.textContent = {json.dumps(_COPY_HANDLER_JS)};
+  doc.head.appendChild(script);
+}}
+</script>""", height=0)
+
+
+# Zeichen, die st.markdown im Attribut sonst als Markdown deuten würde: Leerzeilen beenden den Absatz
+# (und damit das HTML-Element mitten im Attribut), $ leitet eine Formel ein
+_ATTRIBUTE_ESCAPES = str.maketrans({"\n": "&#10;", "\r": "&#13;", "$": "&#36;"})
+
+
+def copy_button(label: str, text: str):
+    """Rendert einen Button, der den Text in die Zwischenablage kopiert (setzt install_copy_support() voraus)."""
+    copy_text = html.escape(text, quote=True).translate(_ATTRIBUTE_ESCAPES)
+    st.markdown(
+        f'<button class="copy-btn" data-copy="{copy_text}">{html.escape(label)}</button>',
+        unsafe_allow_html=True,
+    )
+
+
+def static_audio(path: Union[str, Path], download_name: str, label: str):
+    """
+    Spielt eine MP3-Datei unterhalb von audio.STATIC_DIR ab und bietet sie als Download-Link an.
+    Der Browser lädt beides über Streamlits Static-Serving direkt von der Platte; st.audio(pfad) und
+    st.download_button würden die ganze Datei in den Speicher der Session lesen.
+    """
+    url = static_url(path)
+    st.audio(url, format="audio/mpeg")
+    st.markdown(
+        f'<a href="{html.escape(url, quote=True)}" download="{html.escape(download_name, quote=True)}">⬇️ {html.escape(label)}</a>',
+        unsafe_allow_html=True,
+    )
+
+
+def paginate(items: Sequence, key: str) -> List:
+    """
+    Zeigt eine Seitensteuerung an und gibt nur die Elemente der aktuellen Seite zurück.
+    So bleibt der Aufwand im Browser unabhängig von der Größe des Batches.
+    """
+    total = len(items)
+    if total == 0:
+        return []
+    col1, col2, col3 = st.columns([1, 1, 3], vertical_alignment="bottom")
+    page_size = col1.selectbox(
+        "Einträge pro Seite", PAGE_SIZE_OPTIONS, index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE), key=f"{key}_page_size"
+    )
+    page_count = max(1, math.ceil(total / page_size))
+    # Die Seite lebt nur im Session State (kein value=), sonst warnt Streamlit über den doppelt gesetzten Wert.
+    # Nach einer Vergrößerung der Seiten darf die gemerkte Seite nicht hinter der letzten liegen
+    st.session_state.setdefault(f"{key}_page", 1)
+    if st.session_state[f"{key}_page"] > page_count:
+        st.session_state[f"{key}_page"] = page_count
+    page = col2.number_input("Seite", min_value=1, max_value=page_count, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    col3.caption(f"Einträge {start + 1}–{end} von {total} · Seite {page}/{page_count}")
+    return list(items[start:end])
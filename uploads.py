@@ -0,0 +1,177 @@
+# uploads.py
+
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Iterator, Set, Union
+
+from PIL import Image
+
+from cancellation import CANCEL_POLL_SECONDS, check_cancelled
+from result_cache import DEFAULT_CACHE_DIR
+from utils import jpeg_draft_size
+
+logger = logging.getLogger(__name__)
+
+# Hochgeladene Dateien liegen für die Dauer ihres Jobs hier statt im Arbeitsspeicher
+DEFAULT_SPOOL_DIR = Path(os.environ.get("SEO_HELPER_UPLOAD_DIR", str(Path(DEFAULT_CACHE_DIR).parent / "uploads")))
+# Speicher, den alle Dekodierungen zusammen (global) bzw. die Jobs einer Sitzung gleichzeitig belegen dürfen
+GLOBAL_MEMORY_BUDGET_BYTES = int(float(os.environ.get("SEO_HELPER_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024)
+SESSION_MEMORY_BUDGET_BYTES = int(float(os.environ.get("SEO_HELPER_SESSION_MEMORY_BUDGET_MB", "384")) * 1024 * 1024)
+# Reste abgebrochener Jobs (z.B. nach einem Neustart des Servers) werden nach dieser Zeit gelöscht
+SPOOL_MAX_AGE_SECONDS = float(os.environ.get("SEO_HELPER_UPLOAD_MAX_AGE_HOURS", "24")) * 3600
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+_pruned_directories: Set[Path] = set()
+_pruned_directories_lock = threading.Lock()
+
+
+def _prune_stale_files(directory: Path):
+    """Löscht einmal pro Prozess und Verzeichnis ausgelagerte Dateien, die älter als SPOOL_MAX_AGE_SECONDS sind."""
+    with _pruned_directories_lock:
+        if directory in _pruned_directories:
+            return
+        _pruned_directories.add(directory)
+    cutoff = time.time() - SPOOL_MAX_AGE_SECONDS
+    for path in directory.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError as e:
+            logger.warning(f"Alte Upload-Datei {path} konnte nicht gelöscht werden: {e}")
+
+
+class SpooledUpload:
+    """
+    Hochgeladene Datei auf der Platte (.name, .path, .size und .getvalue() wie ein UploadedFile).
+    Die Verarbeitung liest über den Pfad, statt die Bytes im Speicher zu halten; Pillow bildet
+    unkomprimierte Rasterdaten dann per mmap ab, PyMuPDF lädt nur die benötigten Seiten.
+    """
+
+    def __init__(self, name: str, path: Union[str, Path], owned: bool = True):
+        self.name = name
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        # Nur selbst angelegte Kopien werden beim Verwerfen gelöscht, nie Originaldateien (CLI)
+        self._owned = owned
+
+    @classmethod
+    def spool(cls, uploaded_file, directory: Union[str, Path] = DEFAULT_SPOOL_DIR) -> "SpooledUpload":
+        """Kopiert ein Streamlit-UploadedFile (oder ein anderes Dateiobjekt mit .name) blockweise auf die Platte."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        _prune_stale_files(directory)
+        path = directory / f"{uuid.uuid4().hex}{Path(uploaded_file.name).suffix.lower()}"
+        uploaded_file.seek(0)
+        with open(path, "wb") as spool_file:
+            shutil.copyfileobj(uploaded_file, spool_file, _COPY_CHUNK_BYTES)
+        return cls(uploaded_file.name, path)
+
+    @classmethod
+    def from_path(cls, path: Union[str, Path]) -> "SpooledUpload":
+        """Verwendet eine vorhandene Datei direkt, ohne Kopie."""
+        path = Path(path)
+        return cls(path.name, path, owned=False)
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    def getvalue(self) -> bytes:
+        """Liest die ganze Datei (nur für kleine Dateien bzw. Stellen, die zwingend Bytes brauchen)."""
+        return self.path.read_bytes()
+
+    def discard(self):
+        if self._owned:
+            self.path.unlink(missing_ok=True)
+
+
+class MemoryBudget:
+    """
+    Begrenzt den Speicher, den gleichzeitig laufende Dekodierungen belegen dürfen.
+    reserve() wartet, bis genug Budget frei ist; mit parent wird zusätzlich dessen Budget belegt
+    (Sitzungsbudget -> globales Budget). Eine einzelne Reservierung über dem Limit wird auf das Limit
+    gekürzt, läuft also allein statt nie.
+    """
+
+    def __init__(self, limit_bytes: int, name: str = "global", parent: Union["MemoryBudget", None] = None):
+        self.limit_bytes = max(1, limit_bytes)
+        self.name = name
+        self.parent = parent
+        self._used = 0
+        self._condition = threading.Condition()
+
+    @property
+    def used_bytes(self) -> int:
+        with self._condition:
+            return self._used
+
+    @contextmanager
+    def reserve(self, nbytes: int) -> Iterator[int]:
+        nbytes = max(0, min(nbytes, self.limit_bytes))
+        with self._condition:
+            if self._used and self._used + nbytes > self.limit_bytes:
+                logger.info(f"Speicherbudget '{self.name}' ausgeschöpft, warte auf {nbytes / 2**20:.0f} MB.")
+            while self._used and self._used + nbytes > self.limit_bytes:
+                # Ein abgebrochener Job soll nicht auf Speicher für Bilder warten, die er nicht mehr braucht
+                self._condition.wait(CANCEL_POLL_SECONDS)
+                check_cancelled()
+            self._used += nbytes
+        try:
+            if self.parent is not None:
+                with self.parent.reserve(nbytes):
+                    yield nbytes
+            else:
+                yield nbytes
+        finally:
+            with self._condition:
+                self._used -= nbytes
+                self._condition.notify_all()
+
+
+def estimate_decode_bytes(source: Union[bytes, str, Path], max_edge: int) -> int:
+    """
+    Schätzt den Spitzenbedarf für das Dekodieren und Verkleinern eines Bildes anhand des Headers
+    (ohne die Pixel zu laden). JPEGs werden per draft() verkleinert dekodiert; die Schätzung nutzt dafür
+    dieselbe Regel wie utils.prepare_image_for_api() (utils.jpeg_draft_size).
+    """
+    with Image.open(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as pil_image:
+        width, height = pil_image.size
+        bands = len(pil_image.getbands())
+        image_format = pil_image.format
+    if image_format == "JPEG":
+        width, height = jpeg_draft_size((width, height), max_edge)
+    pixels = width * height
+    # Dekodiertes Bild plus eine Arbeitskopie (Farbmodus/Verkleinerung); mindestens 4 Byte pro Pixel
+    return pixels * max(bands, 4) * 2
+
+
+_global_budget = MemoryBudget(GLOBAL_MEMORY_BUDGET_BYTES)
+# Nur schwach referenziert: Solange ein Job der Sitzung läuft, hält er ihr Budget fest; danach ist es leer
+# (keine Reservierungen) und wird mit dem letzten Job freigegeben, statt für jede Sitzung ewig zu bleiben
+_session_budgets: "weakref.WeakValueDictionary[str, MemoryBudget]" = weakref.WeakValueDictionary()
+_session_budgets_lock = threading.Lock()
+
+
+def get_global_memory_budget() -> MemoryBudget:
+    return _global_budget
+
+
+def get_session_memory_budget(session_id: str) -> MemoryBudget:
+    """
+    Budget einer Sitzung (wird bei Bedarf angelegt); belegt immer auch das globale Budget.
+    Gleichzeitige Jobs einer Sitzung teilen sich dasselbe Objekt, solange einer davon es noch hält.
+    """
+    with _session_budgets_lock:
+        budget = _session_budgets.get(session_id)
+        if budget is None:
+            budget = _session_budgets[session_id] = MemoryBudget(
+                min(SESSION_MEMORY_BUDGET_BYTES, GLOBAL_MEMORY_BUDGET_BYTES), f"Sitzung {session_id[:8]}", _global_budget,
+            )
+        return budget
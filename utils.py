@@ -1,13 +1,58 @@
 # utils.py
 
-from PIL import Image
+from PIL import Image, ImageOps
 from io import BytesIO
-import docx
-import fitz
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, FrozenSet, Iterable, Iterator, NamedTuple, Tuple, Union
+from xml.etree import ElementTree
+import hashlib
+import math
+import multiprocessing
+import os
+import re
+import tempfile
+import zipfile
 
-def convert_tiff_to_png_bytes(tiff_bytes: bytes) -> bytes:
-    """Konvertiert eine TIFF-Datei (als Bytes) in PNG-Bytes."""
-    pil_image = Image.open(BytesIO(tiff_bytes))
+from metrics import instrumented, instrument_iter, add_to_span
+from result_cache import get_result_cache, make_cache_key, content_hash, file_content_hash
+
+# Standardwerte für die Bildvorverarbeitung vor dem Upload zu Gemini
+DEFAULT_MAX_EDGE = 2048
+DEFAULT_OUTPUT_FORMAT = "JPEG"
+DEFAULT_QUALITY = 85
+SUPPORTED_OUTPUT_FORMATS = ("JPEG", "WEBP")
+# Dateiendungen der Bilder, die Oberfläche und CLI annehmen (prepare_image_for_api() kann alle lesen)
+SUPPORTED_IMAGE_EXTENSIONS = ("jpg", "jpeg", "png", "gif", "bmp", "webp", "tif", "tiff")
+# Formate, die Gemini direkt annimmt und die wir unverändert senden dürfen
+_API_NATIVE_FORMATS = ("JPEG", "PNG", "WEBP")
+# Vorschaubilder: doppelte Anzeigegröße (150 px) für scharfe Darstellung auf HiDPI-Displays
+THUMBNAIL_MAX_EDGE = 300
+THUMBNAIL_QUALITY = 75
+
+# Bilder kommen als Bytes oder als Pfad (z.B. auf die Platte ausgelagerte Uploads, siehe uploads.py)
+ImageSource = Union[bytes, str, os.PathLike]
+
+def _open_image(source: ImageSource) -> Image.Image:
+    """
+    Öffnet ein Bild aus Bytes oder einer Datei. Über den Dateinamen geöffnet, kann Pillow unkomprimierte
+    Rasterdaten (z.B. TIFF-Scans) per mmap einlesen, statt sie in den Speicher zu kopieren.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return Image.open(BytesIO(source))
+    return Image.open(source)
+
+def _source_size(source: ImageSource) -> int:
+    return len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+
+def _source_bytes(source: ImageSource) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, "rb") as file_object:
+        return file_object.read()
+
+def convert_tiff_to_png_bytes(tiff_source: ImageSource) -> bytes:
+    """Konvertiert eine TIFF-Datei (als Bytes oder Pfad) in PNG-Bytes."""
+    pil_image = _open_image(tiff_source)
     if getattr(pil_image, "n_frames", 1) > 1:
         pil_image.seek(0)
     if pil_image.mode not in ('RGB', 'RGBA', 'L'):
@@ -17,25 +62,497 @@ def convert_tiff_to_png_bytes(tiff_bytes: bytes) -> bytes:
     pil_image.save(output_buffer, format="PNG")
     return output_buffer.getvalue()
 
-def read_text_from_docx(file_object: BytesIO) -> str:
-    """Liest den gesamten Text aus einem DOCX-Dokument."""
-    doc = docx.Document(file_object)
-    full_text = [para.text for para in doc.paragraphs]
-    return '\n'.join(full_text)
+class PreparedImage(NamedTuple):
+    """Ergebnis der Bildvorverarbeitung inklusive Größenangaben für die Anzeige der Ersparnis."""
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    original_size: Tuple[int, int]
+    prepared_size: Tuple[int, int]
+    thumbnail: Union[bytes, None] = None
+
+    @property
+    def prepared_bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.prepared_bytes
+
+def _normalize_mode(pil_image: Image.Image, output_format: str) -> Image.Image:
+    """Bringt das Bild in einen Farbmodus, den das Zielformat speichern kann."""
+    if pil_image.mode in ("I;16", "I;16B", "I;16L", "I"):
+        # 16-/32-Bit-Graustufen (z.B. aus Scannern) auf 8 Bit herunterskalieren
+        return pil_image.convert("I").point(lambda value: value * (1 / 256)).convert("L")
+    if pil_image.mode == "1":
+        return pil_image.convert("L")
+
+    has_alpha = pil_image.mode in ("RGBA", "LA", "PA") or (pil_image.mode == "P" and "transparency" in pil_image.info)
+    if has_alpha:
+        rgba_image = pil_image.convert("RGBA")
+        if output_format != "JPEG":
+            return rgba_image
+        # JPEG kennt keine Transparenz: auf weißen Hintergrund legen
+        background = Image.new("RGB", rgba_image.size, (255, 255, 255))
+        background.paste(rgba_image, mask=rgba_image.getchannel("A"))
+        return background
+    if pil_image.mode not in ("RGB", "L"):
+        return pil_image.convert("RGB")
+    return pil_image
+
+def thumbnail_cache_key(source: ImageSource) -> str:
+    source_hash = content_hash(source) if isinstance(source, (bytes, bytearray)) else file_content_hash(source)
+    return make_cache_key("thumbnail", source_hash, str(THUMBNAIL_MAX_EDGE), str(THUMBNAIL_QUALITY))
+
+def _thumbnail_from_image(source: ImageSource, pil_image: Image.Image) -> bytes:
+    """
+    Liefert ein WebP-Vorschaubild zum Original source aus dem Cache oder erzeugt es aus dem
+    bereits dekodierten (und meist schon verkleinerten) pil_image, damit das Original nicht erneut dekodiert wird.
+    """
+    cache = get_result_cache()
+    key = thumbnail_cache_key(source)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    thumbnail_image = pil_image.copy()
+    factor = max(thumbnail_image.size) // THUMBNAIL_MAX_EDGE
+    if factor >= 2:
+        thumbnail_image = thumbnail_image.reduce(factor)
+    thumbnail_image.thumbnail((THUMBNAIL_MAX_EDGE, THUMBNAIL_MAX_EDGE), Image.Resampling.LANCZOS)
+    output_buffer = BytesIO()
+    thumbnail_image.save(output_buffer, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+    thumbnail = output_buffer.getvalue()
+    cache.set(key, thumbnail)
+    return thumbnail
+
+def jpeg_draft_box(size: Tuple[int, int], max_edge: int) -> Tuple[int, int]:
+    """
+    Zielgröße für draft(): das auf max_edge verkleinerte Seitenverhältnis des Bildes. Pillow wählt den Faktor
+    als min(breite // box_breite, höhe // box_höhe); ein quadratisches (max_edge, max_edge) würde bei
+    Quer- und Hochformaten also meist gar nicht verkleinern. Aufgerundet, damit das Ergebnis nie kleiner als max_edge wird.
+    """
+    ratio = max_edge / max(size)
+    return max(1, math.ceil(size[0] * ratio)), max(1, math.ceil(size[1] * ratio))
+
+def jpeg_draft_size(size: Tuple[int, int], max_edge: int) -> Tuple[int, int]:
+    """
+    Größe, in der prepare_image_for_api() ein JPEG dieser Größe per draft() dekodiert (gleiche Regel wie Pillow:
+    Faktor 8, 4, 2 oder 1 aus jpeg_draft_box()). Bilder bis max_edge werden nicht verkleinert.
+    """
+    if max(size) <= max_edge:
+        return size
+    box = jpeg_draft_box(size, max_edge)
+    scale = min(size[0] // box[0], size[1] // box[1])
+    scale = next(factor for factor in (8, 4, 2, 1) if scale >= factor)
+    return (size[0] + scale - 1) // scale, (size[1] + scale - 1) // scale
+
+@instrumented("image.prepare")
+def prepare_image_for_api(source: ImageSource, max_edge: int = DEFAULT_MAX_EDGE, output_format: str = DEFAULT_OUTPUT_FORMAT, quality: int = DEFAULT_QUALITY, with_thumbnail: bool = False) -> PreparedImage:
+    """
+    Bereitet ein Bild beliebigen Formats für den Upload zu Gemini vor:
+    skaliert auf die maximale Kantenlänge, normalisiert den Farbmodus und speichert
+    kompakt als JPEG oder WebP. JPEGs werden per draft() direkt in reduzierter Auflösung dekodiert.
+    Ist das Ergebnis nicht kleiner als ein bereits passendes Original, wird das Original verwendet.
+    Mit with_thumbnail=True wird zusätzlich ein kleines, gecachtes Vorschaubild für die Anzeige erzeugt.
+    source kann statt der Bytes ein Dateipfad sein; große Uploads müssen dann nie komplett im Speicher liegen.
+    """
+    output_format = output_format.upper()
+    if output_format not in SUPPORTED_OUTPUT_FORMATS:
+        raise ValueError(f"Nicht unterstütztes Ausgabeformat: {output_format}")
+
+    original_bytes = _source_size(source)
+    add_to_span(bytes_in=original_bytes)
+    # Die Datei (bzw. deren mmap) bleibt nur so lange offen, bis Ergebnis und Vorschaubild erzeugt sind
+    with _open_image(source) as pil_image:
+        original_format = pil_image.format
+        original_size = pil_image.size
+        if getattr(pil_image, "n_frames", 1) > 1:
+            pil_image.seek(0)
+
+        needs_downscale = max(original_size) > max_edge
+        if needs_downscale and original_format == "JPEG":
+            # Der JPEG-Decoder skaliert beim Dekodieren um 1/2, 1/4 oder 1/8 – spart Zeit und Speicher
+            pil_image.draft("RGB", jpeg_draft_box(original_size, max_edge))
+
+        pil_image = ImageOps.exif_transpose(pil_image)
+        pil_image = _normalize_mode(pil_image, output_format)
+
+        if max(pil_image.size) > max_edge:
+            # Erst grob mit reduce() (ganzzahliger Faktor, sehr schnell), dann fein mit LANCZOS
+            factor = max(pil_image.size) // max_edge
+            if factor >= 2:
+                pil_image = pil_image.reduce(factor)
+            pil_image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        output_buffer = BytesIO()
+        if output_format == "JPEG":
+            pil_image.save(output_buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+        else:
+            pil_image.save(output_buffer, format="WEBP", quality=quality, method=4)
+        prepared_data = output_buffer.getvalue()
+        prepared_size = pil_image.size
+        thumbnail = _thumbnail_from_image(source, pil_image) if with_thumbnail else None
+
+    if not needs_downscale and original_format in _API_NATIVE_FORMATS and len(prepared_data) >= original_bytes:
+        add_to_span(bytes_out=original_bytes)
+        return PreparedImage(_source_bytes(source), Image.MIME[original_format], original_bytes, original_size, original_size, thumbnail)
+
+    add_to_span(bytes_out=len(prepared_data))
+    return PreparedImage(prepared_data, Image.MIME[output_format], original_bytes, original_size, prepared_size, thumbnail)
+
+def format_byte_size(num_bytes: int) -> str:
+    """Formatiert eine Byte-Anzahl für die Anzeige (z.B. '12.3 MB')."""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+# Manuskripte kommen als Dateiobjekt oder als Pfad (dann wird die Datei direkt von der Platte gelesen)
+DocumentSource = Union[BinaryIO, str, os.PathLike]
+
+# WordprocessingML: Elemente, die innerhalb eines Absatzes Text beitragen (None = Textinhalt des Elements);
+# w:br hängt von seinem Typ ab und wird in _iter_docx_part_paragraphs() behandelt
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_DOCX_RUN_TEXT = {_W + "t": None, _W + "tab": "\t", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+# Textfelder stehen in Word doppelt im Dokument (moderne Form und VML-Ersatz für alte Programme)
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_DOCX_PART_NUMBER = re.compile(r"word/(header|footer)(\d*)\.xml$")
+
+def _iter_docx_part_paragraphs(xml_file: BinaryIO) -> Iterator[str]:
+    """
+    Liest die Absätze eines WordprocessingML-Teils per iterparse, ohne den Baum aufzubauen.
+    Erfasst auch Absätze in Tabellen und Textfeldern; ein Textfeld kommt vor dem Absatz, in dem es verankert ist.
+    """
+    open_paragraphs: list[list[str]] = []
+    # Pfad der offenen Elemente (iterparse kennt keine Eltern); fertige Elemente werden daraus entfernt
+    parents: list[ElementTree.Element] = []
+    fallback_depth = 0
+    for event, element in ElementTree.iterparse(xml_file, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            parents.append(element)
+            if tag == _MC_FALLBACK:
+                fallback_depth += 1
+            elif tag == _W + "p" and not fallback_depth:
+                open_paragraphs.append([])
+            continue
+        parents.pop()
+        if tag == _MC_FALLBACK:
+            fallback_depth -= 1
+        elif fallback_depth:
+            pass
+        elif tag == _W + "p":
+            yield "".join(open_paragraphs.pop())
+        elif open_paragraphs and tag == _W + "br":
+            # Wie python-docx: nur Zeilenumbrüche werden zu "\n", Seiten- und Spaltenumbrüche entfallen
+            if element.get(_W + "type", "textWrapping") == "textWrapping":
+                open_paragraphs[-1].append("\n")
+        elif open_paragraphs and tag in _DOCX_RUN_TEXT:
+            text = _DOCX_RUN_TEXT[tag]
+            open_paragraphs[-1].append((element.text or "") if text is None else text)
+        if not open_paragraphs and parents:
+            # Bereits gelesene Elemente aus dem Baum lösen, damit der Speicherbedarf nicht mit dem Dokument wächst
+            parents[-1].remove(element)
+
+def iter_docx_paragraphs(source: DocumentSource, include_headers: bool = True) -> Iterator[str]:
+    """
+    Liefert die Absätze eines DOCX-Dokuments einzeln und in Lesereihenfolge, direkt aus dem ZIP-Archiv
+    gestreamt: Kopf-/Fußzeilen (jeder Text nur einmal, mit include_headers), Haupttext inklusive Tabellen
+    und Textfeldern, danach Fuß- und Endnoten.
+    """
+    with zipfile.ZipFile(source) as archive:
+        names = set(archive.namelist())
+
+        def _part_names(kind: str) -> list[str]:
+            numbered = []
+            for name in names:
+                match = _DOCX_PART_NUMBER.match(name)
+                if match and match.group(1) == kind:
+                    numbered.append((int(match.group(2) or 0), name))
+            return [name for _, name in sorted(numbered)]
+
+        def _header_footer(kind: str) -> Iterator[str]:
+            seen = set()
+            for name in _part_names(kind):
+                with archive.open(name) as part:
+                    for paragraph in _iter_docx_part_paragraphs(part):
+                        if paragraph.strip() and paragraph not in seen:
+                            seen.add(paragraph)
+                            yield paragraph
+
+        if include_headers:
+            yield from _header_footer("header")
+        with archive.open("word/document.xml") as part:
+            yield from _iter_docx_part_paragraphs(part)
+        for name in ("word/footnotes.xml", "word/endnotes.xml"):
+            if name in names:
+                with archive.open(name) as part:
+                    # Trenn- und Fortsetzungslinien der Notenbereiche enthalten keinen Text
+                    yield from (paragraph for paragraph in _iter_docx_part_paragraphs(part) if paragraph.strip())
+        if include_headers:
+            yield from _header_footer("footer")
+
+def iter_docx_text(source: DocumentSource) -> Iterator[str]:
+    """Liefert den Text eines DOCX-Dokuments absatzweise (je mit Zeilenumbruch) für iter_stable_chunks()."""
+    return instrument_iter("docx.extract", (paragraph + "\n" for paragraph in iter_docx_paragraphs(source)), lambda piece: {"chars": len(piece)})
+
+@instrumented("docx.extract")
+def read_text_from_docx(source: DocumentSource) -> str:
+    """Liest den gesamten Text aus einem DOCX-Dokument (siehe iter_docx_paragraphs)."""
+    text = '\n'.join(iter_docx_paragraphs(source))
+    add_to_span(chars=len(text))
+    return text
+
+# Ab dieser Seitenzahl wird die PDF-Textextraktion auf mehrere Prozesse verteilt
+PDF_PARALLEL_MIN_PAGES = 100
+PDF_PAGES_PER_TASK = 25
+# Prozesse je Extraktion, wenn der Aufrufer keine Anzahl vorgibt: Jeder Worker ist ein frischer Interpreter
+# samt PyMuPDF, und bei mehreren gleichzeitigen Jobs vervielfacht sich der Pool
+PDF_MAX_WORKERS = min(4, os.cpu_count() or 1)
+# PDF-Bereinigung für die Vertonung: Blöcke, die ganz im oberen bzw. unteren Seitenrand (Anteil der Seitenhöhe)
+# liegen und auf mindestens PDF_BOILERPLATE_MIN_PAGES Seiten gleich lauten, gelten als Kopf- bzw. Fußzeile
+PDF_MARGIN_RATIO = 0.12
+PDF_BOILERPLATE_MIN_PAGES = 3
+# Zeilen, nach denen ein Absatz enden darf, und Kopf-/Fußzeilen, die nur aus einer Seitenzahl bestehen
+_PDF_TERMINAL = re.compile(r"[.!?:…\"“”»«)\]]$")
+# Römische Seitenzahlen (Vorspann) nur wohlgeformt und unter 400, damit kurze Wörter wie "mix", "civil" oder "dim" bleiben
+_PDF_PAGE_NUMBER = re.compile(r"(seite )?#( (von|of) #)?|(?=[ivxlc]{1,8}$)c{0,3}(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})")
+# Nach "Ein-" + Zeilenumbruch + "und Ausgang" bleibt der Bindestrich stehen
+_HYPHEN_KEEP_BEFORE = {"und", "oder", "bzw", "sowie", "noch", "als", "wie", "bis", "and", "or", "to"}
+# Ein Absatz ohne Satzzeichen am Seitenende wird nur mit der nächsten Seite verbunden, wenn er nicht nach Überschrift aussieht
+_PDF_CONTINUATION_MIN_CHARS = 60
+
+PdfBoilerplate = FrozenSet[Tuple[str, str]]
+
+class PdfTextStats:
+    """Vorher/Nachher-Zahlen der PDF-Bereinigung; wird von iter_pdf_text() während des Lesens gefüllt."""
+
+    def __init__(self):
+        self.pages = 0
+        self.raw_chars = 0
+        self.chars = 0
+        self.removed_lines = 0
+        self.joined_hyphens = 0
+
+    @property
+    def removed_share(self) -> float:
+        return 1 - self.chars / self.raw_chars if self.raw_chars else 0.0
 
-def read_text_from_pdf(file_object: BytesIO) -> str:
+    def to_dict(self) -> dict:
+        return {
+            "pages": self.pages, "raw_chars": self.raw_chars, "chars": self.chars,
+            "removed_lines": self.removed_lines, "joined_hyphens": self.joined_hyphens,
+        }
+
+    def summary(self) -> str:
+        raw_chars, chars = f"{self.raw_chars:,}".replace(",", "."), f"{self.chars:,}".replace(",", ".")
+        return (
+            f"{raw_chars} → {chars} Zeichen (−{self.removed_share:.1%}): {self.removed_lines} Kopf-/Fußzeilen "
+            f"und Seitenzahlen entfernt, {self.joined_hyphens} Trennungen aufgelöst."
+        )
+
+def _pdf_line_key(text: str) -> str:
+    """Vergleichsschlüssel einer Kopf-/Fußzeile: Zahlen werden zu '#', damit 'Seite 3' und 'Seite 4' gleich sind."""
+    key = re.sub(r"\d+", "#", text.lower())
+    return " ".join(re.sub(r"[^\w#]+", " ", key).split())
+
+def _pdf_text_blocks(page) -> list[Tuple[Union[str, None], str]]:
+    """Textblöcke einer Seite in Lesereihenfolge als (randzone, text); randzone ist 'top', 'bottom' oder None."""
+    height = page.rect.height or 1
+    blocks = []
+    for _, top, _, bottom, text, _, block_type in page.get_text("blocks"):
+        if block_type != 0 or not text.strip():
+            continue
+        if bottom <= height * PDF_MARGIN_RATIO:
+            zone = "top"
+        elif top >= height * (1 - PDF_MARGIN_RATIO):
+            zone = "bottom"
+        else:
+            zone = None
+        blocks.append((zone, text))
+    return blocks
+
+def _pdf_margin_keys(page) -> set:
+    return {(zone, _pdf_line_key(text)) for zone, text in _pdf_text_blocks(page) if zone is not None}
+
+def _join_pdf_lines(left: str, right: str) -> Tuple[str, bool]:
+    """
+    Verbindet zwei umbrochene Zeilen. Eine Silbentrennung ("Zusam-" + "menhang") wird aufgelöst
+    (zweiter Rückgabewert True); Bindestriche vor "und"/"oder" und vor Großbuchstaben ("E-" + "Mail") bleiben.
+    """
+    if not left:
+        return right, False
+    if left.endswith("\xad"):
+        return left[:-1] + right, True
+    if left.endswith("-") and len(left) > 1 and left[-2].isalpha():
+        next_word = right.split(" ", 1)[0].rstrip(".,;:").lower()
+        if next_word in _HYPHEN_KEEP_BEFORE:
+            return f"{left} {right}", False
+        if right[:1].islower():
+            return left[:-1] + right, True
+        return left + right, False
+    return f"{left} {right}", False
+
+def _clean_pdf_page(page, boilerplate: PdfBoilerplate) -> Tuple[list[str], dict]:
+    """
+    Text einer Seite als Liste von Absätzen, ohne Kopf-/Fußzeilen und Seitenzahlen; harte Zeilenumbrüche
+    innerhalb eines Absatzes werden aufgelöst. Ein Absatz endet am Blockende oder nach einer Zeile mit
+    Satzzeichen, die deutlich kürzer als die längste Zeile des Blocks ist.
+    """
+    counts = {"raw_chars": 0, "removed_lines": 0, "joined_hyphens": 0}
+    paragraphs: list[str] = []
+    for zone, text in _pdf_text_blocks(page):
+        counts["raw_chars"] += len(text)
+        if zone is not None:
+            key = _pdf_line_key(text)
+            if (zone, key) in boilerplate or _PDF_PAGE_NUMBER.fullmatch(key):
+                counts["removed_lines"] += text.count("\n") or 1
+                continue
+        lines = [line.strip() for line in text.split("\n")]
+        longest = max(len(line) for line in lines)
+        current = ""
+        for line in lines:
+            if not line:
+                if current:
+                    paragraphs.append(current)
+                current = ""
+                continue
+            current, joined = _join_pdf_lines(current, line)
+            counts["joined_hyphens"] += joined
+            if _PDF_TERMINAL.search(line) and len(line) < longest * 0.8:
+                paragraphs.append(current)
+                current = ""
+        if current:
+            paragraphs.append(current)
+    return paragraphs, counts
+
+def _pdf_page_result(page, mode: str, boilerplate: Union[PdfBoilerplate, None]):
+    if mode == "margins":
+        return _pdf_margin_keys(page)
+    if mode == "clean":
+        return _clean_pdf_page(page, boilerplate)
+    return page.get_text()
+
+def _extract_pdf_page_range(pdf_path: str, start: int, stop: int, mode: str = "text", boilerplate: Union[PdfBoilerplate, None] = None) -> list:
+    """Verarbeitet die Seiten start..stop-1 (läuft in einem Worker-Prozess); mode siehe _iter_pdf_page_results()."""
+    import fitz
+    with fitz.open(pdf_path) as pdf_document:
+        return [_pdf_page_result(pdf_document.load_page(page_num), mode, boilerplate) for page_num in range(start, stop)]
+
+def iter_pdf_pages(source: DocumentSource, max_workers: Union[int, None] = None) -> Iterator[str]:
+    """
+    Liefert den Text einer PDF-Datei Seite für Seite, ohne den Gesamttext aufzubauen.
+    Große PDFs (ab PDF_PARALLEL_MIN_PAGES Seiten) werden in Seitenbereiche aufgeteilt und in einem
+    Prozess-Pool mit max_workers (Standard: PDF_MAX_WORKERS) Prozessen extrahiert; die Seiten kommen trotzdem in der richtigen Reihenfolge.
+    Mit einem Pfad liest PyMuPDF die Seiten direkt aus der Datei, ohne sie komplett zu laden.
+    """
+    return instrument_iter("pdf.extract", _iter_pdf_page_results(source, max_workers), lambda page: {"chars": len(page)})
+
+def _iter_pdf_page_results(source: DocumentSource, max_workers: Union[int, None], mode: str = "text", boilerplate: Union[PdfBoilerplate, None] = None) -> Iterator:
+    """
+    Ergebnis je Seite in Seitenreihenfolge: mode 'text' liefert page.get_text(), 'margins' die Schlüssel
+    der Randblöcke (für find_pdf_boilerplate) und 'clean' (absätze, zähler) aus _clean_pdf_page().
+    """
+    import fitz
+    if isinstance(source, (str, os.PathLike)):
+        pdf_path, pdf_bytes = os.fspath(source), None
+        pdf_document = fitz.open(pdf_path)
+    else:
+        pdf_path, pdf_bytes = None, source.read()
+        pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    with pdf_document:
+        page_count = len(pdf_document)
+        max_workers = max_workers or PDF_MAX_WORKERS
+        if page_count < PDF_PARALLEL_MIN_PAGES or max_workers == 1:
+            for page_num in range(page_count):
+                yield _pdf_page_result(pdf_document.load_page(page_num), mode, boilerplate)
+            return
+
+    temporary = pdf_path is None
+    if temporary:
+        # Die Worker öffnen die PDF aus einer temporären Datei, statt die Bytes pro Aufgabe zu kopieren
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp_file:
+            tmp_file.write(pdf_bytes)
+        pdf_path = tmp_file.name
+    del pdf_bytes
+    try:
+        ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count)) for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+        # spawn statt fork: Der Prozess hat viele Threads (Jobs, Logging, SQLite, HTTP-Pools), deren gehaltene
+        # Sperren ein per fork erzeugter Worker erben und mit denen er hängen bleiben könnte
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_extract_pdf_page_range, pdf_path, start, stop, mode, boilerplate) for start, stop in ranges]
+            for future in futures:
+                yield from future.result()
+    finally:
+        if temporary:
+            os.unlink(pdf_path)
+
+def find_pdf_boilerplate(source: DocumentSource, max_workers: Union[int, None] = None) -> PdfBoilerplate:
+    """
+    Sucht Kopf- und Fußzeilen: Blöcke im oberen bzw. unteren Seitenrand, die (Zahlen ausgenommen) auf
+    mindestens PDF_BOILERPLATE_MIN_PAGES Seiten gleich lauten. Gibt die Menge der (randzone, schlüssel) zurück.
+    """
+    page_counts: dict = {}
+    for margin_keys in _iter_pdf_page_results(source, max_workers, "margins"):
+        for margin_key in margin_keys:
+            page_counts[margin_key] = page_counts.get(margin_key, 0) + 1
+    return frozenset(margin_key for margin_key, count in page_counts.items() if count >= PDF_BOILERPLATE_MIN_PAGES)
+
+def iter_pdf_text(source: DocumentSource, max_workers: Union[int, None] = None, stats: Union[PdfTextStats, None] = None) -> Iterator[str]:
+    """
+    Liefert den für die Vertonung bereinigten Text einer PDF-Datei absatzweise (je mit Zeilenumbruch):
+    ohne wiederkehrende Kopf-/Fußzeilen und Seitenzahlen (siehe find_pdf_boilerplate), mit aufgelösten
+    Silbentrennungen und zu Absätzen verbundenen Zeilen, auch über Seitengrenzen hinweg.
+    Liest die PDF zweimal (erst die Seitenränder, dann den Text); stats erhält die Vorher/Nachher-Zahlen.
+    """
+    stats = stats if stats is not None else PdfTextStats()
+    if isinstance(source, (str, os.PathLike)):
+        first_pass, second_pass = source, source
+    else:
+        pdf_bytes = source.read()
+        first_pass, second_pass = BytesIO(pdf_bytes), BytesIO(pdf_bytes)
+    return instrument_iter(
+        "pdf.extract", _iter_clean_pdf_paragraphs(first_pass, second_pass, max_workers, stats),
+        lambda piece: {"chars": len(piece)}, cleaned="yes",
+    )
+
+def _iter_clean_pdf_paragraphs(first_pass: DocumentSource, second_pass: DocumentSource, max_workers: Union[int, None], stats: PdfTextStats) -> Iterator[str]:
+    boilerplate = find_pdf_boilerplate(first_pass, max_workers)
+    carry = ""
+    for paragraphs, counts in _iter_pdf_page_results(second_pass, max_workers, "clean", boilerplate):
+        stats.pages += 1
+        stats.raw_chars += counts["raw_chars"]
+        stats.removed_lines += counts["removed_lines"]
+        stats.joined_hyphens += counts["joined_hyphens"]
+        if not paragraphs:
+            continue
+        if carry:
+            paragraphs[0], joined = _join_pdf_lines(carry, paragraphs[0])
+            stats.joined_hyphens += joined
+        # Der letzte Absatz einer Seite kann auf der nächsten weitergehen
+        last = paragraphs.pop()
+        for paragraph in paragraphs:
+            stats.chars += len(paragraph) + 1
+            yield paragraph + "\n"
+        if _PDF_TERMINAL.search(last) or len(last) < _PDF_CONTINUATION_MIN_CHARS:
+            stats.chars += len(last) + 1
+            yield last + "\n"
+            carry = ""
+        else:
+            carry = last
+    if carry:
+        stats.chars += len(carry) + 1
+        yield carry + "\n"
+
+def read_text_from_pdf(source: DocumentSource) -> str:
     """
     Liest den gesamten Text aus einer PDF-Datei.
-    WIRFT EINEN FEHLER, WENN ETWAS SCHIEFGEHT (ZUM DEBUGGEN).
-    """
-    # Öffne das PDF-Dokument aus den Bytes
-    # Der try...except Block wurde bewusst entfernt, um den echten Fehler zu sehen.
-    pdf_document = fitz.open(stream=file_object.read(), filetype="pdf")
-    full_text = ""
-    # Iteriere durch jede Seite und extrahiere den Text
-    for page_num in range(len(pdf_document)):
-        page = pdf_document.load_page(page_num)
-        full_text += page.get_text()
+    Enthält sie keinen extrahierbaren Text (z.B. ein Scan), wird "NO_TEXT_IN_PDF" zurückgegeben.
+    """
+    full_text = "".join(iter_pdf_pages(source))
     
     # Wenn nach dem Lesen aller Seiten kein Text da ist, ist es wahrscheinlich eine Bild-PDF
     if not full_text.strip():
@@ -44,40 +561,114 @@ def read_text_from_pdf(file_object: BytesIO) -> str:
         
     return full_text
 
-def chunk_text(text: str, chunk_size: int = 9500) -> list[str]:
+def _iter_paragraphs(text_stream: Iterable[str]) -> Iterator[str]:
+    """Zerlegt einen Strom von Textstücken (z.B. Seiten) in Zeilen, auch über Stückgrenzen hinweg."""
+    remainder = ""
+    for piece in text_stream:
+        lines = (remainder + piece).split('\n')
+        remainder = lines.pop()
+        yield from lines
+    yield remainder
+
+def _split_long_paragraph(paragraph: str, chunk_size: int) -> Iterator[str]:
+    """Teilt einen einzelnen, zu langen Absatz an Satzgrenzen in Stücke von höchstens chunk_size Zeichen."""
+    temp_para_chunk = ""
+    for sentence in paragraph.split('.'):
+        if not sentence: continue
+        sentence += "."
+        if len(temp_para_chunk) + len(sentence) <= chunk_size:
+            temp_para_chunk += sentence
+        else:
+            if temp_para_chunk.strip():
+                yield temp_para_chunk
+            temp_para_chunk = sentence
+    if temp_para_chunk.strip():
+        yield temp_para_chunk
+
+def iter_text_chunks(text_stream: Iterable[str], chunk_size: int = 9500) -> Iterator[str]:
     """
-    Teilt einen langen Text in kleinere Chunks auf, ohne Sätze zu zerschneiden.
+    Teilt einen Strom von Textstücken in Chunks auf, ohne Sätze zu zerschneiden.
+    Jeder Chunk wird geliefert, sobald er voll ist – die Audio-Synthese kann also schon
+    beginnen, während spätere Seiten noch gelesen werden.
     """
-    chunks = []
     current_chunk = ""
-    # Teile den Text zuerst in Absätze auf
-    paragraphs = text.split('\n')
     
-    for paragraph in paragraphs:
+    for paragraph in _iter_paragraphs(text_stream):
         # Wenn der Absatz selbst schon zu groß ist, müssen wir ihn aufteilen
         if len(paragraph) > chunk_size:
-            sentences = paragraph.split('.')
-            temp_para_chunk = ""
-            for sentence in sentences:
-                if not sentence: continue
-                sentence += "."
-                if len(temp_para_chunk) + len(sentence) <= chunk_size:
-                    temp_para_chunk += sentence
-                else:
-                    chunks.append(temp_para_chunk)
-                    temp_para_chunk = sentence
-            if temp_para_chunk:
-                chunks.append(temp_para_chunk)
+            # Den bisher gesammelten Chunk zuerst ausgeben, damit die Reihenfolge erhalten bleibt
+            if current_chunk.strip():
+                yield current_chunk
+            current_chunk = ""
+            yield from _split_long_paragraph(paragraph, chunk_size)
         else:
             # Füge Absätze zum aktuellen Chunk hinzu, bis er voll ist
             if len(current_chunk) + len(paragraph) + 1 <= chunk_size:
                 current_chunk += paragraph + '\n'
             else:
-                chunks.append(current_chunk)
+                if current_chunk.strip():
+                    yield current_chunk
                 current_chunk = paragraph + '\n'
     
-    # Füge den letzten verbleibenden Chunk hinzu
-    if current_chunk:
-        chunks.append(current_chunk)
-        
-    return [chunk for chunk in chunks if chunk.strip()]
\ No newline at end of file
+    # Gib den letzten verbleibenden Chunk aus
+    if current_chunk.strip():
+        yield current_chunk
+
+def chunk_text(text: str, chunk_size: int = 9500) -> list[str]:
+    """
+    Teilt einen langen Text in kleinere Chunks auf, ohne Sätze zu zerschneiden.
+    """
+    return list(iter_text_chunks([text], chunk_size))
+
+
+# Parameter für stabile, an Absätzen verankerte Chunk-Grenzen
+STABLE_CHUNK_MIN_SIZE = 3000
+STABLE_CHUNK_BOUNDARY_MODULUS = 8
+
+def normalize_chunk_text(text: str) -> str:
+    """
+    Normalisiert einen Chunk für Cache-Schlüssel und Synthese: Leerraum innerhalb der Zeilen
+    wird zusammengefasst, leere Zeilen entfallen. Rein kosmetische Änderungen erzeugen so keinen neuen Chunk.
+    """
+    lines = (" ".join(line.split()) for line in text.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+def _is_anchor_paragraph(paragraph: str, boundary_modulus: int) -> bool:
+    """Entscheidet allein anhand des Absatzinhalts, ob nach diesem Absatz eine Chunk-Grenze liegen darf."""
+    normalized = " ".join(paragraph.split())
+    if not normalized:
+        return False
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % boundary_modulus == 0
+
+def iter_stable_chunks(text_stream: Iterable[str], chunk_size: int = 9500, min_size: int = STABLE_CHUNK_MIN_SIZE, boundary_modulus: int = STABLE_CHUNK_BOUNDARY_MODULUS) -> Iterator[str]:
+    """
+    Teilt einen Textstrom in Chunks mit inhaltsabhängigen Grenzen (Content-Defined Chunking):
+    Ein Chunk endet nach einem "Anker"-Absatz, sobald er min_size Zeichen hat. Ob ein Absatz ein
+    Anker ist, hängt nur von seinem eigenen Text ab. Eine Änderung am Anfang des Buches verschiebt
+    daher nur die Grenzen bis zum nächsten Anker, alle späteren Chunks bleiben identisch.
+    chunk_size ist die harte Obergrenze pro Chunk.
+    """
+    current: list[str] = []
+    current_len = 0
+
+    def _flush() -> Iterator[str]:
+        nonlocal current, current_len
+        chunk = '\n'.join(current) + '\n'
+        current, current_len = [], 0
+        if chunk.strip():
+            yield chunk
+
+    for paragraph in _iter_paragraphs(text_stream):
+        if len(paragraph) > chunk_size:
+            yield from _flush()
+            yield from _split_long_paragraph(paragraph, chunk_size)
+            continue
+        if current_len + len(paragraph) + 1 > chunk_size:
+            yield from _flush()
+        current.append(paragraph)
+        current_len += len(paragraph) + 1
+        if current_len >= min_size and _is_anchor_paragraph(paragraph, boundary_modulus):
+            yield from _flush()
+
+    yield from _flush()